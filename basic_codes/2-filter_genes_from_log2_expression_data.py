@@ -1,13 +1,32 @@
-import pandas as pd
 import csv
 import util
 import os 
+import gene_filter
+import pipeline_stages
 
 """
 Title: Description
 Filter genes from necroptosis pathway or protein coding
 """
 
+"""
+Variable: gene_lists
+
+ Description:
+    Lists of genes that can be used to filter the expression data (see pipeline_stages.gene_lists, where new lists are added):
+    name of the filter, path of the file, column with the gene ids and separator.
+"""
+
+gene_lists = {filter_by: ('../../../data/'+path, column, sep) for filter_by, (path, column, sep) in pipeline_stages.gene_lists.items()}
+
+def list_of_genes(filter_by):
+    path, column, sep = gene_lists[filter_by]
+    return (util.path__+path.replace('/',os.sep), column, sep)
+
+def read_genes_to_filter(filter_by):
+    path, column, sep = list_of_genes(filter_by)
+    return gene_filter.read_gene_set(path, column, sep=sep)
+
 """
 Function: filter_genes
 
@@ -24,42 +43,40 @@ Function: filter_genes
 """
 
 def filter_genes(df, filter_by):
-    # "Protein coding genes" were previously selected as interesting genes to be analized
-    if filter_by == 'pc':
-        genes_to_filter = pd.read_csv(util.path__+'../../../data/external/genes_protein_conding.tsv'.replace('/',os.sep),sep='\t')
-        genes_to_filter = genes_to_filter['Ensembl gene ID'].values
-        dict_df = {}
-        with open(df,'r') as gct:
-            read=csv.reader(gct, delimiter=',')
-            for line in read:
-                if line[0]=='Gene_ID':
-                    tissue=line
-                    for i in range(len(line)):
-                        dict_df[line[i]]=[]
-                else:
-                    for i in range(len(line)):
-                        if line[0].split('.')[0] in genes_to_filter:
-                            dict_df[tissue[i]].append(line[i])
-        return dict_df                    
-    # "Necroptosis genes" are genes that are part of the death of the cell pathway and could affect expression of other genes 
-    elif filter_by == 'necrop':
-        genes_to_filter = pd.read_csv(util.path__+'../../../data/external/genes_necroptose.csv'.replace('/',os.sep))
-        genes_to_filter = genes_to_filter['x'].values
-        dict_df = {}
-        with open(df,'r') as gct:
-            read=csv.reader(gct, delimiter=',')
-            for line in read:
-                if line[0]=='Gene_ID':
-                    tissue=line
-                    for i in range(len(line)):
-                        dict_df[line[i]]=[]
-                else:
-                    for i in range(len(line)):
-                        if line[0].split('.')[0] in genes_to_filter:
-                            dict_df[tissue[i]].append(line[i])
-        return dict_df                     
-    else:
-        print('Error: Specified filtering method not valid')                             
+    if not(filter_by in gene_lists):
+        print('Error: Specified filtering method not valid')
+        return None
+    genes_to_filter = read_genes_to_filter(filter_by)
+    dict_df = {}
+    with open(df,'r') as gct:
+        read=csv.reader(gct, delimiter=',')
+        tissue=next(read)
+        for i in range(len(tissue)):
+            dict_df[tissue[i]]=[]
+        for line in read:
+            if line[0].split('.')[0] in genes_to_filter: # Decided once for each row
+                for i in range(len(line)):
+                    dict_df[tissue[i]].append(line[i])
+    return dict_df
+
+"""
+Function: filter_genes_to_csv
+
+ Description:
+    Streaming version of filter_genes: applies one or more lists of genes in a single read of the file, writing the
+    selected rows straight to the output files, without keeping the data in memory.
+
+ Parameters:
+ 	df - path for dataframe with expression of genes
+    outputs - dictionary {filter_by: path of output CSV}, filter_by being a key of gene_lists ('pc', 'necrop', ...)
+ 	
+ Returns:
+ 	Dictionary with the number of genes written for each filter. Prints error message if a filter is not valid.
+"""
+
+def filter_genes_to_csv(df, outputs):
+    lists = {filter_by: list_of_genes(filter_by) for filter_by in gene_lists}
+    return pipeline_stages.filter_genes(df, lists, outputs)
                        
 
 # dict_df_aorta = filter_genes(util.path__+'../../../data/interim/gtex_data/log2_tpm_data_aorta_gtex.csv'.replace('/',os.sep))
@@ -70,5 +87,6 @@ def filter_genes(df, filter_by):
 # df_ventricle = filter_genes(util.path__+'../../../data/interim/gtex_data/log2_tpm_data_left_ventricle_gtex.csv'.replace('/',os.sep))
 # pd.DataFrame.from_dict(df_atrial).to_csv(util.path__+'../../../data/interim/gtex_data/filtered_protein_coding_log2_tpm_data_atrial_appendage.csv'.replace('/',os.sep), index=False)
 # pd.DataFrame.from_dict(df_ventricle).to_csv(util.path__+'../../../data/interim/gtex_data/filtered_protein_coding_log2_tpm_data_left_ventricle.csv'.replace('/',os.sep), index=False)
-df_liver = filter_genes(util.path__+'../../../data/interim/gtex_data/log2_tpm_data_Liver_gtex.csv'.replace('/',os.sep), filter_by='pc')
-pd.DataFrame.from_dict(df_liver).to_csv(util.path__+'../../../data/interim/gtex_data/filtered_protein_coding_log2_tpm_data_Liver_gtex.csv'.replace('/',os.sep), sep=',', index=False)
\ No newline at end of file
+if __name__ == '__main__':
+    filter_genes_to_csv(util.path__+'../../../data/interim/gtex_data/log2_tpm_data_Liver_gtex.csv'.replace('/',os.sep),
+                        {'pc': util.path__+'../../../data/interim/gtex_data/filtered_protein_coding_log2_tpm_data_Liver_gtex.csv'.replace('/',os.sep)})
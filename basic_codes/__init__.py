@@ -0,0 +1,53 @@
+import os
+import sys
+
+"""
+Title: Description
+Package of the functions of the GTEx pipeline, for using them from other code (import basic_codes) or from the command line
+(python -m basic_codes, see __main__.py). Importing the package loads nothing else: the module of a function is imported
+the first time the function is used, so code that only fits trees does not load the plotting libraries. The numbered
+scripts keep working as before, with the paths of util.
+"""
+
+# Modules of this folder import each other by name, like the scripts do, so the folder goes first in sys.path: an installed
+# module with the same name (pipeline, util, ...) would otherwise be imported instead of the one of this folder. In the
+# process that imports the package, those names refer to the modules of this folder.
+_folder = os.path.dirname(os.path.abspath(__file__))
+if sys.path[:1] != [_folder]:
+    sys.path.insert(0, _folder)
+
+"""
+Variable: functions
+
+ Description:
+    Functions of the package and the module where each one is defined.
+"""
+
+functions = {'create_log2tpm_for_tissues_from_gtex': 'pipeline_stages',
+             'create_log2tpm_for_tissue_from_gtex': 'pipeline_stages',
+             'filter_genes': 'pipeline_stages',
+             'create_df_for_plot': 'pipeline_stages',
+             'erase_quartiles_and_fix_cols_names': 'pipeline_stages',
+             'create_df_for_method_with_time_of_death_and_applies_it': 'dimensionality_reduction',
+             'create_df_for_pca_from_cache': 'dimensionality_reduction',
+             'plot_df_transformed': 'dimensionality_reduction',
+             'remove_stable_genes': 'expression_plots',
+             'df_mean_exp_by_time_of_death': 'expression_plots',
+             'save_plot': 'expression_plots',
+             'create_x_y_from_data_frame': 'tree_experiment',
+             'run_tree_experiment': 'tree_experiment',
+             'fit_trees': 'tree_runner',
+             'fit_forest': 'tree_runner',
+             'materialize': 'tree_store',
+             'TreeAggregator': 'consensus_tree',
+             'assemble_consensus': 'consensus_tree',
+             'Pipeline': 'pipeline',
+             'gtex_pipeline': 'pipeline'}
+
+__all__ = list(functions)
+
+def __getattr__(name):
+    if name in functions:
+        import importlib
+        return getattr(importlib.import_module(functions[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,207 @@
+import os
+import sys
+import argparse
+
+"""
+Title: Description
+Command line of the package: python -m basic_codes <command> ..., with one command for each stage of the pipeline, using
+the folders of the project under a data folder (raw/gtex, external and interim/gtex_data, like the numbered scripts).
+Each command imports only the modules of its stage.
+
+    extract - log2(tpm+1) of the samples of each tissue (script 1)
+    filter - genes of the lists of pipeline_stages.gene_lists (script 2)
+    reduce - PCA or tSNE of the samples, plotted by quartile of time of death (script 3)
+    quartiles - samples with their time of death and quartile (script 4)
+    erase - samples of the quartiles kept, ready for the trees (script 5)
+    trees - tree experiment saved on the database (script 6)
+    materialize - relational tables of an experiment saved as arrays (tree_store.py)
+    consensus - average tree of an experiment saved as arrays, in the graphviz format (consensus_tree.py)
+    pipeline - all stages, skipping the ones whose inputs did not change (pipeline.py)
+"""
+
+def _gtex_data(data_dir, file_name):
+    return os.path.join(data_dir, 'interim', 'gtex_data', file_name)
+
+def _attributes(data_dir):
+    return os.path.join(data_dir, 'raw', 'gtex', 'GTEx_Analysis_v8_Annotations_SampleAttributesDS.txt')
+
+def extract(args):
+    import pipeline_stages
+    from pipeline import gtex_tissues
+    outputs = {}
+    for name in args.tissues.split(','):
+        outputs[gtex_tissues.get(name, name)] = _gtex_data(args.data_dir, f'log2_tpm_data_{name}_gtex.csv') # Short name or tissue as written in SMTSD
+    samples = pipeline_stages.create_log2tpm_for_tissues_from_gtex(os.path.join(args.data_dir, 'raw', 'gtex', 'GTEx_Analysis_2017-06-05_v8_RNASeQCv1.1.9_gene_tpm.gct'),
+                                                                   _attributes(args.data_dir), outputs, chunk_size=args.chunk_size)
+    for tissue in samples:
+        print(f'{tissue}: {samples[tissue]} samples')
+
+filtered_names = {'pc': 'protein_coding', 'necrop': 'necrop'}
+
+def filter_(args):
+    import pipeline_stages
+    lists = {}
+    outputs = {}
+    for filter_by in args.filter_by.split(','):
+        if filter_by in pipeline_stages.gene_lists:
+            path, column, sep = pipeline_stages.gene_lists[filter_by]
+            lists[filter_by] = (os.path.join(args.data_dir, *path.split('/')), column, sep)
+        outputs[filter_by] = _gtex_data(args.data_dir, f'filtered_{filtered_names.get(filter_by, filter_by)}_log2_tpm_data_{args.tissue}_gtex.csv')
+    written = pipeline_stages.filter_genes(_gtex_data(args.data_dir, f'log2_tpm_data_{args.tissue}_gtex.csv'), lists, outputs)
+    if written is None:
+        sys.exit(1)
+    for filter_by in written:
+        print(f'{filter_by}: {written[filter_by]} genes')
+
+def reduce(args):
+    import expression_cache
+    import dimensionality_reduction
+    df = expression_cache.read_expression_csv(args.csv)
+    result = dimensionality_reduction.create_df_for_method_with_time_of_death_and_applies_it(df, args.method, _attributes(args.data_dir))
+    if result is None:
+        sys.exit(1)
+    dimensionality_reduction.plot_df_transformed(result, args.method, args.title)
+
+def quartiles(args):
+    import expression_cache
+    import pipeline_stages
+    df = expression_cache.read_csv(_gtex_data(args.data_dir, f'log2_tpm_data_{args.tissue}_gtex.csv')).reset_index()
+    quartile = pipeline_stages.create_df_for_plot(df, _attributes(args.data_dir), _gtex_data(args.data_dir, f'quartiles_log2_tpm_{args.tissue}.csv'))
+    print(quartile['quartiles'].value_counts().sort_index().to_string())
+
+def erase(args):
+    import expression_cache
+    import pipeline_stages
+    kept = [int(q) for q in args.quartiles.split(',')]
+    df = expression_cache.read_csv(_gtex_data(args.data_dir, f'quartiles_log2_tpm_{args.tissue}.csv')).reset_index()
+    df = pipeline_stages.erase_quartiles_and_fix_cols_names(df, kept)
+    output = args.output or _gtex_data(args.data_dir, f'{args.tissue}_log2_tpm_quartiles_{"_".join(str(q) for q in kept)}.csv')
+    df.to_csv(output)
+    print(f'{len(df)} samples and {len(df.columns)} genes saved in {output}')
+
+def _max_features(value):
+    # 'sqrt', 'log2', 'none', a number of genes or a fraction of them
+    if value in ['sqrt', 'log2']:
+        return value
+    if value == 'none':
+        return None
+    return float(value) if '.' in value else int(value)
+
+def trees(args):
+    import sqlite3
+    import expression_cache
+    import tree_experiment
+    df = expression_cache.read_csv(args.csv) #Samples indexed by the first column ('Unnamed: 0'), from the binary cache
+    db = sqlite3.connect(args.db)
+    try:
+        run = tree_experiment.run_tree_experiment(df, db, args.exper, resume=args.resume, n_times_run=args.trees, n_jobs=args.n_jobs,
+                                                  seed=args.seed, engine=args.engine, trees_per_commit=args.trees_per_commit,
+                                                  storage=args.storage, bootstrap=args.bootstrap, max_features=args.max_features, trees_per_fit=args.trees_per_fit,
+                                                  render_mode=args.render_mode, render_every=args.render_every,
+                                                  render_consensus=args.render_mode != 'off', results_dir=args.results)
+    finally:
+        db.close()
+    if run is None:
+        sys.exit(1)
+
+def materialize(args):
+    import sqlite3
+    import tree_store
+    db = sqlite3.connect(args.db)
+    try:
+        n_trees = tree_store.materialize(db, args.exper_id, force=args.force)
+    finally:
+        db.close()
+    print(f'{n_trees} trees materialized')
+
+def consensus(args):
+    import sqlite3
+    import consensus_tree
+    db = sqlite3.connect(args.db)
+    try:
+        experiment = consensus_tree.experiment_aggregator(db, args.exper_id, classes=args.classes.split(',') if args.classes else None)
+    finally:
+        db.close()
+    if experiment is None:
+        sys.exit(1)
+    consensus = consensus_tree.assemble_consensus(experiment['aggregator'].aggregate(), experiment['genes'],
+                                                  max_depth=args.max_depth, min_fraction=args.min_fraction)
+    output = args.output or f'average_tree_{args.exper_id}'
+    with open(output+'.dot', 'w') as dot:
+        dot.write(consensus_tree.export_graphviz(consensus, experiment['classes']))
+    print(f"{len(consensus['gene'])} nodes saved in {output}.dot")
+    if args.pdf:
+        consensus_tree.render_consensus(consensus, experiment['classes'], output)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == 'pipeline': # Options of the pipeline are parsed by pipeline.main
+        import pipeline
+        return pipeline.main(argv[1:])
+    parser = argparse.ArgumentParser(prog='python -m basic_codes', description='Stages of the GTEx pipeline')
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    command = commands.add_parser('extract', help='log2(tpm+1) of the samples of each tissue')
+    command.add_argument('data_dir')
+    command.add_argument('--tissues', default='Liver', help='short names (coronary, atrial_appendage, left_ventricle) or tissues as written in SMTSD, separated by commas')
+    command.add_argument('--chunk-size', type=int, default=2000)
+    command.set_defaults(function=extract)
+    command = commands.add_parser('filter', help='genes of the lists of genes')
+    command.add_argument('data_dir')
+    command.add_argument('tissue')
+    command.add_argument('--filter-by', default='pc,necrop', help='lists applied, separated by commas')
+    command.set_defaults(function=filter_)
+    command = commands.add_parser('reduce', help='PCA or tSNE of the samples of a CSV of expression, by quartile of time of death')
+    command.add_argument('data_dir')
+    command.add_argument('csv')
+    command.add_argument('--method', default='tsne', choices=['pca', 'tsne'])
+    command.add_argument('--title', default='', help='tissue shown in the title of the plot')
+    command.set_defaults(function=reduce)
+    command = commands.add_parser('quartiles', help='samples with their time of death and quartile')
+    command.add_argument('data_dir')
+    command.add_argument('tissue')
+    command.set_defaults(function=quartiles)
+    command = commands.add_parser('erase', help='samples of the quartiles kept')
+    command.add_argument('data_dir')
+    command.add_argument('tissue')
+    command.add_argument('--quartiles', default='0,1', help='quartiles kept, separated by commas')
+    command.add_argument('--output', default=None)
+    command.set_defaults(function=erase)
+    command = commands.add_parser('trees', help='tree experiment on a labelled CSV (Pacient_Condition in the last column)')
+    command.add_argument('csv')
+    command.add_argument('db')
+    command.add_argument('--exper', default='Teste')
+    command.add_argument('--resume', type=int, default=None)
+    command.add_argument('--trees', type=int, default=1)
+    command.add_argument('--n-jobs', type=int, default=1)
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--engine', default='sklearn', help="'sklearn', 'histogram', 'random_forest' or 'extra_trees'")
+    command.add_argument('--trees-per-commit', type=int, default=1)
+    command.add_argument('--storage', default='relational', choices=['relational', 'compact'])
+    command.add_argument('--no-bootstrap', dest='bootstrap', action='store_false', help='forest engines: every tree uses every sample')
+    command.add_argument('--max-features', type=_max_features, default='sqrt', help="forest engines: genes searched at each split ('sqrt', 'log2', 'none', a number or a fraction)")
+    command.add_argument('--trees-per-fit', type=int, default=500, help='forest engines: trees grown in each fit')
+    command.add_argument('--render-mode', default='off', choices=['off', 'every', 'background'])
+    command.add_argument('--render-every', type=int, default=100)
+    command.add_argument('--results', default='results')
+    command.set_defaults(function=trees)
+    command = commands.add_parser('materialize', help='relational tables of an experiment saved with --storage compact')
+    command.add_argument('db')
+    command.add_argument('exper_id', type=int)
+    command.add_argument('--force', action='store_true', help='writes the tables again even if already materialized')
+    command.set_defaults(function=materialize)
+    command = commands.add_parser('consensus', help='average tree of an experiment saved with --storage compact')
+    command.add_argument('db')
+    command.add_argument('exper_id', type=int)
+    command.add_argument('--max-depth', type=int, default=4)
+    command.add_argument('--min-fraction', type=float, default=0.05, help='fraction of the trees where a pair of genes must appear')
+    command.add_argument('--output', default=None, help='path of the files, without extension (default: average_tree_<exper_id>)')
+    command.add_argument('--pdf', action='store_true', help='also renders the tree (needs the dot program of graphviz)')
+    command.add_argument('--classes', default=None,
+                         help='classes in the order of the class counts, separated by commas (trees saved in the relational tables), e.g. CVDA,CA,C,CVD')
+    command.set_defaults(function=consensus)
+    commands.add_parser('pipeline', help='all stages, skipping the ones whose inputs did not change (see pipeline.py --help)')
+    args = parser.parse_args(argv)
+    args.function(args)
+
+if __name__ == '__main__':
+    main()
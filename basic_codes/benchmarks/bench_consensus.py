@@ -0,0 +1,86 @@
+import numpy as np
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import consensus_tree
+
+"""
+Title: Description
+Benchmark of consensus_tree on random trees shaped like the trees of the GTEx experiments (10k trees over 19k genes by
+default): time to add the arrays of the trees, to aggregate them and to assemble the consensus tree. Genes of the splits are
+drawn with a skewed distribution, so some pairs of genes are much more frequent than others, like in the real trees.
+"""
+
+"""
+Function: random_tree
+
+ Description:
+    Random binary tree in the preorder of sklearn, with leaves splitting the class counts of their father at random.
+
+ Parameters:
+ 	rng - numpy random generator
+ 	genes - iterator of the genes of the splits, drawn beforehand
+ 	n_samples - number of samples of each class at the root
+ 	max_depth - depth of the deepest leaf
+
+ Returns:
+ 	Dictionary with children_left, children_right, feature, threshold and value, like tree_store.tree_arrays.
+"""
+
+def random_tree(rng, genes, n_samples, max_depth=8):
+    left, right, feature, threshold, value = [], [], [], [], []
+    stack = [(None, None, np.asarray(n_samples), 0)] # (father, side, class counts, depth)
+    while stack:
+        father, side, counts, depth = stack.pop()
+        node = len(left)
+        if father is not None:
+            (left if side == 'left' else right)[father] = node
+        left.append(-1)
+        right.append(-1)
+        value.append(counts)
+        if depth < max_depth and counts.sum() > 4 and np.count_nonzero(counts) > 1 and rng.random() < 0.85:
+            feature.append(next(genes))
+            threshold.append(float(rng.uniform(0, 8)))
+            to_left = rng.binomial(counts, rng.uniform(0.2, 0.8))
+            stack.append((node, 'right', counts-to_left, depth+1)) # Left son is popped first, like the preorder of sklearn
+            stack.append((node, 'left', to_left, depth+1))
+        else:
+            feature.append(-2)
+            threshold.append(-2.0)
+    return {'children_left': np.array(left), 'children_right': np.array(right), 'feature': np.array(feature),
+            'threshold': np.array(threshold), 'value': np.array(value)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the consensus tree')
+    parser.add_argument('--trees', type=int, default=10000)
+    parser.add_argument('--genes', type=int, default=19000)
+    parser.add_argument('--max-depth', type=int, default=4, help='depth of the consensus tree')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    gene_weights = 1/np.arange(1, args.genes+1)**1.1
+    gene_weights /= gene_weights.sum()
+    start = time.perf_counter()
+    genes = iter(rng.choice(args.genes, size=100*args.trees, p=gene_weights).tolist()) # Far more than the splits of the trees
+    trees = [random_tree(rng, genes, [70, 60, 50, 70]) for _ in range(args.trees)]
+    print(f'{args.trees} random trees ({sum(len(tree["feature"]) for tree in trees)} nodes) created in {round(time.perf_counter()-start,2)}s')
+
+    start = time.perf_counter()
+    aggregator = consensus_tree.TreeAggregator(args.genes, 4)
+    for tree in trees:
+        aggregator.add(tree)
+    added = time.perf_counter()
+    aggregates = aggregator.aggregate()
+    aggregated = time.perf_counter()
+    consensus = consensus_tree.assemble_consensus(aggregates, [f'ENSG{i:011d}' for i in range(args.genes)], max_depth=args.max_depth)
+    consensus_tree.export_graphviz(consensus, ['CVDA', 'CA', 'C', 'CVD'])
+    end = time.perf_counter()
+    print(f'add: {round(added-start,2)}s, aggregate: {round(aggregated-added,2)}s, consensus: {round(end-aggregated,3)}s '
+          f'(total {round(end-start,2)}s)')
+    print(f"{aggregates['pairs'].nnz} pairs of genes, {len(consensus['gene'])} nodes in the consensus tree")
+
+if __name__ == '__main__':
+    main()
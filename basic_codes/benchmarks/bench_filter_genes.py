@@ -0,0 +1,101 @@
+import numpy as np
+import csv
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import gene_filter
+
+"""
+Title: Description
+Benchmark of the streaming gene filter against the previous filter_genes, on a synthetic GTEx-like CSV.
+The previous version scans the gene list for every cell, so it is timed only on the first rows of the file and its
+time for the whole file is estimated from them.
+"""
+
+"""
+Function: create_synthetic_csv
+
+ Description:
+    Creates a CSV of expression with Gene_ID in the first column and random log2 tpm values.
+
+ Parameters:
+ 	path - path of the CSV created
+ 	n_genes - number of genes (rows)
+ 	n_samples - number of samples (columns)
+ 	seed - seed of the random values
+
+ Returns:
+ 	List of gene ids (with version) of the file.
+"""
+
+def create_synthetic_csv(path, n_genes, n_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    genes = [f'ENSG{i:011d}.{i%20}' for i in range(n_genes)]
+    samples = [f'GTEX-{i:05d}-0011-R10a-SM-{i}' for i in range(n_samples)]
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(['Gene_ID']+samples)+'\n')
+        for start in range(0, n_genes, 1000):
+            values = np.log2(rng.gamma(0.5, 20, (min(1000, n_genes-start), n_samples))+1)
+            for i in range(len(values)):
+                f.write(genes[start+i]+','+','.join(map(repr, values[i].tolist()))+'\n')
+    return genes
+
+def legacy_filter_genes(df, genes_to_filter, max_rows=None):
+    # Same algorithm of the previous filter_genes: membership tested on a numpy array, once for every cell
+    dict_df = {}
+    rows = 0
+    with open(df,'r') as gct:
+        read=csv.reader(gct, delimiter=',')
+        for line in read:
+            if line[0]=='Gene_ID':
+                tissue=line
+                for i in range(len(line)):
+                    dict_df[line[i]]=[]
+            else:
+                for i in range(len(line)):
+                    if line[0].split('.')[0] in genes_to_filter:
+                        dict_df[tissue[i]].append(line[i])
+                rows += 1
+                if max_rows is not None and rows >= max_rows:
+                    break
+    return dict_df, rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the gene filter')
+    parser.add_argument('--genes', type=int, default=56200)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--pc-genes', type=int, default=19000)
+    parser.add_argument('--necrop-genes', type=int, default=160)
+    parser.add_argument('--legacy-rows', type=int, default=200, help='rows of the file used to time the previous version')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'log2_tpm.csv')
+        genes = create_synthetic_csv(path, args.genes, args.samples)
+        rng = np.random.default_rng(1)
+        ids = np.array([gene.split('.')[0] for gene in genes])
+        pc = rng.choice(ids, args.pc_genes, replace=False)
+        necrop = rng.choice(ids, args.necrop_genes, replace=False)
+
+        start = time.perf_counter()
+        legacy_rows = 0
+        for genes_to_filter in (pc, necrop):
+            _, legacy_rows = legacy_filter_genes(path, genes_to_filter, args.legacy_rows)
+        legacy_time = (time.perf_counter()-start)*args.genes/legacy_rows
+
+        start = time.perf_counter()
+        written = gene_filter.filter_rows(path, {'pc': (set(pc), os.path.join(folder, 'pc.csv')),
+                                                 'necrop': (set(necrop), os.path.join(folder, 'necrop.csv'))})
+        streaming_time = time.perf_counter()-start
+
+    print(f'{args.genes} genes x {args.samples} samples, lists pc ({args.pc_genes}) and necrop ({args.necrop_genes})')
+    print(f'previous filter_genes (estimated from {legacy_rows} rows, both lists): {round(legacy_time,2)}s')
+    print(f'streaming filter (single pass, both lists): {round(streaming_time,2)}s - rows written {written}')
+    print(f'speedup: {round(legacy_time/streaming_time,1)}x')
+
+if __name__ == '__main__':
+    main()
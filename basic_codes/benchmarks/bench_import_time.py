@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import statistics
+
+"""
+Title: Description
+Cold-start import time of the modules of basic_codes. Each module is imported in a new Python process (so nothing is
+cached in memory), a number of times, and the median time is reported with the heavy libraries (plotting, graphviz, tSNE
+and PCA) the import loaded. With --check, the command fails if a module used to fit trees loads one of them or takes
+longer than the budget, so it can be run by CI.
+"""
+
+basic_codes = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+heavy = ['matplotlib', 'seaborn', 'graphviz', 'sklearn.manifold', 'sklearn.decomposition'] # tSNE and PCA
+
+"""
+Variable: modules
+
+ Description:
+    Modules timed and whether they are used by workers that only fit trees (those must not load heavy libraries).
+    basic_codes is the package, imported from the folder above it.
+"""
+
+modules = {'basic_codes': True,
+           'tree_runner': True,
+           'tree_experiment': True,
+           'pipeline_stages': True,
+           'pipeline': True,
+           'tree_renderer': True,
+           'out_of_core_pca': True,
+           'dimensionality_reduction': False,
+           'expression_plots': False}
+
+_probe = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter()-start
+print(json.dumps({{'seconds': seconds, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+"""
+Function: time_import
+
+ Parameters:
+ 	module - name of the module
+ 	repeat - number of processes started
+
+ Returns:
+ 	Dictionary with the median and minimum seconds of the import and the heavy libraries loaded by it.
+ 	Prints error message and returns None if the module could not be imported.
+"""
+
+def time_import(module, repeat=5):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([basic_codes, os.path.dirname(basic_codes), env.get('PYTHONPATH', '')])
+    seconds = []
+    loaded = []
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-c', _probe.format(module=module, heavy=heavy)], env=env,
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f'Error: {module} not imported\n{process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""}')
+            return None
+        record = json.loads(process.stdout.strip().splitlines()[-1])
+        seconds.append(record['seconds'])
+        loaded = record['heavy']
+    return {'median': statistics.median(seconds), 'min': min(seconds), 'heavy': loaded}
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the import of the modules of basic_codes in new processes')
+    parser.add_argument('--repeat', type=int, default=5, help='processes started for each module')
+    parser.add_argument('--modules', default=','.join(modules), help='modules timed, separated by commas')
+    parser.add_argument('--check', action='store_true', help='fails if a module used to fit trees loads a heavy library or exceeds the budget')
+    parser.add_argument('--budget', type=float, default=2.0, help='maximum median seconds of the modules used to fit trees (with --check)')
+    args = parser.parse_args()
+    failures = []
+    for module in args.modules.split(','):
+        result = time_import(module, args.repeat)
+        if result is None:
+            failures.append(f'{module} not imported')
+            continue
+        print(f"{module}: {round(1000*result['median'])}ms (min {round(1000*result['min'])}ms)" +
+              (f" loads {', '.join(result['heavy'])}" if result['heavy'] else ''))
+        if modules.get(module, False):
+            if result['heavy']:
+                failures.append(f"{module} loads {', '.join(result['heavy'])}")
+            if result['median'] > args.budget:
+                failures.append(f"{module} takes {round(result['median'],2)}s")
+    if args.check and failures:
+        for failure in failures:
+            print(f'Error: {failure}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
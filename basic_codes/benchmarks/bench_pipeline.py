@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic_gtex
+
+"""
+Title: Description
+Benchmark of the six scripts of basic_codes on synthetic GTEx-like files (see synthetic_gtex), at several sizes. Each script
+is run in its own process, in the order of the pipeline, with a util module whose path__ points to the synthetic files, and
+its time is appended to a JSON lines file, so runs of different versions of the code can be compared with --compare.
+"""
+
+scripts = ['1-tpm_data_from_tissues.py',
+           '2-filter_genes_from_log2_expression_data.py',
+           '3-gtex_samples_into_quartiles-run_pca-plot.py',
+           '4-plot_of_gene_expression_by_quartile.py',
+           '5-erase_samples_from_quartiles.py',
+           '6-apply_decision_tree_gtex.py']
+
+basic_codes = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+"""
+Function: create_util
+
+ Description:
+    Creates a util module with path__ levels folders below root, like the folder of the scripts in the project
+    (scripts 1 to 5 go up 3 folders to find data/ and script 6 goes up 4 folders).
+
+ Parameters:
+ 	root - folder with data/
+ 	levels - number of folders between root and path__
+
+ Returns:
+ 	Folder of the util module (for PYTHONPATH).
+"""
+
+def create_util(root, levels):
+    folder = os.path.join(root, 'util_%d' % levels)
+    path = os.path.join(root, *['level_%d' % i for i in range(levels)]) + os.sep
+    os.makedirs(path, exist_ok=True)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'util.py'), 'w') as f:
+        f.write(f'path__ = {path!r}\n')
+    return folder
+
+"""
+Function: run_script
+
+ Parameters:
+ 	script - name of the script in basic_codes
+ 	util_folder - folder of the util module
+ 	cwd - working folder of the script (figures saved without path go there)
+ 	timeout - maximum seconds of the script
+
+ Returns:
+ 	Dictionary with seconds, status ('ok', 'failed' or 'timeout'), returncode and the last lines of stderr.
+"""
+
+def run_script(script, util_folder, cwd, timeout):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([util_folder, os.path.abspath(basic_codes), env.get('PYTHONPATH', '')])
+    env['MPLBACKEND'] = 'Agg' # plt.show() returns at once
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([sys.executable, os.path.join(os.path.abspath(basic_codes), script)], cwd=cwd, env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'seconds': time.perf_counter()-start, 'status': 'timeout', 'returncode': None, 'error': ''}
+    seconds = time.perf_counter()-start
+    return {'seconds': seconds, 'status': 'ok' if process.returncode == 0 else 'failed', 'returncode': process.returncode,
+            'error': '\n'.join(process.stderr.strip().splitlines()[-3:]) if process.returncode != 0 else ''}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=basic_codes, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+"""
+Function: run_pipeline
+
+ Description:
+    Creates the synthetic files of one size in a temporary folder and runs the scripts in order. A script that fails does
+    not stop the next ones, but their inputs may be missing.
+
+ Parameters:
+ 	n_genes - number of genes
+ 	n_samples - number of samples of each tissue
+ 	selected - names of the scripts run
+ 	timeout - maximum seconds of each script
+ 	seed - seed of the synthetic files
+
+ Returns:
+ 	List of dictionaries, one for each script, with size, script, seconds, status, returncode and error.
+"""
+
+def run_pipeline(n_genes, n_samples, selected, timeout, seed=0):
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        synthetic_gtex.create_fixture(root, n_genes, n_samples, seed)
+        print(f'{n_genes}x{n_samples}: fixture in {round(time.perf_counter()-start,2)}s')
+        utils = {3: create_util(root, 3), 4: create_util(root, 4)}
+        for script in selected:
+            result = run_script(script, utils[4] if script.startswith('6-') else utils[3], root, timeout)
+            result.update({'size': f'{n_genes}x{n_samples}', 'script': script})
+            results.append(result)
+            print(f"  {script}: {round(result['seconds'],2)}s {result['status']}" + (f"\n    {result['error']}" if result['error'] else ''))
+    return results
+
+"""
+Function: compare
+
+ Parameters:
+ 	results - results of this run
+ 	previous_path - JSON lines file of a previous run
+
+ Returns:
+ 	Text with the time of each script and size in both runs and their ratio (latest record of the previous file for each
+ 	script and size).
+"""
+
+def compare(results, previous_path):
+    previous = {}
+    with open(previous_path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record['status'] == 'ok':
+                previous[(record['size'], record['script'])] = record
+    lines = []
+    for result in results:
+        old = previous.get((result['size'], result['script']))
+        if old is None or result['status'] != 'ok':
+            lines.append(f"{result['size']} {result['script']}: no comparison")
+            continue
+        lines.append(f"{result['size']} {result['script']}: {round(old['seconds'],2)}s ({old['revision']}) -> "
+                     f"{round(result['seconds'],2)}s, ratio {round(result['seconds']/old['seconds'],2)}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Times the scripts of the pipeline on synthetic GTEx-like files')
+    parser.add_argument('--sizes', default='500x60,2000x200', help='genes x samples of each tissue, separated by commas')
+    parser.add_argument('--scripts', default='1,2,3,4,5,6', help='numbers of the scripts run')
+    parser.add_argument('--timeout', type=float, default=3600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_pipeline_results.jsonl', help='JSON lines file where results are appended')
+    parser.add_argument('--compare', default=None, help='JSON lines file of a previous run')
+    args = parser.parse_args()
+    selected = [script for script in scripts if script.split('-')[0] in args.scripts.split(',')]
+    revision = git_revision()
+    results = []
+    for size in args.sizes.split(','):
+        n_genes, n_samples = [int(value) for value in size.split('x')]
+        results += run_pipeline(n_genes, n_samples, selected, args.timeout, args.seed)
+    with open(args.output, 'a') as f:
+        for result in results:
+            f.write(json.dumps({'time': time.time(), 'revision': revision, **result})+'\n')
+    if args.compare is not None:
+        print(compare(results, args.compare))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tree_runner
+
+"""
+Title: Description
+Benchmark of the tree engines of tree_runner ('sklearn' and 'histogram') on a synthetic expression matrix shaped like
+the GTEx coronary data: time to fit the trees of an experiment and agreement of the splits of the trees with the same seed.
+Deeper nodes usually have several genes with the same improvement, and each engine breaks these ties at random, so the
+agreement between engines is compared with the agreement between sklearn trees of different seeds. The forest engines
+('random_forest' and 'extra_trees', one fit for all the trees on threads) are only timed, their trees are randomized on purpose.
+"""
+
+"""
+Function: create_synthetic_matrix
+
+ Description:
+    Creates log2(tpm+1)-like values for samples of four classes, with some genes whose expression depends on the class.
+
+ Parameters:
+ 	n_samples - number of samples
+ 	n_genes - number of genes
+ 	n_informative - number of genes that depend on the class
+ 	seed - seed of the random values
+
+ Returns:
+ 	Matrix of values (float32, samples x genes) and classes of the samples (0 to 3).
+"""
+
+def create_synthetic_matrix(n_samples, n_genes, n_informative=50, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 4, n_samples)
+    x = np.log2(rng.gamma(0.5, 20, (n_samples, n_genes))+1)
+    effects = rng.normal(0, 0.7, (n_informative, 4))
+    informative = rng.choice(n_genes, n_informative, replace=False)
+    x[:, informative] += effects[:, y].T
+    return np.round(np.maximum(x, 0), 3).astype(np.float32), y # Rounded like the tpm of GTEx, which has repeated values
+
+def splits_of(clf, order):
+    # (gene, threshold) of the internal nodes, with genes in the original column order
+    tree_ = clf.tree_
+    internal = np.flatnonzero(tree_.children_left != -1)
+    return set(zip(np.asarray(order)[tree_.feature[internal]].tolist(), np.round(tree_.threshold[internal], 5).tolist()))
+
+def shuffle_columns(columns, rng):
+    return rng.sample(columns, len(columns))
+
+def time_engine(x, y, tasks, engine, n_jobs):
+    trees = []
+    start = time.perf_counter()
+    for iteration, clf in tree_runner.fit_trees(x, y, tasks, n_jobs, engine, shuffle_columns):
+        trees.append(clf)
+    return trees, time.perf_counter()-start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the tree engines')
+    parser.add_argument('--trees', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=250)
+    parser.add_argument('--genes', type=int, default=19000)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+    x, y = create_synthetic_matrix(args.samples, args.genes)
+    tasks = tree_runner.create_tasks(tree_runner.tree_seeds(0, args.trees))
+    orders = [tree_runner.tree_order(args.genes, seed, shuffle_columns) for _, seed in tasks]
+    results = {}
+    for engine in ['sklearn', 'histogram']:
+        results[engine], seconds = time_engine(x, y, tasks, engine, args.jobs)
+        print(f'{engine}: {args.trees} trees in {round(seconds,2)}s ({round(args.trees/seconds,2)} trees/s)')
+    for engine in tree_runner.forest_engines:
+        start = time.perf_counter()
+        fitted = list(tree_runner.fit_forest(x, y, tasks, args.jobs, engine, trees_per_fit=args.trees))
+        seconds = time.perf_counter()-start
+        print(f'{engine}: {len(fitted)} trees in {round(seconds,2)}s ({round(len(fitted)/seconds,2)} trees/s)')
+
+    same_root = 0
+    shared = []
+    same_prediction = []
+    between_seeds = []
+    x_test, _ = create_synthetic_matrix(args.samples, args.genes, seed=1)
+    for i in range(args.trees):
+        order = orders[i]
+        sk, hist = results['sklearn'][i], results['histogram'][i]
+        splits_sk, splits_hist = splits_of(sk, order), splits_of(hist, order)
+        same_root += (order[sk.tree_.feature[0]], round(sk.tree_.threshold[0], 5)) == (order[hist.tree_.feature[0]], round(hist.tree_.threshold[0], 5))
+        shared.append(len(splits_sk & splits_hist)/max(len(splits_sk | splits_hist), 1))
+        same_prediction.append(np.mean(sk.predict(x_test[:, order]) == hist.predict(x_test[:, order])))
+        if i > 0:
+            splits_previous = splits_of(results['sklearn'][i-1], orders[i-1])
+            between_seeds.append(len(splits_sk & splits_previous)/max(len(splits_sk | splits_previous), 1))
+    print(f'same root split: {same_root}/{args.trees} trees')
+    print(f'splits in both trees (jaccard): {round(float(np.mean(shared)),3)}')
+    if between_seeds:
+        print(f'splits in both trees, sklearn with different seeds (jaccard): {round(float(np.mean(between_seeds)),3)}')
+    print(f'same prediction on other samples: {round(float(np.mean(same_prediction)),3)}')
+
+if __name__ == '__main__':
+    main()
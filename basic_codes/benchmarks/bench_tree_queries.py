@@ -0,0 +1,101 @@
+import numpy as np
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tree_queries
+import db_schema
+
+"""
+Title: Description
+Benchmark of the queries of tree_queries on a synthetic database, before and after create_indexes.
+"""
+
+"""
+Function: create_synthetic_database
+
+ Description:
+    Fills a database with random trees: n_experiments experiments of n_trees trees each, with genes chosen with a skewed
+    distribution so some pairs are much more frequent than others.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	n_experiments - number of experiments
+ 	n_trees - number of trees of each experiment
+ 	n_genes - number of genes
+ 	nodes_per_tree - internal nodes of each tree
+ 	seed - seed of the random values
+"""
+
+def create_synthetic_database(db, n_experiments, n_trees, n_genes, nodes_per_tree=30, seed=0):
+    rng = np.random.default_rng(seed)
+    db_schema.create_database(db)
+    genes = [f'ENSG{i:011d}' for i in range(n_genes)]
+    db.executemany('INSERT INTO gene (gene_name, gene_symbol) VALUES (?,?)', [(g, f'SYM{i}') for i, g in enumerate(genes)])
+    classes = ['CVDA', 'CVD', 'CA', 'C']
+    tree_id = 0
+    path_id = 0
+    for exp in range(1, n_experiments+1):
+        db.execute('INSERT INTO experiencia (description) VALUES (?)', (f'synthetic {exp}',))
+        for t in range(n_trees):
+            tree_id += 1
+            db.execute('INSERT INTO tree (experiencia_id) VALUES (?)', (exp,))
+            nodes = np.minimum(rng.zipf(1.3, nodes_per_tree)-1, n_genes-1)
+            depth = np.floor(np.log2(np.arange(nodes_per_tree)+1)).astype(int)
+            counts = rng.integers(0, 40, (nodes_per_tree, 4))
+            fathers = np.concatenate([[0], (np.arange(1, nodes_per_tree)-1)//2])
+            db.executemany('INSERT INTO father_and_son_nodes (gene_id_parent,gene_id_son,experiencia_id,depth,CVDA_father,CA_father,'
+                           'C_father,CVD_father,CVDA_son,CA_son,C_son,CVD_son,expression_value) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)',
+                           [(genes[nodes[fathers[i]]], genes[nodes[i]], exp, int(depth[i]), *counts[fathers[i]].tolist(),
+                             *counts[i].tolist(), float(rng.random()*10)) for i in range(nodes_per_tree)])
+            db.executemany('INSERT INTO place_of_genes_in_tree (gene_name,tree_generation,experiencia_id,depth,CVDA,CA,C,CVD) VALUES (?,?,?,?,?,?,?,?)',
+                           [(genes[nodes[i]], tree_id, exp, int(depth[i]), *counts[i].tolist()) for i in range(nodes_per_tree)])
+            for leaf in range(nodes_per_tree//2, nodes_per_tree):
+                path_id += 1
+                db.execute('INSERT INTO path (path_id,cond,nodes,experiencia_id) VALUES (?,?,?,?)', (path_id, classes[leaf % 4], int(depth[leaf]), exp))
+                chain = [leaf]
+                while chain[-1] != 0:
+                    chain.append(int(fathers[chain[-1]]))
+                db.executemany('INSERT INTO genes_in_path (gene_id,depth,path_id,experiencia_id) VALUES (?,?,?,?)',
+                               [(genes[nodes[n]], int(depth[n]), path_id, exp) for n in chain])
+    db.commit()
+
+def time_queries(db, experiencia_id, repeat):
+    queries = {'top_pairs': lambda: tree_queries.top_pairs(db, experiencia_id, limit=50),
+               'depth_distribution': lambda: tree_queries.depth_distribution(db, experiencia_id, 'ENSG00000000001'),
+               'paths_by_class': lambda: tree_queries.paths_by_class(db, experiencia_id, 'CVD')}
+    times = {}
+    for name in queries:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            queries[name]()
+        times[name] = (time.perf_counter()-start)/repeat
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the analysis queries')
+    parser.add_argument('--trees', type=int, default=10000, help='trees of each experiment')
+    parser.add_argument('--experiments', type=int, default=3)
+    parser.add_argument('--genes', type=int, default=19000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        db = sqlite3.connect(os.path.join(folder, 'bench.sqlite3'))
+        start = time.perf_counter()
+        create_synthetic_database(db, args.experiments, args.trees, args.genes)
+        print(f'{args.experiments} experiments x {args.trees} trees created in {round(time.perf_counter()-start,1)}s')
+        before = time_queries(db, 2, args.repeat)
+        start = time.perf_counter()
+        tree_queries.create_indexes(db)
+        print(f'indexes created in {round(time.perf_counter()-start,1)}s')
+        after = time_queries(db, 2, args.repeat)
+        for name in before:
+            print(f'{name}: {round(before[name]*1000,1)}ms -> {round(after[name]*1000,1)}ms ({round(before[name]/after[name],1)}x)')
+        db.close()
+
+if __name__ == '__main__':
+    main()
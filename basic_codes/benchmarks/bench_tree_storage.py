@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import db_schema
+import tree_store
+import tree_experiment
+from bench_tree_engines import create_synthetic_matrix
+
+"""
+Title: Description
+Benchmark of the storage modes of tree_experiment on a synthetic expression matrix: time of the tree loop and size of the
+database with the trees saved in the relational tables and as arrays (tree_store), and time to materialize the relational
+tables from the arrays. The materialized tables are compared with the relational ones, row by row.
+"""
+
+def database_size(path):
+    return sum(os.path.getsize(path+suffix) for suffix in ['', '-wal'] if os.path.exists(path+suffix))
+
+def table_rows(db, experiencia_id):
+    rows = {}
+    for table in tree_store.legacy_tables:
+        if table != 'gene_pair_aggregate': # Float sums of the aggregate depend on the order of the updates
+            rows[table] = db.execute(f'SELECT * FROM {table} WHERE experiencia_id = ? ORDER BY 1;', (experiencia_id,)).fetchall()
+    return rows
+
+def run_storage(df, folder, storage, args):
+    path = os.path.join(folder, f'{storage}.sqlite3')
+    db = sqlite3.connect(path)
+    db_schema.create_database(db)
+    start = time.perf_counter()
+    run = tree_experiment.run_tree_experiment(df, db, 'Benchmark', n_times_run=args.trees, n_jobs=args.jobs, engine=args.engine,
+                                              trees_per_commit=args.trees_per_commit, storage=storage, render_mode='off',
+                                              render_consensus=False, results_dir=folder)
+    seconds = time.perf_counter()-start
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE);')
+    return db, path, run['experiencia_id'], seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the storage modes of the trees')
+    parser.add_argument('--trees', type=int, default=200)
+    parser.add_argument('--samples', type=int, default=250)
+    parser.add_argument('--genes', type=int, default=2000)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--engine', default='histogram')
+    parser.add_argument('--trees-per-commit', type=int, default=50)
+    args = parser.parse_args()
+    x, y = create_synthetic_matrix(args.samples, args.genes)
+    df = pd.DataFrame(x, columns=[f'ENSG{i:011d}' for i in range(args.genes)])
+    df['Pacient_Condition'] = pd.Series(['CVDA', 'CA', 'C', 'CVD']).iloc[y].values
+    with tempfile.TemporaryDirectory() as folder:
+        results = {}
+        for storage in ['relational', 'compact']:
+            db, path, exp, seconds = run_storage(df, folder, storage, args)
+            results[storage] = (db, exp)
+            print(f'{storage}: {args.trees} trees in {round(seconds,2)}s ({round(args.trees/seconds,2)} trees/s), database of {round(database_size(path)/2**20,2)}MB')
+        db, exp = results['compact']
+        start = time.perf_counter()
+        n_trees = tree_store.materialize(db, exp)
+        print(f'materialize: {n_trees} trees in {round(time.perf_counter()-start,2)}s')
+        same = table_rows(db, exp) == table_rows(*results['relational'])
+        print(f'materialized tables equal to the relational tables: {same}')
+        for db, exp in results.values():
+            db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import os
+import sys
+import sqlite3
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import db_schema
+
+"""
+Title: Description
+Generator of synthetic GTEx-like files, with the names and formats read by the scripts of basic_codes, so the pipeline can be
+run and timed without the GTEx data. Files are created under root/data like in the project:
+
+    data/raw/gtex - GCT of tpm and SampleAttributesDS (SMTSD and SMTSISCH)
+    data/external - lists of protein coding and necroptosis genes
+    data/interim/gtex_data - log2(tpm+1) of the heart tissues read by script 4 (script 1 creates the one of Liver)
+    data/processed/gtex_data - labelled dataframe (Pacient_Condition) read by script 6
+    data/interim/sql - empty database with the schema of db_schema
+"""
+
+tissues = {'Liver': 'Liver',
+           'coronary': 'Artery - Coronary',
+           'atrial_appendage': 'Heart - Atrial Appendage',
+           'left_ventricle': 'Heart - Left Ventricle'}
+
+classes = ['CVDA', 'CVD', 'CA', 'C']
+
+gct_name = 'GTEx_Analysis_2017-06-05_v8_RNASeQCv1.1.9_gene_tpm.gct'
+attributes_name = 'GTEx_Analysis_v8_Annotations_SampleAttributesDS.txt'
+processed_name = 'coronary_gtex_log2_tpm_pacient_condition_only_protein_coding_genes_quartiles_1_2.csv'
+
+"""
+Function: create_fixture
+
+ Description:
+    Creates every file of the pipeline for n_genes genes and n_samples samples of each tissue. Expression follows a gamma
+    distribution (many genes with low tpm), some genes change with the time of collection (SMTSISCH) and some with the
+    class of the sample, so the PCA, the plots and the trees have structure to find.
+
+ Parameters:
+ 	root - folder where data/ is created
+ 	n_genes - number of genes
+ 	n_samples - number of samples of each tissue
+ 	seed - seed of the random values
+
+ Returns:
+ 	Dictionary with the paths of the files created.
+"""
+
+def create_fixture(root, n_genes, n_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    folders = {name: os.path.join(root, 'data', *name.split('/')) for name in
+               ['raw/gtex', 'external', 'interim/gtex_data', 'processed/gtex_data', 'interim/sql']}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+    genes = np.array([f'ENSG{i:011d}' for i in range(n_genes)])
+    versions = np.array([f'{gene}.{i%20+1}' for i, gene in enumerate(genes)])
+
+    samples = {}
+    ischemic_time = {}
+    for t, tissue in enumerate(tissues):
+        samples[tissue] = [f'GTEX-{t}{i:04d}-0011-R10a-SM-{t}{i:04d}' for i in range(n_samples)]
+        ischemic_time[tissue] = rng.integers(30, 1500, n_samples) # Minutes
+    attributes = pd.DataFrame({'SAMPID': sum(samples.values(), []),
+                               'SMTS': sum([[tissues[tissue].split(' - ')[0]]*n_samples for tissue in tissues], []),
+                               'SMTSD': sum([[tissues[tissue]]*n_samples for tissue in tissues], []),
+                               'SMTSISCH': np.concatenate(list(ischemic_time.values()))})
+    attributes.to_csv(os.path.join(folders['raw/gtex'], attributes_name), sep='\t', index=False)
+
+    # tpm of all samples, written by blocks of genes
+    all_samples = attributes['SAMPID'].tolist()
+    time_effect = np.concatenate(list(ischemic_time.values()))/1500
+    responsive = rng.random(n_genes) < 0.1
+    gct_path = os.path.join(folders['raw/gtex'], gct_name)
+    log2_tpm = {tissue: [] for tissue in tissues if tissue != 'Liver'}
+    with open(gct_path, 'w') as gct:
+        gct.write(f'#1.2\n{n_genes}\t{len(all_samples)}\n')
+        gct.write('\t'.join(['Name', 'Description']+all_samples)+'\n')
+        for start in range(0, n_genes, 1000):
+            block = slice(start, min(start+1000, n_genes))
+            tpm = rng.gamma(0.5, 20, (block.stop-block.start, len(all_samples)))
+            tpm[responsive[block]] *= 1+2*time_effect
+            tpm = np.round(tpm, 2)
+            for i in range(len(tpm)):
+                gct.write(f'{versions[block][i]}\tSYM{start+i}\t'+'\t'.join(map(str, tpm[i].tolist()))+'\n')
+            for t, tissue in enumerate(tissues):
+                if tissue in log2_tpm:
+                    log2_tpm[tissue].append(np.log2(tpm[:, t*n_samples:(t+1)*n_samples]+1))
+
+    # Same files created by script 1 for the heart tissues
+    for tissue in log2_tpm:
+        df = pd.DataFrame(np.vstack(log2_tpm[tissue]), index=pd.Index(versions, name='Gene_ID'), columns=samples[tissue])
+        df.to_csv(os.path.join(folders['interim/gtex_data'], f'log2_tpm_data_{tissue}_gtex.csv'))
+
+    protein_coding = genes[rng.random(n_genes) < 0.8]
+    necroptosis = genes[rng.random(n_genes) < 0.02]
+    pd.DataFrame({'Ensembl gene ID': protein_coding, 'Gene name': [f'SYM{g[4:].lstrip("0") or 0}' for g in protein_coding]}).to_csv(
+        os.path.join(folders['external'], 'genes_protein_conding.tsv'), sep='\t', index=False)
+    pd.DataFrame({'x': necroptosis}).to_csv(os.path.join(folders['external'], 'genes_necroptose.csv'), index=False)
+
+    # Labelled coronary samples for the trees: some protein coding genes depend on the class
+    y = rng.integers(0, len(classes), n_samples)
+    x = np.round(np.log2(rng.gamma(0.5, 20, (n_samples, len(protein_coding)))+1), 3)
+    informative = rng.choice(len(protein_coding), min(50, len(protein_coding)), replace=False)
+    x[:, informative] += rng.normal(0, 0.7, (len(informative), len(classes)))[:, y].T
+    processed = pd.DataFrame(np.maximum(x, 0), index=samples['coronary'], columns=protein_coding)
+    processed['Pacient_Condition'] = np.array(classes)[y]
+    processed_path = os.path.join(folders['processed/gtex_data'], processed_name)
+    processed.to_csv(processed_path)
+
+    db_path = os.path.join(folders['interim/sql'], 'bd_ic_v2.sqlite3')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = sqlite3.connect(db_path)
+    db_schema.create_database(db)
+    db.executemany('INSERT INTO gene (gene_name, gene_symbol, gene_name_without_dot) VALUES (?,?,?)',
+                   [(gene, f'SYM{i}', gene) for i, gene in enumerate(genes.tolist())])
+    db.commit()
+    db.close()
+    return {'gct': gct_path, 'attributes': os.path.join(folders['raw/gtex'], attributes_name),
+            'processed': processed_path, 'database': db_path}
+
+def main():
+    parser = argparse.ArgumentParser(description='Creates synthetic GTEx-like files')
+    parser.add_argument('root', help='folder where data/ is created')
+    parser.add_argument('--genes', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=100, help='samples of each tissue')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    paths = create_fixture(args.root, args.genes, args.samples, args.seed)
+    for name in paths:
+        print(f'{name}: {paths[name]}')
+
+if __name__ == '__main__':
+    main()
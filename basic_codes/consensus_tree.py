@@ -0,0 +1,402 @@
+import os
+import numpy as np
+from scipy import sparse
+import tree_store
+import tree_extraction
+
+"""
+Title: Description
+Consensus ("average") tree of an experiment, built in memory from the arrays of its trees instead of the selects over
+father_and_son_nodes of the README. The trees are given one by one (read from tree_arrays, rebuilt from the relational
+tables or taken from the fitted trees) and, at the end, the nodes of every tree are concatenated and aggregated at once
+with numpy and scipy.sparse:
+
+    left_pairs, right_pairs - sparse genes x genes matrices with the number of times gene j was the left (or right) son of
+                              gene i, and the sums of the thresholds of those sons (left_thresholds, right_thresholds)
+    pairs - left_pairs+right_pairs, the co-occurrence of father_and_son_nodes (without the roots saved as their own father)
+    roots, root_thresholds - number of trees with each gene at the root and sum of its thresholds
+    depth_histogram - sparse genes x depths matrix with the number of nodes of each gene at each depth
+    leaf_counts - samples of each class (genes x classes) in the leaves whose father splits on the gene
+    left_pair_values, right_pair_values - samples of each class in the left (or right) sons of gene i that split on gene j,
+                                          as sparse genes x (genes*classes) matrices (the classes of the pair (i, j) are
+                                          in the columns j*classes to (j+1)*classes of row i)
+    left_pair_left_values, left_pair_right_values, right_pair_left_values, right_pair_right_values - in the same format,
+                                          samples of each class that went to the left (or right) son of those nodes
+    root_values, root_left_values, root_right_values - samples of each class (genes x classes) in the roots of each gene
+                                          and in their left (or right) sons
+
+The consensus tree starts from the most frequent root and, for each side of each node, takes the most frequent son of that
+side among the genes not already in the path, while the pair appeared in at least min_fraction of the trees. The samples of
+a node are summed over the trees with the gene in the same position (the same father gene and side), so they match the number
+of trees of the node. It is written
+in the graphviz format of sklearn.tree.export_graphviz, the one of the trees rendered by print_tree_in_pdf.
+"""
+
+"""
+Class: TreeAggregator
+
+ Description:
+    Keeps the arrays of the trees added and aggregates them in a single pass (see aggregate). Features are positions in the
+    genes of the experiment, like in tree_store.
+
+ Parameters:
+ 	n_genes - number of genes of the experiment
+ 	n_classes - number of classes of the experiment
+"""
+
+class TreeAggregator:
+
+    def __init__(self, n_genes, n_classes):
+        self.n_genes = n_genes
+        self.n_classes = n_classes
+        self.trees = []
+
+    """
+    Function: add
+
+     Parameters:
+     	arrays - dictionary with children_left, children_right, feature (position of the gene), threshold and value (class
+     	         counts of each node), as returned by tree_store.tree_arrays and tree_store.read_trees
+    """
+
+    def add(self, arrays):
+        self.trees.append((np.asarray(arrays['children_left'], dtype=np.int64), np.asarray(arrays['children_right'], dtype=np.int64),
+                           np.asarray(arrays['feature'], dtype=np.int64), np.asarray(arrays['threshold'], dtype=np.float64),
+                           np.asarray(arrays['value'], dtype=np.int64)))
+
+    """
+    Function: add_fitted
+
+     Parameters:
+     	clf - decision tree model fitted
+     	order - permutation of the columns of the tree (feature j is gene order[j])
+    """
+
+    def add_fitted(self, clf, order):
+        self.add(tree_store.tree_arrays(clf, order))
+
+    """
+    Function: aggregate
+
+     Description:
+        Concatenates the nodes of every tree, with the children shifted to the position of their tree, and computes the
+        parent, side and depth of every node (walking all trees level by level at the same time) and the aggregates.
+
+     Returns:
+     	Dictionary with n_trees and the aggregates described in the header of this file.
+    """
+
+    def aggregate(self):
+        n, k = self.n_genes, self.n_classes
+        sizes = np.array([len(tree[0]) for tree in self.trees], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        if len(self.trees) == 0:
+            left = right = feature = np.zeros(0, dtype=np.int64)
+            threshold = np.zeros(0)
+            value = np.zeros((0, k), dtype=np.int64)
+        else:
+            shift = np.repeat(starts, sizes)
+            left, right, feature, threshold, value = [np.concatenate([tree[i] for tree in self.trees]) for i in range(5)]
+            left = np.where(left != -1, left+shift, -1)
+            right = np.where(right != -1, right+shift, -1)
+
+        internal = np.flatnonzero(left != -1)
+        parent = np.full(len(left), -1, dtype=np.int64)
+        parent[left[internal]] = internal
+        parent[right[internal]] = internal
+        is_left = np.zeros(len(left), dtype=bool)
+        is_left[left[internal]] = True
+        depth = np.zeros(len(left), dtype=np.int64)
+        frontier = starts
+        level = 0
+        while len(frontier):
+            depth[frontier] = level
+            frontier = frontier[left[frontier] != -1]
+            frontier = np.concatenate([left[frontier], right[frontier]])
+            level += 1
+
+        sons = internal[parent[internal] != -1]
+        aggregates = {'n_trees': len(self.trees)}
+        for side, of_side in [('left', is_left[sons]), ('right', ~is_left[sons])]:
+            nodes = sons[of_side]
+            fathers = feature[parent[nodes]]
+            genes = feature[nodes]
+            aggregates[f'{side}_pairs'] = sparse.csr_matrix((np.ones(len(genes), dtype=np.int64), (fathers, genes)), shape=(n, n))
+            aggregates[f'{side}_thresholds'] = sparse.csr_matrix((threshold[nodes], (fathers, genes)), shape=(n, n))
+            aggregates[f'{side}_pair_values'] = _sum_by_pair(fathers, genes, value[nodes], n, k)
+            aggregates[f'{side}_pair_left_values'] = _sum_by_pair(fathers, genes, value[left[nodes]], n, k)
+            aggregates[f'{side}_pair_right_values'] = _sum_by_pair(fathers, genes, value[right[nodes]], n, k)
+        aggregates['pairs'] = aggregates['left_pairs']+aggregates['right_pairs']
+
+        roots = starts[left[starts] != -1] # Trees with a single leaf have no root gene
+        aggregates['roots'] = np.bincount(feature[roots], minlength=n)
+        aggregates['root_thresholds'] = np.bincount(feature[roots], weights=threshold[roots], minlength=n)
+        aggregates['root_values'] = _sum_by_gene(feature[roots], value[roots], n, k)
+        aggregates['root_left_values'] = _sum_by_gene(feature[roots], value[left[roots]], n, k)
+        aggregates['root_right_values'] = _sum_by_gene(feature[roots], value[right[roots]], n, k)
+        aggregates['depth_histogram'] = sparse.csr_matrix((np.ones(len(internal), dtype=np.int64), (feature[internal], depth[internal])),
+                                                          shape=(n, max(level-1, 1)))
+
+        leaves = np.flatnonzero((left == -1) & (parent != -1))
+        aggregates['leaf_counts'] = _sum_by_gene(feature[parent[leaves]], value[leaves], n, k)
+        return aggregates
+
+def _sum_by_gene(genes, counts, n_genes, n_classes):
+    # Sum of the class counts of the nodes of each gene (genes x classes)
+    summed = np.zeros((n_genes, n_classes), dtype=np.int64)
+    for j in range(n_classes):
+        summed[:, j] = np.bincount(genes, weights=counts[:, j], minlength=n_genes).astype(np.int64)
+    return summed
+
+def _sum_by_pair(fathers, genes, counts, n_genes, n_classes):
+    # Sum of the class counts of the nodes of each pair (father, son), genes x (genes*classes), summed by csr_matrix
+    columns = (genes[:, None]*n_classes+np.arange(n_classes)).ravel()
+    return sparse.csr_matrix((counts.ravel(), (np.repeat(fathers, n_classes), columns)), shape=(n_genes, n_genes*n_classes))
+
+def _pair_value(matrix, father, gene, n_classes):
+    # Class counts of the pair (father, son) in a matrix of _sum_by_pair
+    return matrix[father, gene*n_classes:(gene+1)*n_classes].toarray().ravel()
+
+"""
+Function: relational_trees
+
+ Description:
+    Arrays of the trees of an experiment saved in the relational tables, in the format of tree_store.read_trees. The tables
+    keep no side of the sons, so the shape of each tree comes from its root-to-leaf paths (genes_in_path), written for the
+    leaves in the order of sklearn (depth first, left son first): a node is a leaf when the depth of the next path ends there.
+    The internal nodes are the rows of tree_node of the tree (same order), their thresholds and class counts are the rows of
+    father_and_son_nodes of their genes (written grouped by gene, see tree_rows.add_tree_rows) and the counts of a leaf are the
+    ones of its father minus the ones of its brother. When both sons are leaves, each class goes to the leaf of its paths
+    (path.cond); a class in both leaves (only when samples with the same expressions have different classes) is split in half.
+    Only the four class counts saved in the tables (CVDA, CA, C and CVD columns) are read.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	genes - names of the genes, in the order of the positions of the features
+ 	classes - name of each class, in the order of the class counts
+
+ Returns:
+ 	Generator of (tree_generation, dictionary of the arrays of the tree).
+"""
+
+def relational_trees(db, experiencia_id, genes, classes):
+    k = len(classes)
+    position_of_gene = {name: i for i, name in enumerate(genes)}
+    position_of_class = {str(name): i for i, name in enumerate(classes)}
+    sizes = dict(db.execute('SELECT tree_id, COUNT(*) FROM tree_node WHERE experiencia_id = ? GROUP BY tree_id;', (experiencia_id,)))
+    nodes = db.execute('SELECT gene_id FROM tree_node WHERE experiencia_id = ? ORDER BY tree_node_id;', (experiencia_id,))
+    edges = db.execute("""SELECT expression_value, CVDA_son, CA_son, C_son, CVD_son FROM father_and_son_nodes
+        WHERE experiencia_id = ? ORDER BY father_and_son_nodes_id;""", (experiencia_id,))
+    leaves = db.execute('SELECT path_id, COUNT(*) FROM genes_in_path WHERE experiencia_id = ? GROUP BY path_id ORDER BY path_id;',
+                        (experiencia_id,))
+    paths = db.execute('SELECT path_id, cond FROM path WHERE experiencia_id = ? AND nodes > 0 ORDER BY path_id;', (experiencia_id,))
+    next_path = paths.fetchone()
+    for (cursor_id,) in db.execute('SELECT tree_generation FROM tree WHERE experiencia_id = ? ORDER BY tree_generation;', (experiencia_id,)):
+        m = sizes.get(cursor_id, 0)
+        if m == 0: # Tree with a single leaf
+            yield cursor_id, {'children_left': np.array([-1]), 'children_right': np.array([-1]), 'feature': np.array([-2]),
+                              'threshold': np.array([-2.0]), 'value': np.zeros((1, k), dtype=np.int64)}
+            continue
+        feature = np.array([position_of_gene[nodes.fetchone()[0]] for _ in range(m)], dtype=np.int64) # Internal nodes in the order of sklearn
+        threshold = np.zeros(m)
+        counts = np.zeros((m, k), dtype=np.int64)
+        for node, row in zip(tree_extraction.group_by_first_appearance(feature), [edges.fetchone() for _ in range(m)]): # Rows grouped by gene
+            threshold[node] = row[0]
+            counts[node, :min(k, 4)] = row[1:1+min(k, 4)]
+        leaf_depths = []
+        leaf_classes = []
+        for path_id, depth in [leaves.fetchone() for _ in range(m+1)]:
+            leaf_depths.append(depth)
+            leaf_classes.append(set())
+            while next_path is not None and next_path[0] <= path_id: # Rows of path of the leaf, one for each class in it
+                leaf_classes[-1].add(position_of_class[next_path[1]])
+                next_path = paths.fetchone()
+
+        left, right, node_of = [], [], [] # Sons and internal node (-1 for leaves) of each node, in the order of sklearn
+        classes_of_leaf = {}
+        position = {'node': 0, 'leaf': 0}
+        def grow(depth):
+            n = len(node_of)
+            left.append(-1)
+            right.append(-1)
+            if leaf_depths[position['leaf']] == depth:
+                node_of.append(-1)
+                classes_of_leaf[n] = leaf_classes[position['leaf']]
+                position['leaf'] += 1
+                return n
+            node_of.append(position['node'])
+            position['node'] += 1
+            left[n] = grow(depth+1)
+            right[n] = grow(depth+1)
+            return n
+        grow(0)
+        left, right, node_of = np.array(left, dtype=np.int64), np.array(right, dtype=np.int64), np.array(node_of, dtype=np.int64)
+        internal = node_of != -1
+        value = np.zeros((len(node_of), k), dtype=np.int64)
+        value[internal] = counts[node_of[internal]]
+        for n in np.flatnonzero(internal).tolist():
+            if internal[left[n]] and not(internal[right[n]]):
+                value[right[n]] = value[n]-value[left[n]]
+            elif internal[right[n]] and not(internal[left[n]]):
+                value[left[n]] = value[n]-value[right[n]]
+            elif not(internal[left[n]]):
+                for j in range(k):
+                    if j in classes_of_leaf[right[n]]:
+                        value[right[n], j] = value[n, j]//2 if j in classes_of_leaf[left[n]] else value[n, j]
+                    value[left[n], j] = value[n, j]-value[right[n], j]
+        yield cursor_id, {'children_left': left, 'children_right': right,
+                          'feature': np.where(internal, feature[np.maximum(node_of, 0)], -2),
+                          'threshold': np.where(internal, threshold[np.maximum(node_of, 0)], -2.0),
+                          'value': value}
+
+"""
+Function: experiment_aggregator
+
+ Description:
+    Aggregator filled with the trees of an experiment, read from the arrays (storage 'compact' of tree_experiment) or, when
+    the experiment has no arrays, from the relational tables (see relational_trees).
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	genes - names of the genes of the experiment, in the order of the columns (for the relational tables; default: genes of
+ 	        the trees, sorted)
+ 	classes - name of each class, in the order of the class counts (required for the relational tables)
+
+ Returns:
+ 	Dictionary with the aggregator (TreeAggregator), genes and classes of the experiment.
+ 	Prints error message and returns None if the trees were saved in the relational tables and classes is None.
+"""
+
+def experiment_aggregator(db, experiencia_id, genes=None, classes=None):
+    dictionary = tree_store.read_dictionary(db, experiencia_id)
+    if dictionary is not None:
+        genes, classes = dictionary['genes'], dictionary['classes']
+        trees = tree_store.read_trees(db, experiencia_id, len(classes))
+    elif classes is None:
+        print('Error: classes of the experiment are needed to read the trees of the relational tables')
+        return None
+    else:
+        if genes is None:
+            genes = [row[0] for row in db.execute('SELECT DISTINCT gene_id FROM tree_node WHERE experiencia_id = ? ORDER BY gene_id;',
+                                                  (experiencia_id,))]
+        trees = relational_trees(db, experiencia_id, genes, classes)
+    aggregator = TreeAggregator(len(genes), len(classes))
+    for _, arrays in trees:
+        aggregator.add(arrays)
+    return {'aggregator': aggregator, 'genes': genes, 'classes': classes}
+
+"""
+Function: assemble_consensus
+
+ Parameters:
+ 	aggregates - dictionary returned by TreeAggregator.aggregate
+ 	genes - names of the genes, in the order of the positions of the features
+ 	max_depth - depth of the deepest split of the consensus tree
+ 	min_fraction - fraction of the trees where a pair (father, son of a side) must appear to be part of the consensus tree
+
+ Returns:
+ 	Dictionary of the nodes of the consensus tree, in preorder like the trees of sklearn: gene (None for leaves), threshold
+ 	(mean of the thresholds of the gene in that position), trees (number of trees with the gene in that position, the same
+ 	father gene and side), value (samples of each class in those nodes, summed over those trees; for leaves, samples that went
+ 	to that side of their father in those trees), children_left and children_right (-1 for leaves).
+ 	Empty lists if no tree has a split.
+"""
+
+def assemble_consensus(aggregates, genes, max_depth=4, min_fraction=0.05):
+    nodes = {'gene': [], 'threshold': [], 'trees': [], 'value': [], 'children_left': [], 'children_right': []}
+    if aggregates['roots'].sum() == 0:
+        return nodes
+    min_trees = max(1, min_fraction*aggregates['n_trees'])
+    root = int(np.argmax(aggregates['roots']))
+    n_classes = aggregates['root_values'].shape[1]
+
+    def add_node(gene, threshold, trees, value):
+        nodes['gene'].append(gene)
+        nodes['threshold'].append(threshold)
+        nodes['trees'].append(trees)
+        nodes['value'].append(value.tolist())
+        nodes['children_left'].append(-1)
+        nodes['children_right'].append(-1)
+        return len(nodes['gene'])-1
+
+    def grow(gene, threshold, trees, depth, path, values):
+        node = add_node(genes[gene], threshold, trees, values['value'])
+        for side in ['left', 'right']:
+            row = aggregates[f'{side}_pairs'].getrow(gene)
+            sums = aggregates[f'{side}_thresholds'].getrow(gene)
+            counts = dict(zip(row.indices.tolist(), row.data.tolist()))
+            for used in path: # A gene is not split again below itself
+                counts.pop(used, None)
+            son = max(counts, key=lambda candidate: (counts[candidate], -candidate)) if counts else None
+            if son is not None and depth < max_depth and counts[son] >= min_trees:
+                son_values = {name: _pair_value(aggregates[f'{side}_pair{suffix}_values'], gene, son, n_classes)
+                              for name, suffix in [('value', ''), ('left', '_left'), ('right', '_right')]}
+                child = grow(son, sums[0, son]/counts[son], counts[son], depth+1, path | {son}, son_values)
+            else:
+                child = add_node(None, None, trees, values[side]) # Samples that went to this side in the same trees
+            nodes[f'children_{side}'][node] = child
+        return node
+
+    root_values = {'value': aggregates['root_values'][root], 'left': aggregates['root_left_values'][root],
+                   'right': aggregates['root_right_values'][root]}
+    grow(root, aggregates['root_thresholds'][root]/aggregates['roots'][root], int(aggregates['roots'][root]), 1, {root}, root_values)
+    return nodes
+
+"""
+Function: export_graphviz
+
+ Description:
+    Writes the consensus tree in the DOT format of sklearn.tree.export_graphviz, with the number of trees of each node.
+
+ Parameters:
+ 	consensus - dictionary returned by assemble_consensus
+ 	classes - name of each class, in the order of the class counts
+
+ Returns:
+ 	String with the DOT source.
+"""
+
+def export_graphviz(consensus, classes):
+    lines = ['digraph Tree {', 'node [shape=box, fontname="helvetica"] ;', 'edge [fontname="helvetica"] ;']
+    for node in range(len(consensus['gene'])):
+        value = np.array(consensus['value'][node], dtype=np.float64)
+        samples = int(value.sum())
+        gini = 1-((value/samples)**2).sum() if samples else 0.0
+        label = [f"{consensus['gene'][node]} <= {round(consensus['threshold'][node], 3)}"] if consensus['gene'][node] is not None else []
+        label += [f'gini = {round(gini, 3)}', f"trees = {consensus['trees'][node]}", f'samples = {samples}',
+                  f"value = {consensus['value'][node]}", f'class = {classes[int(np.argmax(value))]}']
+        lines.append(f'{node} [label="' + '\\n'.join(label) + '"] ;')
+        for side, angle, head in [('left', 45, 'True'), ('right', -45, 'False')]:
+            child = consensus[f'children_{side}'][node]
+            if child == -1:
+                continue
+            if node == 0: # Like sklearn, only the edges of the root are labelled
+                lines.append(f'{node} -> {child} [labeldistance=2.5, labelangle={angle}, headlabel="{head}"] ;')
+            else:
+                lines.append(f'{node} -> {child} ;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+"""
+Function: render_consensus
+
+ Parameters:
+ 	consensus - dictionary returned by assemble_consensus
+ 	classes - name of each class, in the order of the class counts
+ 	path - path of the file, without extension
+
+ Returns:
+ 	Path of the PDF file.
+ 	Prints error message and returns None if the dot program of graphviz is not installed.
+"""
+
+def render_consensus(consensus, classes, path):
+    import graphviz # Loaded only when the tree is rendered
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        return graphviz.Source(export_graphviz(consensus, classes)).render(path, format='pdf')
+    except graphviz.ExecutableNotFound:
+        print('Error: dot program of graphviz not found, consensus tree not rendered')
+        return None
@@ -0,0 +1,98 @@
+"""
+Title: Description
+Schema of the SQLite database of the trees (see the ER diagram of the README), for creating empty databases for new
+installations, tests and benchmarks. Tables created by other modules (gene_pair_aggregate, feature_importance,
+experiment_run, run_metrics) are created by them when they are first used.
+"""
+
+# Class counts of the other datasets of the diagram (fluid shear stress and oscillatory shear stress experiments)
+_other_counts = ['FSS', 'FSS_HIP', 'FSS_IL1B', 'FSS_OXPAPC', 'FSS_IL1B_HIP', 'FSS_IL1B_HIP_OXPAPC',
+                 'OSS', 'OSS_HIP', 'OSS_IL1B', 'OSS_OXPAPC', 'OSS_IL1B_HIP', 'OSS_IL1B_HIP_OXPAPC']
+
+schema = """
+CREATE TABLE IF NOT EXISTS experiencia (
+    idexperiencia INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS grouping_algorithm (
+    grouping_algorithm_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS gene (
+    gene_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gene_name TEXT,
+    gene_symbol TEXT,
+    fdr_f_test_value REAL,
+    grouping_algorithm_id INTEGER REFERENCES grouping_algorithm (grouping_algorithm_id),
+    idbio_database INTEGER,
+    gene_name_without_dot TEXT
+);
+CREATE TABLE IF NOT EXISTS tree (
+    tree_generation INTEGER PRIMARY KEY AUTOINCREMENT,
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia)
+);
+CREATE TABLE IF NOT EXISTS place_of_genes_in_tree (
+    place_of_genes_in_tree_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gene_name TEXT,
+    tree_generation INTEGER REFERENCES tree (tree_generation),
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia),
+    depth INTEGER,
+    CVDA INTEGER, CA INTEGER, C INTEGER, CVD INTEGER,
+""" + ',\n'.join(f'    {name} INTEGER' for name in _other_counts) + """
+);
+CREATE TABLE IF NOT EXISTS father_and_son_nodes (
+    father_and_son_nodes_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gene_id_parent TEXT,
+    gene_id_son TEXT,
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia),
+    depth INTEGER,
+    CVDA_father INTEGER, CVDA_son INTEGER, CA_father INTEGER, CA_son INTEGER,
+    C_father INTEGER, C_son INTEGER, CVD_father INTEGER, CVD_son INTEGER,
+""" + ',\n'.join(f'    {name}_parent INTEGER' for name in _other_counts) + ',\n' + ',\n'.join(f'    {name}_son INTEGER' for name in _other_counts) + """,
+    expression_value REAL
+);
+CREATE TABLE IF NOT EXISTS esta_em (
+    esta_em_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gene_name TEXT,
+    tree_id INTEGER REFERENCES tree (tree_generation),
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia),
+    gene_id TEXT
+);
+CREATE TABLE IF NOT EXISTS tree_node (
+    tree_node_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    depth INTEGER,
+    father_node_id INTEGER REFERENCES tree_node (tree_node_id),
+    tree_id INTEGER REFERENCES tree (tree_generation),
+    gene_name TEXT,
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia),
+    gene_id TEXT
+);
+CREATE TABLE IF NOT EXISTS path (
+    path_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cond TEXT,
+    nodes INTEGER,
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia)
+);
+CREATE TABLE IF NOT EXISTS genes_in_path (
+    genes_in_path_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    gene_name TEXT,
+    depth INTEGER,
+    path_id INTEGER REFERENCES path (path_id),
+    experiencia_id INTEGER REFERENCES experiencia (idexperiencia),
+    gene_id TEXT
+);
+"""
+
+"""
+Function: create_database
+
+ Description:
+    Creates the tables of the schema that do not exist yet.
+
+ Parameters:
+ 	db - sqlite3 connection
+"""
+
+def create_database(db):
+    db.executescript(schema)
+    db.commit()
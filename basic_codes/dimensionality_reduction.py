@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import expression_cache
+import out_of_core_pca
+import sample_attributes
+from pipeline_stages import transform_data
+
+"""
+Title: Description
+PCA or tSNE of samples of expression data (for necrop, protein coding or all genes), with the quartile of time of death of
+each sample, and their plots (functions of 3-gtex_samples_into_quartiles-run_pca-plot.py). sklearn's PCA and TSNE,
+matplotlib and seaborn are imported only by the functions that use them.
+"""
+
+def transform_data_pca(df, pca_model):
+    # Apply transformation of PCA to all samples in a single batched call
+    return pd.DataFrame(pca_model.transform(df.values), index=df.index) # Index of samples for joining with quartiles and zscores
+
+"""
+Function: create_df_for_method_with_time_of_death_and_applies_it
+
+ Description: 
+    This function applies PCA or tSNE techniques to redimension data to be visualized. 
+    It's part of the analysis of the effect of necroptosis genes in the expression data.
+
+ Parameters:
+ 	df - dataframe with expression of genes
+    method - string with values 'pca' or 'tsne' for dimensionality reduction
+    attributes_path - path of the SampleAttributesDS file
+ 	
+ Returns:
+ 	dictionary with dataframe transformed, the mean and std of expression of genes by quartile, the samples names and the number of genes
+"""
+
+def create_df_for_method_with_time_of_death_and_applies_it(df, method, attributes_path):
+    n_genes = len(df)
+    samples = df.columns.values
+    time_of_death_df, mean, std = time_of_death_quartiles(samples, attributes_path)
+
+    df = df.T
+    df = transform_data(df)
+    index = df.index
+
+    if method=='pca':
+        from sklearn.decomposition import PCA # Loaded only by the method used
+        pca = PCA(n_components=2)
+        pca.fit(df.values)
+        df = transform_data_pca(df,pca)
+        quartile = df.join(time_of_death_df, how='inner')
+        return {'quartile':quartile,'mean':mean,'std':std,'samples':samples,'n_genes':n_genes,'pca':pca}
+    elif method=='tsne':
+        from sklearn.manifold import TSNE
+        tsne = TSNE(n_components=2)
+        df = tsne.fit_transform(df.values)
+        df = pd.DataFrame(df,index=index,columns=[0,1])
+        quartile = df.join(time_of_death_df,how='inner')
+        return {'quartile':quartile,'mean':mean,'std':std,'samples':samples,'n_genes':n_genes}
+    else:
+        print('Error: invalid method')    
+
+"""
+Function: create_df_for_pca_from_cache
+
+ Description: 
+    Same as create_df_for_method_with_time_of_death_and_applies_it with method 'pca', for matrices that do not fit in memory.
+    The matrices are read from the binary cache (expression_cache) in chunks of samples, so all genes and many tissues
+    can be analysed together within a fixed budget of memory.
+
+ Parameters:
+ 	csv_paths - list of CSVs of expression (one for each tissue) with the same genes
+    attributes_path - path of the SampleAttributesDS file
+    method - 'incremental' (IncrementalPCA fitted by chunks) or 'randomized' (randomized SVD, when all samples fit in the budget)
+    max_memory_mb - memory budget for each chunk of samples, in megabytes
+ 	
+ Returns:
+ 	dictionary in the format used by plot_df_transformed with method 'pca'
+"""
+
+def create_df_for_pca_from_cache(csv_paths, attributes_path, method='incremental', max_memory_mb=512):
+    matrices = [expression_cache.open_expression_matrix(path, samples_major=True) for path in csv_paths]
+    result = out_of_core_pca.fit_pca_from_cache(matrices, n_components=2, method=method, max_memory_mb=max_memory_mb)
+    if result is None:
+        return None
+    samples = np.concatenate([matrix['samples'] for matrix in matrices])
+    time_of_death_df, mean, std = time_of_death_quartiles(samples, attributes_path)
+    quartile = result['transformed'].join(time_of_death_df, how='inner')
+    return {'quartile':quartile,'mean':mean,'std':std,'samples':samples,'n_genes':len(matrices[0]['genes']),'pca':result['pca']}
+
+"""
+Function: time_of_death_quartiles
+
+ Description: 
+    Reads the time of death (SMTSISCH, in hours) of the samples and separates them in quartiles.
+
+ Parameters:
+ 	samples - array of sample ids
+ 	attributes_path - path of the SampleAttributesDS file
+ 	
+ Returns:
+ 	dataframe with time of death and quartile of each sample, the mean and std of the time of death of each quartile
+"""
+
+def time_of_death_quartiles(samples, attributes_path):
+    time_of_death_df = sample_attributes.join_attributes(samples, ['SMTSISCH'], attributes_path)
+    time_of_death_df['SMTSISCH'] = time_of_death_df['SMTSISCH']/60 #from minutes to hours
+    time_of_death_df.insert(0, 'SAMPID', time_of_death_df.index)
+    time_of_death_df['quartiles'] = sample_attributes.quartiles(time_of_death_df['SMTSISCH'])
+    mean = time_of_death_df.groupby(time_of_death_df['quartiles']).mean(numeric_only=True)
+    mean = mean['SMTSISCH'].values
+    std = time_of_death_df.groupby(time_of_death_df['quartiles']).std(numeric_only=True)
+    std = std['SMTSISCH'].values
+    return time_of_death_df, mean, std
+
+"""
+Function: plot_df_transformed
+
+Description: 
+    This function simply plots the data generated in the previous function.
+
+ Parameters:
+ 	quartile - dataframe created by 'create_df_for_method_with_time_of_death_and_applies_it' function
+    method - string with values 'pca' or 'tsne'
+    tissue - which tissue is the data from
+ 	
+ Returns:
+ 	Plot of tSNE or PCA for the data inputed. Prints error message if method is not 'tsne' or 'pca'.
+"""
+
+def plot_df_transformed(quartile,method,tissue):
+    df = quartile['quartile']
+    mean = quartile['mean']
+    std = quartile['std']
+    samples = quartile['samples']
+    n_genes = quartile['n_genes']
+    import matplotlib.pyplot as plt # Plotting libraries are loaded only when something is plotted
+    import seaborn as sns
+    if method == 'pca':
+        pca = quartile['pca']
+        sns.scatterplot(x=df[0],y=df[1],hue=df['quartiles'],palette='bright')
+        plt.xlabel(f'PCA 1 - {round(pca.explained_variance_ratio_[0]*100,1)}%')
+        plt.ylabel(f'PCA 2 - {round(pca.explained_variance_ratio_[1]*100,1)}%')
+        plt.title(f'PCA - {tissue} - {len(samples)} samples - 2 components - Quartile - {n_genes} genes')
+        plt.show()
+    elif method == 'tsne':
+        sns.scatterplot(x=df[0],y=df[1],hue=df['quartiles'],palette='bright')
+        plt.xlabel('x1')
+        plt.ylabel('x2')
+        plt.title(f'tSNE {tissue} - {len(samples)} samples - 2 components - Quartile - {n_genes} genes')
+        plt.show()
+    else:
+        print('Error: invalid method')
@@ -0,0 +1,154 @@
+import json
+import sys
+import time
+
+"""
+Title: Description
+Checkpoints of the experiments of 6-apply_decision_tree_gtex.py. The seed and the settings of each experiment are saved in
+experiment_run when it starts, and the trees of an experiment are committed in the order of their iterations, so the trees
+already saved tell where an interrupted experiment stopped. A resumed experiment continues from the next tree with the same
+seeds it would have used. Rows of a tree are written in a single transaction (see sql_writer), so a tree interrupted while
+being written is rolled back by SQLite and fitted again on resume.
+"""
+
+create_sql = """CREATE TABLE IF NOT EXISTS experiment_run (
+    experiencia_id INTEGER PRIMARY KEY,
+    seed INTEGER NOT NULL,
+    n_trees INTEGER NOT NULL,
+    settings TEXT,
+    started REAL,
+    finished REAL
+);"""
+
+"""
+Function: start_experiment
+
+ Description:
+    Creates an experiment (row of experiencia) and saves its seed and settings.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	description - description of the experiment
+ 	seed - seed of the experiment
+ 	n_trees - number of trees of the experiment
+ 	settings - dictionary of other settings saved as JSON (engine, n_jobs, ...)
+
+ Returns:
+ 	Dictionary with experiencia_id, seed, n_trees, settings and first_iteration (0).
+"""
+
+def start_experiment(db, description, seed, n_trees, settings=None):
+    db.executescript(create_sql)
+    with db:
+        exp = db.execute('INSERT INTO experiencia (description) VALUES (?);', (description,)).lastrowid
+        db.execute('INSERT INTO experiment_run (experiencia_id,seed,n_trees,settings,started) VALUES (?,?,?,?,?);',
+                   (exp, seed, n_trees, json.dumps(settings or {}), time.time()))
+    return {'experiencia_id': exp, 'seed': seed, 'n_trees': n_trees, 'settings': settings or {}, 'first_iteration': 0}
+
+"""
+Function: resume_experiment
+
+ Description:
+    Reads the seed and settings of an experiment and counts its trees already committed.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+
+ Returns:
+ 	Dictionary with experiencia_id, seed, n_trees, settings and first_iteration (iteration of the next tree).
+ 	Prints error message and returns None if the experiment was not started by start_experiment.
+"""
+
+def resume_experiment(db, experiencia_id):
+    db.executescript(create_sql)
+    row = db.execute('SELECT seed, n_trees, settings FROM experiment_run WHERE experiencia_id = ?;', (experiencia_id,)).fetchone()
+    if row is None:
+        print('Error: experiment without checkpoint')
+        return None
+    done = db.execute('SELECT COUNT(*) FROM tree WHERE experiencia_id = ?;', (experiencia_id,)).fetchone()[0]
+    return {'experiencia_id': experiencia_id, 'seed': row[0], 'n_trees': row[1], 'settings': json.loads(row[2] or '{}'),
+            'first_iteration': done}
+
+"""
+Function: finish_experiment
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+"""
+
+def finish_experiment(db, experiencia_id):
+    with db:
+        db.execute('UPDATE experiment_run SET finished = ? WHERE experiencia_id = ?;', (time.time(), experiencia_id))
+
+"""
+Class: Progress
+
+ Description:
+    Progress of an experiment as JSON records (one per line): trees done, trees per second and estimated seconds to the
+    end. Records are written to a file and/or to a stream at most once every every_seconds seconds, and always at the end.
+
+ Parameters:
+ 	experiencia_id - id of the experiment
+ 	n_trees - number of trees of the experiment
+ 	first_iteration - trees already done when the run started (resumed experiments)
+ 	path - JSONL file where records are appended (default: none)
+ 	stream - stream where records are written (default: sys.stdout, None for no stream)
+ 	every_seconds - minimum time between two records
+"""
+
+class Progress:
+
+    def __init__(self, experiencia_id, n_trees, first_iteration=0, path=None, stream=sys.stdout, every_seconds=5.0):
+        self.experiencia_id = experiencia_id
+        self.n_trees = n_trees
+        self.first_iteration = first_iteration
+        self.path = path
+        self.stream = stream
+        self.every_seconds = every_seconds
+        self.start = time.perf_counter()
+        self.last_record = None
+        self.last_trees_done = None
+
+    """
+    Function: record
+
+     Parameters:
+     	trees_done - trees of the experiment committed so far (including the ones of previous runs)
+
+     Returns:
+     	Dictionary of the record.
+    """
+
+    def record(self, trees_done):
+        elapsed = time.perf_counter()-self.start
+        rate = (trees_done-self.first_iteration)/elapsed if elapsed > 0 else 0.0
+        remaining = self.n_trees-trees_done
+        return {'experiencia_id': self.experiencia_id, 'trees_done': trees_done, 'n_trees': self.n_trees,
+                'elapsed_seconds': round(elapsed, 3), 'trees_per_second': round(rate, 4),
+                'eta_seconds': round(remaining/rate, 1) if rate > 0 else None, 'time': time.time()}
+
+    """
+    Function: update
+
+     Parameters:
+     	trees_done - trees of the experiment committed so far
+     	force - writes the record even if every_seconds did not pass
+    """
+
+    def update(self, trees_done, force=False):
+        now = time.perf_counter()
+        if trees_done == self.last_trees_done:
+            return
+        if not force and trees_done < self.n_trees and self.last_record is not None and now-self.last_record < self.every_seconds:
+            return
+        self.last_record = now
+        self.last_trees_done = trees_done
+        line = json.dumps(self.record(trees_done))
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(line+'\n')
+        if self.stream is not None:
+            self.stream.write(line+'\n')
+            self.stream.flush()
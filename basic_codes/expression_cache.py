@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+import hashlib
+import json
+import os
+import shutil
+
+"""
+Title: Description
+Binary cache of expression matrices. A CSV of log2 tpm values (genes in rows, samples in columns) is converted once to a
+float32 matrix saved in .npy format, with the ids of genes and samples. Next stages open the matrix memory-mapped, so
+loading takes milliseconds and slicing genes or samples does not copy the data. Caches are keyed by the hash of the CSV
+file and are rebuilt automatically when it changes.
+
+The other CSVs of the stages (quartiles of script 4, samples of script 5 and labelled samples of script 6) are cached in the
+same way, with their rows and columns in place of genes and samples and their text columns (like Pacient_Condition) kept
+apart (see read_csv). float32 halves the memory of the matrix but keeps about 7 significant digits, so the readers that
+replace pd.read_csv ask for a float64 cache, which has the same values of the CSV.
+"""
+
+"""
+Function: file_hash
+
+ Description:
+    Calculates the sha256 of a file, reading it in blocks. The hash is saved next to the cache with the size and
+    modification time of the file, so an unchanged file is not read again.
+
+ Parameters:
+ 	path - path of the file
+ 	known - dictionary with 'size', 'mtime' and 'hash' of a previous calculation (or None)
+
+ Returns:
+ 	Hexadecimal string with the hash of the file.
+"""
+
+def file_hash(path, known=None):
+    stat = os.stat(path)
+    if known and known.get('size') == stat.st_size and known.get('mtime') == stat.st_mtime:
+        return known['hash']
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 24), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _cache_dir_for(csv_path, cache_dir, dtype=np.float32):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.expression_cache')
+    suffix = '' if np.dtype(dtype) == np.float32 else '.'+np.dtype(dtype).name # One cache for each type of the values
+    return os.path.join(cache_dir, os.path.basename(csv_path)+suffix)
+
+def _read_info(folder):
+    try:
+        with open(os.path.join(folder, 'info.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+"""
+Function: build_cache
+
+ Description:
+    Converts a CSV of expression into the binary cache, reading chunk_size genes at a time. The cache is written in a
+    temporary folder and moved at the end, so an interrupted conversion never leaves a broken cache. Columns that are not
+    numbers in the first chunk are saved apart, as text (text.npy), and columns of integers are noted in info.json.
+
+ Parameters:
+ 	csv_path - CSV with genes in rows (first column with gene ids) and samples in columns
+ 	folder - folder where the cache is saved
+ 	source_hash - hash of the CSV file
+ 	chunk_size - number of rows read at a time
+ 	dtype - type of the values of the matrix
+"""
+
+def build_cache(csv_path, folder, source_hash, chunk_size=2000, dtype=np.float32):
+    header = pd.read_csv(csv_path, nrows=0)
+    with open(csv_path, 'r') as f:
+        next(f)
+        n_genes = sum(1 for line in f if line.strip())
+    tmp = folder+'.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    values = None
+    genes = []
+    text = []
+    row = 0
+    for chunk in pd.read_csv(csv_path, index_col=0, chunksize=chunk_size):
+        if values is None:
+            text_columns = [name for name in chunk.columns if not(pd.api.types.is_numeric_dtype(chunk[name]))]
+            samples = [name for name in chunk.columns if not(name in text_columns)]
+            integer_columns = [name for name in samples if pd.api.types.is_integer_dtype(chunk[name])]
+            values = np.lib.format.open_memmap(os.path.join(tmp, 'values.npy'), mode='w+', dtype=dtype, shape=(n_genes, len(samples)))
+        values[row:row+len(chunk)] = chunk[samples].values
+        text.append(np.asarray(chunk[text_columns].astype(str).values, dtype=str))
+        genes.extend(chunk.index.astype(str))
+        row += len(chunk)
+    if values is None: # CSV without rows
+        text_columns, integer_columns, samples = [], [], list(header.columns[1:])
+        values = np.lib.format.open_memmap(os.path.join(tmp, 'values.npy'), mode='w+', dtype=dtype, shape=(0, len(samples)))
+    values.flush()
+    del values
+    np.save(os.path.join(tmp, 'genes.npy'), np.array(genes, dtype=str))
+    np.save(os.path.join(tmp, 'samples.npy'), np.array(samples, dtype=str))
+    np.save(os.path.join(tmp, 'text.npy'), np.vstack(text) if text else np.zeros((0, 0), dtype=str))
+    stat = os.stat(csv_path)
+    with open(os.path.join(tmp, 'info.json'), 'w') as f:
+        json.dump({'hash': source_hash, 'size': stat.st_size, 'mtime': stat.st_mtime, 'source': os.path.abspath(csv_path),
+                   'index_name': str(header.columns[0]), 'text_columns': text_columns, 'integer_columns': integer_columns}, f)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(tmp, folder)
+
+"""
+Function: build_samples_major
+
+ Description:
+    Writes a copy of the cached matrix with samples in rows (samples x genes), so a chunk of samples is a contiguous block
+    of the file. The genes x samples matrix is read once, chunk_size genes at a time. The copy takes the same disk space as
+    the cache and is only created when it is asked for (see open_expression_matrix).
+
+ Parameters:
+ 	folder - folder of the cache
+ 	chunk_size - number of genes read at a time
+"""
+
+def build_samples_major(folder, chunk_size=2000):
+    values = np.load(os.path.join(folder, 'values.npy'), mmap_mode='r')
+    tmp = os.path.join(folder, 'values_by_sample.tmp.npy')
+    by_sample = np.lib.format.open_memmap(tmp, mode='w+', dtype=values.dtype, shape=(values.shape[1], values.shape[0]))
+    for start in range(0, values.shape[0], chunk_size):
+        by_sample[:, start:start+chunk_size] = values[start:start+chunk_size].T
+    by_sample.flush()
+    del by_sample
+    os.replace(tmp, os.path.join(folder, 'values_by_sample.npy'))
+
+"""
+Function: open_expression_matrix
+
+ Description:
+    Opens the cached matrix of a CSV of expression, creating or refreshing the cache when needed.
+
+ Parameters:
+ 	csv_path - CSV with genes in rows (first column with gene ids) and samples in columns
+ 	cache_dir - folder of the caches (default: .expression_cache in the folder of the CSV)
+ 	samples_major - also opens the copy of the matrix with samples in rows (see build_samples_major), creating it if needed
+ 	dtype - type of the values: float32 (default, half the memory and disk) or float64 (the values of the CSV), each one
+ 	        with its own cache
+
+ Returns:
+ 	Dictionary with 'values' (read-only memory-mapped matrix genes x samples), 'genes' and 'samples' (ids of rows and
+ 	columns), 'index_name' (name of the first column of the CSV), 'integer_columns' (columns of integers in the CSV),
+ 	'text_columns' and 'text' (columns of the CSV that are not numbers, rows x text_columns). With samples_major, also 'values_by_sample' (read-only memory-mapped matrix samples x genes).
+"""
+
+def open_expression_matrix(csv_path, cache_dir=None, samples_major=False, dtype=np.float32):
+    folder = _cache_dir_for(csv_path, cache_dir, dtype)
+    info = _read_info(folder)
+    source_hash = file_hash(csv_path, info)
+    if info is None or info.get('hash') != source_hash or not('integer_columns' in info): # Caches of older versions are rebuilt
+        build_cache(csv_path, folder, source_hash, dtype=dtype)
+        info = _read_info(folder)
+    matrix = {'values': np.load(os.path.join(folder, 'values.npy'), mmap_mode='r'),
+              'genes': np.load(os.path.join(folder, 'genes.npy')),
+              'samples': np.load(os.path.join(folder, 'samples.npy')),
+              'index_name': info['index_name'],
+              'text_columns': info['text_columns'],
+              'integer_columns': info['integer_columns'],
+              'text': np.load(os.path.join(folder, 'text.npy'))}
+    if samples_major:
+        if not os.path.exists(os.path.join(folder, 'values_by_sample.npy')):
+            build_samples_major(folder)
+        matrix['values_by_sample'] = np.load(os.path.join(folder, 'values_by_sample.npy'), mmap_mode='r')
+    return matrix
+
+def _positions(ids, selected):
+    positions = pd.Index(ids).get_indexer(selected)
+    if (positions == -1).any():
+        raise KeyError(f'{np.asarray(selected)[positions == -1].tolist()} not in cached matrix')
+    return positions
+
+"""
+Function: read_expression_csv
+
+ Description:
+    Replacement for pd.read_csv(csv_path, index_col=['Gene_ID']) on CSVs of expression, reading from the binary cache.
+    Only the selected genes and samples are read from disk.
+
+ Parameters:
+ 	csv_path - CSV with genes in rows (first column with gene ids) and samples in columns
+ 	genes - list of gene ids to keep (default: all)
+ 	samples - list of sample ids to keep (default: all)
+ 	cache_dir - folder of the caches
+ 	dtype - type of the values (default float64, the values read by pd.read_csv; float32 rounds them to about 7 digits)
+
+ Returns:
+ 	Dataframe of expression with genes as index (named Gene_ID) and samples as columns.
+"""
+
+def read_expression_csv(csv_path, genes=None, samples=None, cache_dir=None, dtype=np.float64):
+    matrix = open_expression_matrix(csv_path, cache_dir, dtype=dtype)
+    rows = slice(None) if genes is None else _positions(matrix['genes'], genes)
+    cols = slice(None) if samples is None else _positions(matrix['samples'], samples)
+    values = matrix['values'][rows][:, cols]
+    return pd.DataFrame(values, index=pd.Index(matrix['genes'][rows], name='Gene_ID'), columns=matrix['samples'][cols])
+
+"""
+Function: read_csv
+
+ Description:
+    Replacement for pd.read_csv(csv_path, index_col=[<first column>]) on the CSVs of the stages (expression, quartiles,
+    samples of the trees), reading from the float64 binary cache, with the same values and types. Text columns (like
+    Pacient_Condition) come after the columns of numbers.
+
+ Parameters:
+ 	csv_path - CSV with ids in the first column
+ 	cache_dir - folder of the caches
+
+ Returns:
+ 	Dataframe indexed by the first column of the CSV (named as in pd.read_csv, 'Unnamed: 0' if it has no name).
+"""
+
+def read_csv(csv_path, cache_dir=None):
+    matrix = open_expression_matrix(csv_path, cache_dir, dtype=np.float64)
+    index_name = None if matrix['index_name'].startswith('Unnamed: ') else matrix['index_name'] # As pd.read_csv, a column without header gives an index without name
+    df = pd.DataFrame(np.asarray(matrix['values']), index=pd.Index(matrix['genes'], name=index_name), columns=matrix['samples'])
+    for name in matrix['integer_columns']: # Saved as floats in the matrix
+        df[name] = df[name].astype(np.int64)
+    for i, name in enumerate(matrix['text_columns']):
+        df[name] = matrix['text'][:, i]
+    return df
+
+"""
+Function: export_csv
+
+ Description:
+    Writes a cached matrix back to CSV, in the same format used by the scripts (Gene_ID in the first column).
+
+ Parameters:
+ 	matrix - dictionary returned by open_expression_matrix
+ 	csv_path - path of the CSV created
+ 	chunk_size - number of genes written at a time
+"""
+
+def export_csv(matrix, csv_path, chunk_size=2000):
+    with open(csv_path, 'w', newline='') as f:
+        f.write(','.join(['Gene_ID']+list(matrix['samples']))+'\n')
+        for start in range(0, len(matrix['genes']), chunk_size):
+            chunk = pd.DataFrame(matrix['values'][start:start+chunk_size], index=matrix['genes'][start:start+chunk_size])
+            chunk.to_csv(f, header=False)
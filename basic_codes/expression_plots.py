@@ -0,0 +1,94 @@
+import pandas as pd
+import numpy as np
+import os
+import plot_renderer
+
+"""
+Title: Description
+Functions of 4-plot_of_gene_expression_by_quartile.py: removes stable genes in quartiles of time of death and plots the
+expression of genes by time of death (see plot_renderer, which loads matplotlib only in the processes that draw).
+"""
+
+"""
+Function: remove_stable_genes
+
+ Description: 
+    As we want to analyse genes that affect the expression of other by being present in the necroptosis pathway, this functions selects
+    only the genes that change its expression by varying the time of death of the patients.
+
+ Parameters:
+ 	df - dataframe with expression of genes
+ 	
+ Returns:
+ 	Dataframe removing the genes from necrop pathway that present stable expression between all quartiles
+"""
+
+def remove_stable_genes(df):
+    genes_to_drop = []
+    df = df.drop(['quartiles','SMTSISCH'], axis=1)
+    q0 = df[df['quartiles']==0].mean(axis=0).values[:-2]
+    q1 = df[df['quartiles']==1].mean(axis=0).values[:-2]
+    q2 = df[df['quartiles']==2].mean(axis=0).values[:-2]
+    q3 = df[df['quartiles']==3].mean(axis=0).values[:-2]
+    std = np.std(df)[:-2]
+    for i in range(len(std)):
+        if abs(q0[i]-q3[i]) <= std[i]: # Checks if the difference of the expression values of the genes in the first and 4th quartile is 
+            genes_to_drop.append(std.index.values[i]) # lower than the standard deviation of the expression value of this gene
+    new_df = df.drop(genes_to_drop,axis=1)
+    return new_df
+
+"""
+Function: df_mean_exp_by_time_of_death
+
+ Description: 
+    This function calculates the mean expression of genes from a single patient for each quartile.
+ 
+ Parameters:
+ 	df - dataframe with expression of genes
+ 	
+ Returns:
+ 	Dataframe with the mean expression of all genes for a single sample, time of death and quartile of each sample
+"""
+
+def df_mean_exp_by_time_of_death(df):
+    quartile = df['quartiles']
+    time = df['SMTSISCH']
+    q0 = df[df['quartiles']==0].drop(['SMTSISCH','quartiles'],axis=1)
+    q0 = q0.mean(axis=1)
+    q1 = df[df['quartiles']==1].drop(['SMTSISCH','quartiles'],axis=1)
+    q1 = q1.mean(axis=1)
+    q2 = df[df['quartiles']==2].drop(['SMTSISCH','quartiles'],axis=1)
+    q2 = q2.mean(axis=1)
+    q3 = df[df['quartiles']==3].drop(['SMTSISCH','quartiles'],axis=1)
+    q3 = q3.mean(axis=1)    
+    exp = pd.concat([q0,q1,q2,q3])
+    new_df = pd.DataFrame({'exp':exp,'SMTSISCH':time,'quartiles':quartile}, index=exp.index)
+    return new_df
+
+"""
+Function: save_plot
+
+ Description:
+    This function plots, for each tissue that is being analysed, the scatter plot of the expression of genes
+    separated by quartile of the time of deat of each patient. Plots are drawn in parallel with a headless backend
+    and genes whose plot is already saved for the same data are skipped.
+
+ Parameters:
+ 	df - dataframe with expression of genes
+    tissue - values 'ventricle', 'atrial', 'coronary' or the name of any other tissue (used for folder and files)
+    results_dir - folder of the results (plots are saved in results_dir/genes_from_necrop/<tissue>)
+    processes - number of processes drawing plots (default: number of cpus)
+ 	
+ Returns:
+ 	Saves the plots of expression by time of death of each significant gene from specified tissue and prints the number of plots per second.
+"""
+
+folders_of_tissues = {'ventricle': ('left_ventricle', 'lef_ventricle'),
+                      'atrial': ('atrial_appendage', 'atrial_appendage'),
+                      'coronary': ('coronary', 'coronary')}
+
+def save_plot(df,tissue,results_dir,processes=None):
+    folder, prefix = folders_of_tissues.get(tissue, (tissue, tissue))
+    output_dir = os.path.join(results_dir, 'genes_from_necrop', folder)
+    report = plot_renderer.render_gene_plots(df, output_dir, prefix, processes=processes)
+    print(f"{report['drawn']} plots drawn, {report['skipped']} up to date, {round(report['plots_per_second'],1)} plots/s")
@@ -0,0 +1,64 @@
+import pandas as pd
+
+"""
+Title: Description
+Streaming filter of genes for CSVs of expression (Gene_ID in the first column). Each row is read once, its gene id is
+checked against hashed sets of genes and the row is written, unchanged, to the output of every list that contains it.
+"""
+
+"""
+Function: read_gene_set
+
+ Description:
+    Reads a list of genes and returns it as a set, for constant time lookups. Versions of Ensembl ids are removed.
+
+ Parameters:
+ 	path - path of the file with the list of genes
+ 	column - name of the column with the gene ids
+ 	sep - separator of the file
+
+ Returns:
+ 	Set of gene ids without version.
+"""
+
+def read_gene_set(path, column, sep=','):
+    genes = pd.read_csv(path, sep=sep, usecols=[column])[column].dropna().astype(str)
+    return set(gene.split('.')[0] for gene in genes)
+
+"""
+Function: filter_rows
+
+ Description:
+    Reads the CSV of expression line by line and writes each line to the outputs whose gene set contains the gene of the line.
+    The decision is taken once for each row and values are never converted, so all lists are applied in a single pass
+    with memory independent of the size of the file.
+
+ Parameters:
+ 	df - path for the CSV with expression of genes (first line is the header, first column the Gene_ID)
+ 	outputs - dictionary {name: (gene set, path of output CSV)}
+
+ Returns:
+ 	Dictionary {name: number of genes written}.
+"""
+
+def filter_rows(df, outputs):
+    files = {}
+    written = {}
+    try:
+        for name in outputs:
+            files[name] = open(outputs[name][1], 'w', newline='')
+            written[name] = 0
+        with open(df, 'r') as gct:
+            header = next(gct)
+            for name in outputs:
+                files[name].write(header)
+            for line in gct:
+                gene = line.split(',', 1)[0].split('.')[0]
+                for name in outputs:
+                    if gene in outputs[name][0]:
+                        files[name].write(line)
+                        written[name] += 1
+    finally:
+        for name in files:
+            files[name].close()
+    return written
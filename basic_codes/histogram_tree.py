@@ -0,0 +1,285 @@
+import numpy as np
+import hashlib
+from collections import OrderedDict
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+"""
+Title: Description
+Decision tree engine for fitting many trees on the same expression matrix. The matrix is quantized once per experiment into
+uint8 bins (one bin for each distinct value of a gene while they fit in max_bins, quantiles of the samples otherwise) and the
+trees are grown with the gini criterion by counting the classes in each bin, without sorting the expression values again for
+each node of each tree.
+
+Fitted trees have a tree_ with the same arrays of a sklearn.tree.DecisionTreeClassifier (feature, threshold, children_left,
+children_right, value, n_node_samples, ...), so tree_extraction and sklearn.tree.export_graphviz read them in the same way.
+"""
+
+"""
+Function: bin_matrix
+
+ Description:
+    Quantizes each column (gene) of the expression matrix into at most max_bins bins. Equal values always get the same bin and
+    bins keep the order of the values. When a gene has at most max_bins distinct values every value gets its own bin, and the
+    splits found over the bins are the same splits searched by sklearn over the sorted values.
+
+ Parameters:
+ 	x - matrix of expression values (samples x genes)
+ 	max_bins - maximum number of bins of a gene (up to 256)
+
+ Returns:
+ 	Dictionary with 'bins' (uint8 matrix, samples x genes) and 'lower'/'upper' (genes x max_bins, smallest and largest value
+ 	of each bin, used for the thresholds of the splits).
+"""
+
+def bin_matrix(x, max_bins=256):
+    x = np.asarray(x, dtype=np.float32)
+    n_samples, n_genes = x.shape
+    order = np.argsort(x, axis=0, kind='stable')
+    sorted_x = np.take_along_axis(x, order, axis=0)
+    new_value = np.ones(sorted_x.shape, dtype=bool)
+    new_value[1:] = sorted_x[1:] != sorted_x[:-1]
+    dense_rank = np.cumsum(new_value, axis=0)-1 # Rank among the distinct values of the gene
+    n_distinct = dense_rank[-1]+1
+    # Equal-frequency bins for genes with many distinct values: position of the first sample with the same value
+    first_position = np.maximum.accumulate(np.where(new_value, np.arange(n_samples)[:, None], 0), axis=0)
+    sorted_bins = np.where(n_distinct <= max_bins, dense_rank, first_position*max_bins//n_samples).astype(np.uint8)
+
+    bins = np.empty(x.shape, dtype=np.uint8)
+    np.put_along_axis(bins, order, sorted_bins, axis=0)
+    lower = np.full((n_genes, max_bins), np.inf, dtype=np.float32)
+    upper = np.full((n_genes, max_bins), -np.inf, dtype=np.float32)
+    first = np.ones(sorted_bins.shape, dtype=bool)
+    first[1:] = sorted_bins[1:] != sorted_bins[:-1]
+    last = np.ones(sorted_bins.shape, dtype=bool)
+    last[:-1] = first[1:]
+    rows, genes = np.nonzero(first)
+    lower[genes, sorted_bins[rows, genes]] = sorted_x[rows, genes]
+    rows, genes = np.nonzero(last)
+    upper[genes, sorted_bins[rows, genes]] = sorted_x[rows, genes]
+    return {'bins': bins, 'lower': lower, 'upper': upper}
+
+def _proxy(left, total, n_left, n):
+    # Gini improvement up to a constant (same ranking of sklearn's proxy_impurity_improvement): sum of squared class counts
+    # of each side divided by the samples of the side. left is a list with the cumulated counts of each class
+    squares_left = 0
+    squares_right = 0
+    for k in range(len(left)):
+        squares_left = squares_left + left[k]*left[k]
+        squares_right = squares_right + (total[k]-left[k])*(total[k]-left[k])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return squares_left/n_left + squares_right/(n-n_left)
+
+def _best_split_histogram(bins, y, n_classes, max_bins):
+    # Counts of each class in each bin of each gene, cumulated over the bins
+    n, c = bins.shape
+    codes = bins + (y[:, None]*c + np.arange(c))*max_bins
+    histogram = np.bincount(codes.ravel(), minlength=n_classes*c*max_bins).reshape(n_classes, c, max_bins)
+    left = [np.cumsum(histogram[k], axis=1) for k in range(n_classes)]
+    n_left = sum(left)
+    proxy = _proxy(left, [np.bincount(y, minlength=n_classes)[k] for k in range(n_classes)], n_left, n)
+    proxy[(histogram.sum(axis=0) == 0) | (n_left == n)] = -np.inf # Splits only after a non empty bin, with samples on both sides
+    position = np.argmax(proxy, axis=1) # First (lowest) split of the gene with the best value
+    return proxy[np.arange(c), position], position
+
+def _best_split_sorted(bins, y, n_classes):
+    # Same search for small nodes: the bins of the node are sorted (radix sort of uint8) instead of counted in every bin
+    n, c = bins.shape
+    order = np.argsort(bins, axis=0, kind='stable')
+    sorted_bins = np.take_along_axis(bins, order, axis=0)
+    sorted_y = y[order[:-1]]
+    left = [np.cumsum(sorted_y == k, axis=0, dtype=np.int64) for k in range(n_classes)]
+    proxy = _proxy(left, np.bincount(y, minlength=n_classes), np.arange(1, n)[:, None], n)
+    proxy[sorted_bins[1:] == sorted_bins[:-1]] = -np.inf # Equal values cannot be split
+    position = np.argmax(proxy, axis=0)
+    return proxy[position, np.arange(c)], sorted_bins[position, np.arange(c)]
+
+def _gini(counts):
+    n = counts.sum(axis=-1)
+    return 1.0-((counts/np.maximum(n, 1)[..., None])**2).sum(axis=-1)
+
+def _split_bytes(split):
+    # Memory of a split search in the cache: arrays and the overhead of the key, the tuple and the arrays
+    return 256 if split is None else 256+sum(array.nbytes for array in split)
+
+class _Tree:
+    # Arrays of a fitted tree, with the names of the attributes of sklearn's Tree
+    def __init__(self, nodes, n_classes):
+        self.node_count = len(nodes['feature'])
+        self.feature = np.array(nodes['feature'], dtype=np.intp)
+        self.threshold = np.array(nodes['threshold'], dtype=np.float64)
+        self.children_left = np.array(nodes['left'], dtype=np.intp)
+        self.children_right = np.array(nodes['right'], dtype=np.intp)
+        counts = np.array(nodes['counts'], dtype=np.float64)
+        self.n_node_samples = counts.sum(axis=1).astype(np.intp)
+        self.weighted_n_node_samples = counts.sum(axis=1)
+        self.value = (counts/self.weighted_n_node_samples[:, None])[:, None, :] # Fraction of the samples of each class, like sklearn >= 1.4
+        self.impurity = _gini(counts)
+        self.max_depth = max(nodes['depth'])
+        self.n_outputs = 1
+        self.n_classes = np.array([n_classes], dtype=np.intp)
+
+"""
+Class: HistogramTreeClassifier
+
+ Description:
+    Decision tree (gini, grown until the leaves are pure like the default DecisionTreeClassifier) fitted on a matrix
+    created by bin_matrix. Ties between genes with the same improvement are broken at random with random_state, like the
+    random order in which sklearn visits the features of each node.
+
+ Parameters:
+ 	random_state - seed of the tree
+ 	max_depth - maximum depth (default: none)
+ 	min_samples_split - minimum number of samples to split a node
+ 	max_cells - number of cells (samples x genes) processed at a time in the split search, limits the memory used
+ 	max_cache_mb - megabytes of split searches kept in binned['splits'], the least recently used are dropped (0 keeps none).
+ 	               A search keeps 7 bytes for every gene tied with the best improvement (about 130KB when all the 19k genes
+ 	               of GTEx tie, common in small nodes), so the cache is bounded by the bytes of its entries and not by their
+ 	               number. Each process fitting trees has its own cache
+"""
+
+class HistogramTreeClassifier(ClassifierMixin, BaseEstimator):
+
+    criterion = 'gini'
+    n_outputs_ = 1
+
+    def __init__(self, random_state=None, max_depth=None, min_samples_split=2, max_cells=2**22, max_cache_mb=256):
+        self.random_state = random_state
+        self.max_depth = max_depth
+        self.min_samples_split = min_samples_split
+        self.max_cells = max_cells
+        self.max_cache_mb = max_cache_mb
+
+    """
+    Function: fit
+
+     Description:
+        Grows the tree depth first, numbering the nodes in the same order of sklearn (a father before its sons, the left
+        son first).
+
+     Parameters:
+     	binned - dictionary returned by bin_matrix. The split search of each node is kept in binned['splits'] (by samples of
+     	         the node, up to max_cache_mb), so trees of the same matrix only search again the nodes that no recent
+     	         tree had. Each process fitting trees has its own copy of binned, and of the searches kept
+     	y - classes of the samples as numbers (0 to n_classes-1)
+     	order - permutation of the columns seen by the tree: feature j of the tree is column order[j] of the matrix, like a
+     	        tree fitted on x[:, order]. The matrix itself is not copied (default: columns in their order)
+
+     Returns:
+     	The fitted classifier.
+    """
+
+    def fit(self, binned, y, order=None):
+        bins = binned['bins']
+        max_bins = binned['lower'].shape[1]
+        y = np.asarray(y, dtype=np.int64)
+        n_genes = bins.shape[1]
+        n_classes = int(y.max())+1
+        position_of_column = np.arange(n_genes)
+        if order is not None:
+            position_of_column[np.asarray(order)] = np.arange(n_genes)
+        rng = np.random.default_rng(self.random_state)
+        splits = binned.setdefault('splits', OrderedDict()) # Split search of each group of samples, shared by the trees of the matrix
+        budget = self.max_cache_mb*1024*1024
+        nodes = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'counts': [], 'depth': []}
+
+        stack = [(np.arange(len(y), dtype=np.int32), 0, -1, False)] # Samples, depth, father and side of each node still to be added
+        while stack:
+            samples, depth, father, is_left = stack.pop()
+            node = len(nodes['feature'])
+            if father >= 0:
+                nodes['left' if is_left else 'right'][father] = node
+            counts = np.bincount(y[samples], minlength=n_classes)
+            for name, value in (('feature', -2), ('threshold', -2.0), ('left', -1), ('right', -1), ('counts', counts), ('depth', depth)):
+                nodes[name].append(value)
+            if len(samples) < self.min_samples_split or np.count_nonzero(counts) <= 1 or depth == self.max_depth:
+                continue
+            key = hashlib.sha1(samples.tobytes()).digest()
+            if key in splits:
+                split = splits[key]
+                splits.move_to_end(key)
+            else:
+                split = self._find_split(bins[samples], y[samples], n_classes, max_bins)
+                size = _split_bytes(split)
+                if size <= budget:
+                    splits[key] = split
+                    binned['splits_bytes'] = binned.get('splits_bytes', 0)+size
+                    while binned['splits_bytes'] > budget: # Least recently used searches
+                        binned['splits_bytes'] -= _split_bytes(splits.popitem(last=False)[1])
+            if split is None: # Every gene is constant in the node
+                continue
+            candidates, left_bins, right_bins = split
+            chosen = rng.integers(len(candidates)) # Tie between genes with the same improvement
+            column, left_bin, right_bin = int(candidates[chosen]), int(left_bins[chosen]), int(right_bins[chosen])
+            below, above = float(binned['upper'][column, left_bin]), float(binned['lower'][column, right_bin])
+            threshold = below/2.0 + above/2.0 # Middle of the values around the split, like sklearn
+            if threshold == above or np.isinf(threshold):
+                threshold = below
+            nodes['feature'][node] = position_of_column[column]
+            nodes['threshold'][node] = threshold
+            goes_left = bins[samples, column] <= left_bin
+            stack.append((samples[~goes_left], depth+1, node, False))
+            stack.append((samples[goes_left], depth+1, node, True))
+
+        self.tree_ = _Tree(nodes, n_classes)
+        self.classes_ = np.arange(n_classes)
+        self.n_classes_ = n_classes
+        self.n_features_in_ = n_genes
+        self.feature_importances_ = self._importances()
+        return self
+
+    def _find_split(self, bins, y, n_classes, max_bins):
+        # Genes with the best improvement in the node, with the last bin of the left side and first bin of the right side
+        n, n_genes = bins.shape
+        chunk = max(1, self.max_cells//max(n, max_bins*n_classes))
+        best = np.empty(n_genes)
+        left_bin = np.empty(n_genes, dtype=np.int64)
+        for start in range(0, n_genes, chunk):
+            part = bins[:, start:start+chunk]
+            if n > max_bins:
+                best[start:start+chunk], left_bin[start:start+chunk] = _best_split_histogram(part, y, n_classes, max_bins)
+            else:
+                best[start:start+chunk], left_bin[start:start+chunk] = _best_split_sorted(part, y, n_classes)
+        best_value = best.max()
+        if best_value == -np.inf:
+            return None
+        candidates = np.flatnonzero(best == best_value)
+        left_bin = left_bin[candidates]
+        values = bins[:, candidates].astype(np.int64)
+        right_bin = np.where(values > left_bin, values, max_bins).min(axis=0)
+        return candidates.astype(np.int32), left_bin.astype(np.uint8), right_bin.astype(np.uint16) # Smallest types, kept in the cache
+
+    def _importances(self):
+        # Weighted decrease of gini of the splits of each feature, normalized to sum 1 (same of sklearn)
+        tree_ = self.tree_
+        importances = np.zeros(self.n_features_in_)
+        w = tree_.weighted_n_node_samples
+        for node in np.flatnonzero(tree_.children_left != -1):
+            left, right = tree_.children_left[node], tree_.children_right[node]
+            importances[tree_.feature[node]] += w[node]*tree_.impurity[node] - w[left]*tree_.impurity[left] - w[right]*tree_.impurity[right]
+        total = importances.sum()
+        return importances/total if total > 0 else importances
+
+    """
+    Function: apply
+
+     Parameters:
+     	x - matrix of expression values (samples x genes) in the column order of the tree
+
+     Returns:
+     	Leaf of each sample.
+    """
+
+    def apply(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        tree_ = self.tree_
+        node = np.zeros(len(x), dtype=np.intp)
+        active = tree_.children_left[node] != -1
+        while active.any():
+            current = node[active]
+            goes_left = x[np.flatnonzero(active), tree_.feature[current]] <= tree_.threshold[current]
+            node[active] = np.where(goes_left, tree_.children_left[current], tree_.children_right[current])
+            active = tree_.children_left[node] != -1
+        return node
+
+    def predict(self, x):
+        return self.classes_[np.argmax(self.tree_.value[self.apply(x), 0, :], axis=1)]
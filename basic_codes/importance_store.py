@@ -0,0 +1,170 @@
+import numpy as np
+import os
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+"""
+Title: Description
+Feature importances of the trees of an experiment. Importances are kept in a preallocated matrix (trees x genes, float32,
+in memory or memory-mapped in a .npy file) in the original order of the genes, and the mean, variance (Welford) and number
+of times each gene was among the most important genes of a tree are updated with each tree, so the summary of the experiment
+is ready at the end without reading the matrix again.
+"""
+
+create_sql = """CREATE TABLE IF NOT EXISTS feature_importance (
+    experiencia_id INTEGER NOT NULL,
+    gene_name TEXT NOT NULL,
+    n_trees INTEGER NOT NULL,
+    avg_importance REAL,
+    std_importance REAL,
+    top_k_count INTEGER,
+    importance_rank INTEGER,
+    PRIMARY KEY (experiencia_id, gene_name)
+);"""
+
+"""
+Class: ImportanceStore
+
+ Parameters:
+ 	n_trees - number of trees of the experiment (rows of the matrix)
+ 	genes - names of the genes in the original order of the columns
+ 	path - .npy file for a memory-mapped matrix (default: matrix in memory)
+ 	top_k - number of genes counted as the most important of each tree
+ 	resume - opens the existing file of path instead of creating it (see restore)
+"""
+
+class ImportanceStore:
+
+    def __init__(self, n_trees, genes, path=None, top_k=20, resume=False):
+        self.genes = list(genes)
+        self.top_k = min(top_k, len(self.genes))
+        if path is None:
+            self.matrix = np.zeros((n_trees, len(self.genes)), dtype=np.float32)
+        elif resume and os.path.exists(path):
+            self.matrix = open_memmap(path, mode='r+')
+        else:
+            self.matrix = open_memmap(path, mode='w+', dtype=np.float32, shape=(n_trees, len(self.genes)))
+        self.n_trees = 0
+        self.mean = np.zeros(len(self.genes))
+        self.m2 = np.zeros(len(self.genes))
+        self.top_k_count = np.zeros(len(self.genes), dtype=np.int64)
+
+    """
+    Function: add
+
+     Parameters:
+     	iteration - row of the tree in the matrix
+     	importances - feature_importances_ of the tree, in the column order used to fit it
+     	order - permutation of the columns of the tree (feature j is gene order[j])
+    """
+
+    def add(self, iteration, importances, order):
+        row = np.empty(len(self.genes))
+        row[np.asarray(order)] = importances # Back to the original order of the genes
+        self.matrix[iteration] = row
+        self._update(np.asarray(self.matrix[iteration], dtype=np.float64)) # Values as saved, so a resumed experiment gets the same statistics
+
+    def _update(self, row):
+        self.n_trees += 1
+        delta = row-self.mean
+        self.mean += delta/self.n_trees
+        self.m2 += delta*(row-self.mean)
+        top = np.argpartition(-row, self.top_k-1)[:self.top_k]
+        self.top_k_count[top[row[top] > 0]] += 1 # Genes not used by the tree are not counted
+
+    """
+    Function: restore
+
+     Description:
+        Recomputes the statistics from the rows of the trees already done, for a resumed experiment.
+
+     Parameters:
+     	n_trees - number of trees done (first rows of the matrix)
+    """
+
+    def restore(self, n_trees):
+        self.n_trees = 0
+        self.mean[:] = 0
+        self.m2[:] = 0
+        self.top_k_count[:] = 0
+        for iteration in range(n_trees):
+            self._update(np.asarray(self.matrix[iteration], dtype=np.float64))
+
+    """
+    Function: load
+
+     Description:
+        Combines the statistics with the summary saved by save, for a resumed experiment whose importances were kept in
+        memory (no path). Means and variances are combined with the parallel formula of Chan et al., like the pairs of
+        gene_pair_aggregate, so the next save writes the statistics of every tree instead of only the new ones.
+
+     Parameters:
+     	db - sqlite3 connection
+     	experiencia_id - id of the experiment
+
+     Returns:
+     	Number of trees of the saved summary (0 if the experiment has no summary saved).
+    """
+
+    def load(self, db, experiencia_id):
+        tables = set(row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='table';"))
+        if not('feature_importance' in tables):
+            return 0
+        saved = pd.read_sql_query("""SELECT gene_name, n_trees, avg_importance, std_importance, top_k_count FROM feature_importance
+            WHERE experiencia_id = ?;""", db, params=(experiencia_id,))
+        if len(saved) == 0:
+            return 0
+        saved = saved.set_index('gene_name').reindex(self.genes)
+        n_saved = int(saved['n_trees'].max())
+        mean = saved['avg_importance'].fillna(0).to_numpy(dtype=np.float64)
+        m2 = (saved['std_importance'].fillna(0).to_numpy(dtype=np.float64)**2)*max(n_saved-1, 0)
+        n = self.n_trees+n_saved
+        delta = mean-self.mean
+        self.m2 += m2+delta*delta*self.n_trees*n_saved/n
+        self.mean += delta*n_saved/n
+        self.n_trees = n
+        self.top_k_count += saved['top_k_count'].fillna(0).to_numpy(dtype=np.int64)
+        return n_saved
+
+    """
+    Function: summary
+
+     Returns:
+     	Dataframe with n_trees, avg_importance, std_importance (sample standard deviation), top_k_count and importance_rank
+     	(1 for the largest mean) of each gene, ordered by rank.
+    """
+
+    def summary(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2/(self.n_trees-1)) if self.n_trees > 1 else np.full(len(self.genes), np.nan)
+        df = pd.DataFrame({'gene_name': self.genes, 'n_trees': self.n_trees, 'avg_importance': self.mean,
+                           'std_importance': std, 'top_k_count': self.top_k_count})
+        df = df.sort_values(['avg_importance', 'top_k_count'], ascending=False, kind='stable')
+        df['importance_rank'] = np.arange(1, len(df)+1)
+        return df.reset_index(drop=True)
+
+    """
+    Function: save
+
+     Description:
+        Writes the summary of the experiment in the feature_importance table (created if it does not exist) and, if
+        csv_path is given, in a CSV file. The memory-mapped matrix, if any, is flushed to its file.
+
+     Parameters:
+     	db - sqlite3 connection
+     	experiencia_id - id of the experiment
+     	csv_path - path of the CSV file (default: none)
+    """
+
+    def save(self, db, experiencia_id, csv_path=None):
+        df = self.summary()
+        if isinstance(self.matrix, np.memmap):
+            self.matrix.flush()
+        if csv_path is not None:
+            df.to_csv(csv_path, index=False)
+        db.executescript(create_sql)
+        with db:
+            db.executemany("""INSERT OR REPLACE INTO feature_importance (experiencia_id,gene_name,n_trees,avg_importance,
+                std_importance,top_k_count,importance_rank) VALUES (?,?,?,?,?,?,?);""",
+                [(experiencia_id, row[0], int(row[1]), float(row[2]), None if np.isnan(row[3]) else float(row[3]), int(row[4]), int(row[5]))
+                 for row in df[['gene_name', 'n_trees', 'avg_importance', 'std_importance', 'top_k_count', 'importance_rank']].itertuples(index=False)])
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+"""
+Title: Description
+PCA of samples for matrices that do not fit in memory. Matrices come from expression_cache, opened with the copy of samples
+in rows (memory-mapped, samples x genes), and are read in chunks of samples: each chunk is a contiguous block of the file,
+so a pass over the chunks reads the file once, and the memory used depends on the chunk and not on the number of genes x samples.
+"""
+
+"""
+Function: samples_per_chunk
+
+ Description:
+    Number of samples read at a time to respect a memory budget (values are converted to float64 by sklearn).
+
+ Parameters:
+ 	n_genes - number of genes of the matrix
+ 	n_components - number of components of the PCA (minimum size of a chunk)
+ 	max_memory_mb - memory budget for a chunk, in megabytes
+
+ Returns:
+ 	Number of samples in each chunk.
+"""
+
+def samples_per_chunk(n_genes, n_components, max_memory_mb):
+    return max(n_components, int(max_memory_mb*1024*1024//(n_genes*8*3)))
+
+def _chunks(matrices, chunk):
+    # Chunks of samples (samples x genes) of one or more matrices, in order
+    for matrix in matrices:
+        values = matrix['values_by_sample']
+        for start in range(0, values.shape[0], chunk):
+            yield matrix['samples'][start:start+chunk], np.asarray(values[start:start+chunk], dtype=np.float64)
+
+"""
+Function: fit_pca_from_cache
+
+ Description:
+    Fits a PCA of the samples of one or more cached matrices (for example, one for each tissue) with the same genes.
+    With method 'incremental' the model is fitted chunk by chunk (IncrementalPCA). With 'randomized' the samples are
+    loaded at once and a randomized SVD is used, which is faster, but only when all samples fit in the budget of a chunk;
+    otherwise the incremental PCA is used.
+
+ Parameters:
+ 	matrices - list of dictionaries returned by expression_cache.open_expression_matrix with samples_major
+ 	n_components - number of components
+ 	method - 'incremental' or 'randomized'
+ 	max_memory_mb - memory budget for each chunk of samples, in megabytes
+
+ Returns:
+ 	Dictionary with the fitted model ('pca') and the transformed samples ('transformed', dataframe indexed by sample id).
+ 	Prints error message if method is not valid, if the genes of the matrices differ, if a matrix was opened without
+ 	samples_major or if there are fewer samples than components.
+"""
+
+def fit_pca_from_cache(matrices, n_components=2, method='incremental', max_memory_mb=512):
+    for matrix in matrices[1:]:
+        if not np.array_equal(matrix['genes'], matrices[0]['genes']):
+            print('Error: matrices have different genes')
+            return None
+    if not(all('values_by_sample' in matrix for matrix in matrices)):
+        print('Error: matrices must be opened with samples_major')
+        return None
+    from sklearn.decomposition import IncrementalPCA, PCA # Loaded only when a PCA is fitted
+    n_genes = len(matrices[0]['genes'])
+    chunk = samples_per_chunk(n_genes, n_components, max_memory_mb)
+    n_samples = sum(len(matrix['samples']) for matrix in matrices)
+    if method == 'randomized' and n_samples > chunk:
+        print(f'{n_samples} samples do not fit in {max_memory_mb}MB, using the incremental PCA')
+        method = 'incremental'
+    if n_samples < n_components:
+        print('Error: fewer samples than components')
+        return None
+    if method == 'incremental':
+        pca = IncrementalPCA(n_components=n_components)
+        batch = None
+        pending = None
+        for _, values in _chunks(matrices, chunk):
+            # partial_fit needs at least n_components samples, so a small chunk is joined to the next one and each batch
+            # is fitted only when the next one is ready, so a small last chunk is joined to the batch before it
+            pending = values if pending is None else np.vstack([pending, values])
+            if len(pending) >= n_components:
+                if batch is not None:
+                    pca.partial_fit(batch)
+                batch, pending = pending, None
+        if pending is not None:
+            batch = pending if batch is None else np.vstack([batch, pending])
+        pca.partial_fit(batch)
+    elif method == 'randomized':
+        pca = PCA(n_components=n_components, svd_solver='randomized', random_state=0)
+        pca.fit(np.vstack([values for _, values in _chunks(matrices, chunk)]))
+    else:
+        print('Error: invalid method')
+        return None
+    samples = []
+    transformed = []
+    for names, values in _chunks(matrices, chunk):
+        samples.extend(names)
+        transformed.append(pca.transform(values)) # One batched call for each chunk
+    return {'pca': pca, 'transformed': pd.DataFrame(np.vstack(transformed), index=samples)}
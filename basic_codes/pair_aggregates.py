@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+"""
+Title: Description
+Running aggregate of the pairs of genes (father, son) of father_and_son_nodes, kept for each experiment while trees are saved.
+Replaces the TEMP_gene_idNN tables of the README: count, mean and variance (Welford) of the depth, of the number of samples
+of each class in the son and of the expression value are updated with each tree, so the most frequent pairs can be read at
+any moment with an indexed lookup, without scanning father_and_son_nodes and without a STDEV aggregate.
+"""
+
+statistics = ['depth', 'CVDA_son', 'CVD_son', 'CA_son', 'C_son', 'expression_value']
+
+create_sql = """CREATE TABLE IF NOT EXISTS gene_pair_aggregate (
+    experiencia_id INTEGER NOT NULL,
+    gene_id_parent TEXT NOT NULL,
+    gene_id_son TEXT NOT NULL,
+    co INTEGER NOT NULL,
+""" + ',\n'.join(f'    avg_{name} REAL, m2_{name} REAL' for name in statistics) + """,
+    PRIMARY KEY (experiencia_id, gene_id_parent, gene_id_son)
+);
+CREATE INDEX IF NOT EXISTS gene_pair_aggregate_co ON gene_pair_aggregate (experiencia_id, co DESC);"""
+
+# Combination of two groups of values (Chan et al.), the parallel form of the Welford update
+upsert_sql = ("INSERT INTO gene_pair_aggregate (experiencia_id,gene_id_parent,gene_id_son,co,"
+    + ','.join(f'avg_{name},m2_{name}' for name in statistics)
+    + ') VALUES (' + ','.join(['?']*(4+2*len(statistics))) + ')'
+    + ' ON CONFLICT(experiencia_id,gene_id_parent,gene_id_son) DO UPDATE SET co = co+excluded.co, '
+    + ', '.join(f'avg_{name} = avg_{name}+(excluded.avg_{name}-avg_{name})*CAST(excluded.co AS REAL)/(co+excluded.co), '
+                f'm2_{name} = m2_{name}+excluded.m2_{name}+(excluded.avg_{name}-avg_{name})*(excluded.avg_{name}-avg_{name})*co*CAST(excluded.co AS REAL)/(co+excluded.co)'
+                for name in statistics) + ';')
+
+"""
+Function: create_table
+
+ Description:
+    Creates the aggregate table and its index, if they do not exist.
+
+ Parameters:
+ 	db - sqlite3 connection
+"""
+
+def create_table(db):
+    db.executescript(create_sql)
+
+"""
+Function: aggregate_rows
+
+ Description:
+    Groups the rows of father_and_son_nodes of a tree by pair of genes, with Welford updates of mean and sum of squared
+    differences (m2) of each statistic.
+
+ Parameters:
+ 	rows - rows in the order of the insert in father_and_son_nodes: (gene_id_parent, gene_id_son, experiencia_id, depth,
+ 	       CVDA_father, CA_father, C_father, CVD_father, CVDA_son, CA_son, C_son, CVD_son, expression_value)
+
+ Returns:
+ 	List of rows for upsert_sql.
+"""
+
+def aggregate_rows(rows):
+    groups = {}
+    for row in rows:
+        key = (row[2], row[0], row[1])
+        values = (row[3], row[8], row[11], row[9], row[10], row[12]) # Same order of statistics
+        if not(key in groups):
+            groups[key] = [0, [0.0]*len(values), [0.0]*len(values)]
+        group = groups[key]
+        group[0] += 1
+        for i in range(len(values)):
+            delta = values[i]-group[1][i]
+            group[1][i] += delta/group[0]
+            group[2][i] += delta*(values[i]-group[1][i])
+    aggregated = []
+    for key in groups:
+        count, means, m2s = groups[key]
+        row = list(key)+[count]
+        for i in range(len(means)):
+            row += [means[i], m2s[i]]
+        aggregated.append(tuple(row))
+    return aggregated
+
+"""
+Function: most_frequent_pairs
+
+ Description:
+    Pairs of genes that appeared the most in an experiment, with mean and standard deviation of each statistic.
+    Same result of the TEMP_gene_idNN table of the README, read from the index of the aggregate table.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	limit - number of pairs (default: all)
+
+ Returns:
+ 	Dataframe with co, gene_id_parent, gene_id_son and avg_/std_ of each statistic, ordered by co.
+"""
+
+def most_frequent_pairs(db, experiencia_id, limit=None):
+    sql = 'SELECT * FROM gene_pair_aggregate WHERE experiencia_id = ? ORDER BY co DESC'
+    params = [experiencia_id]
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    df = pd.read_sql_query(sql, db, params=params)
+    for name in statistics:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            df[f'std_{name}'] = np.sqrt(df[f'm2_{name}']/(df['co']-1)) # Sample standard deviation, like STDEV
+        df = df.drop(columns=f'm2_{name}')
+    return df
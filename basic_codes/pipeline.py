@@ -0,0 +1,400 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import argparse
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import expression_cache
+import pipeline_stages
+import sample_attributes
+import gene_filter
+
+"""
+Title: Description
+Runner of the GTEx pipeline as a graph of stages (GCT extraction, gene filter, quartile assignment, quartile erasure, labels
+and tree experiment). The output of each stage is saved in a cache folder keyed by the hash of its inputs (contents of
+external files and keys of upstream stages), its parameters and the source of its code, so a stage whose inputs did not
+change is not run again, and stages of different tissues run at the same time on threads. The stage of the trees is never
+taken from the cache: it adds an experiment to the database, which is not one of its outputs. The functions of the stages are
+in pipeline_stages.py and tree_experiment.py; the numbered scripts keep running them with the paths of util.
+"""
+
+"""
+Function: source_hash
+
+ Parameters:
+ 	objects - functions or modules whose source is part of the key of a stage
+
+ Returns:
+ 	Hexadecimal string with the hash of the source of all objects.
+"""
+
+def source_hash(objects):
+    sha = hashlib.sha256()
+    for obj in objects:
+        sha.update(inspect.getsource(obj).encode())
+    return sha.hexdigest()
+
+"""
+Class: Pipeline
+
+ Description:
+    Graph of stages. Each stage is a function called as function(inputs, outputs, **params), where inputs is a dictionary
+    {name: path} of the files it reads and outputs a dictionary {name: path} of the files it must create, inside the folder
+    of the stage in the cache. The function may return a JSON-serializable value, saved with the outputs.
+
+ Parameters:
+ 	cache_dir - folder of the outputs of the stages (cache_dir/stage/key)
+ 	max_workers - number of stages run at the same time
+"""
+
+class Pipeline:
+
+    def __init__(self, cache_dir, max_workers=4):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.stages = {}
+        self.keys = {}
+        self.known_files = {}
+        self.files_path = os.path.join(cache_dir, 'file_hashes.json')
+        os.makedirs(cache_dir, exist_ok=True)
+        if os.path.exists(self.files_path):
+            with open(self.files_path, 'r') as f:
+                self.known_files = json.load(f)
+
+    """
+    Function: add
+
+     Parameters:
+     	name - name of the stage
+     	function - function of the stage
+     	inputs - dictionary {name: path of an external file, or (stage, output name) for the output of another stage}
+     	outputs - dictionary {name: name of the file created in the folder of the stage}
+     	params - dictionary of parameters of the function (JSON-serializable)
+     	code - modules or functions whose source is part of the key, besides the function (the code the function calls)
+     	cacheable - False for stages with effects outside their outputs (like writing on a database), run every time
+    """
+
+    def add(self, name, function, inputs=None, outputs=None, params=None, code=(), cacheable=True):
+        for value in (inputs or {}).values():
+            if isinstance(value, tuple) and not(value[0] in self.stages):
+                print(f'Error: stage {value[0]} of {name} not found')
+                return
+        self.stages[name] = {'function': function, 'inputs': inputs or {}, 'outputs': outputs or {},
+                             'params': params or {}, 'code': source_hash([function]+list(code)), 'cacheable': cacheable}
+
+    def dependencies(self, name):
+        return sorted(set(value[0] for value in self.stages[name]['inputs'].values() if isinstance(value, tuple)))
+
+    def _file_hash(self, path):
+        path = os.path.abspath(path)
+        known = self.known_files.get(path)
+        digest = expression_cache.file_hash(path, known)
+        stat = os.stat(path)
+        self.known_files[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest}
+        return digest
+
+    """
+    Function: key
+
+     Returns:
+     	Key of the stage: hash of its code, parameters, contents of its external files and keys of the stages it depends on.
+    """
+
+    def key(self, name):
+        if name in self.keys:
+            return self.keys[name]
+        stage = self.stages[name]
+        inputs = {}
+        for input_name, value in stage['inputs'].items():
+            if isinstance(value, tuple):
+                inputs[input_name] = [self.key(value[0]), value[1]]
+            else:
+                inputs[input_name] = self._file_hash(value)
+        description = {'stage': name, 'code': stage['code'], 'params': stage['params'], 'inputs': inputs,
+                       'outputs': stage['outputs']}
+        self.keys[name] = hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+        return self.keys[name]
+
+    def folder(self, name):
+        return os.path.join(self.cache_dir, name, self.key(name)[:16])
+
+    """
+    Function: output
+
+     Returns:
+     	Path of an output of a stage in the cache (the file exists only after the stage has run).
+    """
+
+    def output(self, name, output_name):
+        return os.path.join(self.folder(name), self.stages[name]['outputs'][output_name])
+
+    def _cached(self, name):
+        try:
+            with open(os.path.join(self.folder(name), 'stage.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _run_stage(self, name):
+        stage = self.stages[name]
+        final = self.folder(name)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        work = tempfile.mkdtemp(prefix=os.path.basename(final)+'.', dir=os.path.dirname(final)) # Moved to its place at the end, so an interrupted stage leaves no output
+        try:
+            inputs = {}
+            for input_name, value in stage['inputs'].items():
+                inputs[input_name] = self.output(*value) if isinstance(value, tuple) else value
+            outputs = {output_name: os.path.join(work, file_name) for output_name, file_name in stage['outputs'].items()}
+            start = time.perf_counter()
+            result = stage['function'](inputs, outputs, **stage['params'])
+            record = {'stage': name, 'key': self.key(name), 'seconds': time.perf_counter()-start, 'result': result,
+                      'params': stage['params'], 'time': time.time()}
+            with open(os.path.join(work, 'stage.json'), 'w') as f:
+                json.dump(record, f, default=str)
+            if os.path.exists(final):
+                shutil.rmtree(final)
+            os.rename(work, final)
+            return record
+        finally:
+            if os.path.exists(work):
+                shutil.rmtree(work)
+
+    """
+    Function: order
+
+     Parameters:
+     	targets - stages wanted (default: all stages)
+
+     Returns:
+     	Names of the stages needed by the targets, each one after the stages it depends on.
+    """
+
+    def order(self, targets=None):
+        names = []
+        def visit(name):
+            if name in names:
+                return
+            for dependency in self.dependencies(name):
+                visit(dependency)
+            names.append(name)
+        for name in (targets or list(self.stages)):
+            visit(name)
+        return names
+
+    """
+    Function: run
+
+     Description:
+        Runs the stages whose outputs are not in the cache (and the stages that are not cacheable), each one as soon as the
+        stages it depends on are done. Stages that depend on a stage that failed are skipped.
+
+     Parameters:
+     	targets - stages wanted (default: all stages)
+     	force - stages run even if their outputs are in the cache
+
+     Returns:
+     	Dictionary {stage: {'status': 'cached', 'ran', 'failed' or 'skipped', 'seconds', 'key', 'result'}}. Prints error
+     	message for each stage that failed.
+    """
+
+    def run(self, targets=None, force=()):
+        names = self.order(targets)
+        for name in names:
+            self.key(name)
+        with open(self.files_path, 'w') as f:
+            json.dump(self.known_files, f)
+        results = {}
+        pending = list(names)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    dependencies = self.dependencies(name)
+                    if any(results[d]['status'] in ('failed', 'skipped') for d in dependencies if d in results):
+                        results[name] = {'status': 'skipped', 'seconds': 0.0, 'key': self.key(name), 'result': None}
+                        pending.remove(name)
+                        continue
+                    if not all(d in results for d in dependencies):
+                        continue
+                    pending.remove(name)
+                    record = None if name in force or not(self.stages[name]['cacheable']) else self._cached(name)
+                    if record is not None:
+                        results[name] = {'status': 'cached', 'seconds': 0.0, 'key': self.key(name), 'result': record['result']}
+                    else:
+                        running[executor.submit(self._run_stage, name)] = name
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        print(f'Error: stage {name} failed ({future.exception()!r})')
+                        results[name] = {'status': 'failed', 'seconds': 0.0, 'key': self.key(name), 'result': None}
+                    else:
+                        record = future.result()
+                        results[name] = {'status': 'ran', 'seconds': record['seconds'], 'key': self.key(name), 'result': record['result']}
+        return results
+
+# Stages of the GTEx pipeline
+
+def extract_stage(inputs, outputs, tissues, chunk_size=2000):
+    return pipeline_stages.create_log2tpm_for_tissues_from_gtex(inputs['gct'], inputs['attributes'],
+                                                                {tissues[name]: outputs[name] for name in outputs}, chunk_size=chunk_size)
+
+def filter_stage(inputs, outputs, filter_by, column, sep):
+    return pipeline_stages.filter_genes(inputs['expression'], {filter_by: (inputs['genes'], column, sep)},
+                                        {filter_by: outputs['filtered']})
+
+def quartiles_stage(inputs, outputs):
+    df = expression_cache.read_csv(inputs['expression']).reset_index()
+    return len(pipeline_stages.create_df_for_plot(df, inputs['attributes'], outputs['quartiles']))
+
+def erase_stage(inputs, outputs, quartiles):
+    df = pipeline_stages.erase_quartiles_and_fix_cols_names(expression_cache.read_csv(inputs['quartiles']).reset_index(), quartiles)
+    df.to_csv(outputs['erased'])
+    return list(df.shape)
+
+def label_stage(inputs, outputs):
+    df = expression_cache.read_csv(inputs['expression'])
+    labels = pd.read_csv(inputs['labels'], index_col=0)['Pacient_Condition']
+    df = df.join(labels, how='inner') # Samples without class are left out
+    df.to_csv(outputs['labelled'])
+    return df['Pacient_Condition'].value_counts().to_dict()
+
+def trees_stage(inputs, outputs, db_path, exper, settings):
+    import tree_experiment # Only the stage of the trees needs the libraries of the trees
+    df = expression_cache.read_csv(inputs['labelled'])
+    db = sqlite3.connect(db_path)
+    try:
+        run = tree_experiment.run_tree_experiment(df, db, exper, results_dir=os.path.dirname(outputs['experiment']), **settings)
+    finally:
+        db.close()
+    with open(outputs['experiment'], 'w') as f:
+        json.dump(run, f)
+    return run
+
+"""
+Variable: gtex_tissues
+
+ Description:
+    Tissues of the pipeline: name used in the files and tissue as written in SMTSD.
+"""
+
+gtex_tissues = {'coronary': 'Artery - Coronary',
+                'atrial_appendage': 'Heart - Atrial Appendage',
+                'left_ventricle': 'Heart - Left Ventricle'}
+
+"""
+Function: gtex_pipeline
+
+ Description:
+    Creates the graph of the GTEx pipeline: the GCT is read once for all tissues ('extract') and each tissue has its own
+    branch of stages ('filter_<tissue>', 'quartiles_<tissue>' and 'erase_<tissue>'). With labels, the samples of
+    tree_tissue are joined to their classes ('label_<tissue>') and the trees of an experiment are saved on the database
+    ('trees_<tissue>', run every time the pipeline runs, since each run adds an experiment to the database).
+
+ Parameters:
+ 	data_dir - data folder of the project (with raw/gtex and external)
+ 	cache_dir - folder of the outputs of the stages
+ 	tissues - dictionary {name used in the files: tissue as written in SMTSD} (default: gtex_tissues)
+ 	filter_by - list of genes applied (key of pipeline_stages.gene_lists)
+ 	quartiles - quartiles of time of death kept
+ 	labels - CSV with sample ids in the first column and a Pacient_Condition column (default: no trees)
+ 	tree_tissue - tissue of the trees
+ 	db_path - database of the trees (default: data_dir/interim/sql/bd_ic_v2.sqlite3)
+ 	exper - description of the experiment
+ 	tree_settings - parameters of tree_experiment.run_tree_experiment (n_times_run, seed, engine, n_jobs, ...)
+ 	max_workers - number of stages run at the same time
+
+ Returns:
+ 	Pipeline. Prints error message and returns None if filter_by is not valid.
+"""
+
+def gtex_pipeline(data_dir, cache_dir, tissues=None, filter_by='pc', quartiles=(0, 1), labels=None, tree_tissue='coronary',
+                  db_path=None, exper='Pipeline', tree_settings=None, max_workers=4):
+    if not(filter_by in pipeline_stages.gene_lists):
+        print('Error: Specified filtering method not valid')
+        return None
+    tissues = tissues or gtex_tissues
+    genes_path, column, sep = pipeline_stages.gene_lists[filter_by]
+    attributes = os.path.join(data_dir, 'raw', 'gtex', 'GTEx_Analysis_v8_Annotations_SampleAttributesDS.txt')
+    sample_attributes.fallback_cache_dir = os.path.join(cache_dir, 'sample_attributes') #Binary cache of the attributes, if data_dir is read-only
+    pipeline = Pipeline(cache_dir, max_workers=max_workers)
+    stage_code = [pipeline_stages, sample_attributes, gene_filter, expression_cache]
+    pipeline.add('extract', extract_stage,
+                 inputs={'gct': os.path.join(data_dir, 'raw', 'gtex', 'GTEx_Analysis_2017-06-05_v8_RNASeQCv1.1.9_gene_tpm.gct'),
+                         'attributes': attributes},
+                 outputs={name: f'log2_tpm_data_{name}_gtex.csv' for name in tissues}, params={'tissues': tissues},
+                 code=stage_code)
+    for name in tissues:
+        pipeline.add(f'filter_{name}', filter_stage,
+                     inputs={'expression': ('extract', name), 'genes': os.path.join(data_dir, *genes_path.split('/'))},
+                     outputs={'filtered': f'filtered_{filter_by}_log2_tpm_data_{name}_gtex.csv'},
+                     params={'filter_by': filter_by, 'column': column, 'sep': sep}, code=stage_code)
+        pipeline.add(f'quartiles_{name}', quartiles_stage,
+                     inputs={'expression': (f'filter_{name}', 'filtered'), 'attributes': attributes},
+                     outputs={'quartiles': f'quartiles_log2_tpm_{name}.csv'}, code=stage_code)
+        pipeline.add(f'erase_{name}', erase_stage, inputs={'quartiles': (f'quartiles_{name}', 'quartiles')},
+                     outputs={'erased': f'{name}_log2_tpm_quartiles_{"_".join(str(q) for q in quartiles)}.csv'},
+                     params={'quartiles': list(quartiles)}, code=stage_code)
+    if labels is not None:
+        pipeline.add(f'label_{tree_tissue}', label_stage,
+                     inputs={'expression': (f'erase_{tree_tissue}', 'erased'), 'labels': labels},
+                     outputs={'labelled': f'{tree_tissue}_log2_tpm_pacient_condition.csv'}, code=[expression_cache])
+        import tree_experiment, tree_runner, tree_extraction, histogram_tree, sql_writer, tree_rows, tree_store, consensus_tree, \
+            pair_aggregates, importance_store, tree_renderer, experiment_run, run_metrics
+        pipeline.add(f'trees_{tree_tissue}', trees_stage, inputs={'labelled': (f'label_{tree_tissue}', 'labelled')},
+                     outputs={'experiment': 'experiment.json'},
+                     params={'db_path': os.path.abspath(db_path or os.path.join(data_dir, 'interim', 'sql', 'bd_ic_v2.sqlite3')),
+                             'exper': exper, 'settings': dict({'render_mode': 'off'}, **(tree_settings or {}))},
+                     code=[tree_experiment, tree_runner, tree_extraction, histogram_tree, sql_writer, tree_rows, tree_store,
+                           consensus_tree, pair_aggregates, importance_store, tree_renderer, experiment_run, run_metrics, expression_cache],
+                     cacheable=False)
+    return pipeline
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the stages of the GTEx pipeline whose inputs changed')
+    parser.add_argument('data_dir', help='data folder of the project (with raw/gtex and external)')
+    parser.add_argument('--cache', default=None, help='folder of the outputs of the stages (default: data_dir/interim/pipeline)')
+    parser.add_argument('--tissues', default=','.join(gtex_tissues), help='tissues, separated by commas, from: '+', '.join(gtex_tissues))
+    parser.add_argument('--filter-by', default='pc', choices=list(pipeline_stages.gene_lists))
+    parser.add_argument('--quartiles', default='0,1', help='quartiles of time of death kept')
+    parser.add_argument('--labels', default=None, help='CSV with the Pacient_Condition of the samples (runs the trees)')
+    parser.add_argument('--tree-tissue', default='coronary')
+    parser.add_argument('--db', default=None, help='database of the trees')
+    parser.add_argument('--exper', default='Pipeline')
+    parser.add_argument('--trees', type=int, default=1, help='number of trees of the experiment')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', default='sklearn')
+    parser.add_argument('--n-jobs', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4, help='stages run at the same time')
+    parser.add_argument('--force', default='', help='stages run again, separated by commas')
+    parser.add_argument('--targets', default=None, help='stages wanted, separated by commas (default: all)')
+    args = parser.parse_args(argv)
+    tissues = {}
+    for name in args.tissues.split(','):
+        if not(name in gtex_tissues):
+            print(f'Error: tissue {name} not valid')
+            sys.exit(1)
+        tissues[name] = gtex_tissues[name]
+    pipeline = gtex_pipeline(args.data_dir, args.cache or os.path.join(args.data_dir, 'interim', 'pipeline'), tissues=tissues,
+                             filter_by=args.filter_by, quartiles=[int(q) for q in args.quartiles.split(',')], labels=args.labels,
+                             tree_tissue=args.tree_tissue, db_path=args.db, exper=args.exper,
+                             tree_settings={'n_times_run': args.trees, 'seed': args.seed, 'engine': args.engine, 'n_jobs': args.n_jobs},
+                             max_workers=args.workers)
+    targets = args.targets.split(',') if args.targets else None
+    results = pipeline.run(targets, force=[name for name in args.force.split(',') if name])
+    for name in pipeline.order(targets):
+        print(f"{name}: {results[name]['status']} {round(results[name]['seconds'],2)}s {results[name]['key'][:16]}")
+    if any(result['status'] in ('failed', 'skipped') for result in results.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import sample_attributes
+import gene_filter
+
+"""
+Title: Description
+Functions of the stages of the GTEx pipeline (scripts 1, 2, 4 and 5), with every path given as a parameter, so they can be
+called by the scripts, with the paths of util, or by the pipeline runner (pipeline.py), with the paths of its cache. The
+tree experiment of script 6 is in tree_experiment.py.
+"""
+
+"""
+Variable: gene_lists
+
+ Description:
+    Lists of genes that can be used to filter the expression data: name of the filter, path of the file (relative to the
+    data folder), column with the gene ids and separator. "Protein coding genes" (pc) were previously selected as interesting
+    genes to be analized and "Necroptosis genes" (necrop) are genes that are part of the death of the cell pathway and could
+    affect expression of other genes. New lists only need a new entry here.
+"""
+
+gene_lists = {'pc': ('external/genes_protein_conding.tsv', 'Ensembl gene ID', '\t'),
+              'necrop': ('external/genes_necroptose.csv', 'x', ',')}
+
+"""
+Function: create_log2tpm_for_tissues_from_gtex
+
+ Description:
+    Reads the GTEx file a single time and filters the samples of every specified tissue, creating one CSV with
+    normalized tpm expression for each tissue. Columns of each tissue are found once from SMTSD and the file is read
+    in chunks of rows, so memory depends on chunk_size and not on the size of the output.
+
+ Parameters:
+ 	gct_path - path of the GCT file of tpm
+ 	attributes_path - path of the SampleAttributesDS file
+ 	outputs - dictionary {tissue: path of the output CSV}, tissues written exactly like on GTEx
+ 	chunk_size - number of genes (rows) read and normalized at a time
+
+ Returns:
+ 	Dictionary {tissue: number of samples written}.
+"""
+
+def create_log2tpm_for_tissues_from_gtex(gct_path, attributes_path, outputs, chunk_size=2000):
+    samples_of_tissue = {}
+    for tissue in outputs:
+        samples_of_tissue[tissue] = sample_attributes.samples_of_tissue(tissue, attributes_path)
+    with open(gct_path,'r') as gct: #Only the header is read here, to find the columns of each tissue
+        next(gct)
+        next(gct)
+        header = next(gct).rstrip('\n').split('\t')
+    columns_of_tissue = {}
+    for tissue in outputs:
+        columns_of_tissue[tissue] = [name for name in header if name in samples_of_tissue[tissue]]
+    used_columns = set(['Name'])
+    for tissue in outputs:
+        used_columns.update(columns_of_tissue[tissue])
+
+    files = {}
+    try:
+        for tissue in outputs:
+            files[tissue] = open(outputs[tissue],'w',newline='')
+            files[tissue].write(','.join(['Gene_ID']+columns_of_tissue[tissue])+'\n')
+        # Read a large file (>20Gb) in chunks of rows, a single time for all tissues
+        chunks = pd.read_csv(gct_path, sep='\t', skiprows=2, usecols=lambda name: name in used_columns, chunksize=chunk_size)
+        for chunk in chunks:
+            chunk = chunk.set_index('Name')
+            for tissue in outputs:
+                log2tpm = np.log2(chunk[columns_of_tissue[tissue]]+1) #Vectorized log2(tpm+1)
+                log2tpm.to_csv(files[tissue], header=False)
+    finally:
+        for tissue in files:
+            files[tissue].close()
+    return {tissue: len(columns_of_tissue[tissue]) for tissue in outputs}
+
+"""
+Function: create_log2tpm_for_tissue_from_gtex
+
+ Parameters:
+ 	gct_path - path of the GCT file of tpm
+ 	attributes_path - path of the SampleAttributesDS file
+ 	tissue - tissue from GTEx data (needs to be exactly written like on GTEx)
+ 	output_path - path of the output CSV
+
+ Returns:
+ 	Number of samples written.
+"""
+
+def create_log2tpm_for_tissue_from_gtex(gct_path, attributes_path, tissue, output_path):
+    return create_log2tpm_for_tissues_from_gtex(gct_path, attributes_path, {tissue: output_path})[tissue]
+
+"""
+Function: filter_genes
+
+ Description:
+    Applies one or more lists of genes in a single read of the CSV of expression, writing the selected rows straight to
+    the output files (see gene_filter.filter_rows).
+
+ Parameters:
+ 	csv_path - path for CSV with expression of genes
+ 	lists - dictionary {filter_by: (path of the list of genes, column with the gene ids, separator)}
+ 	outputs - dictionary {filter_by: path of output CSV}
+
+ Returns:
+ 	Dictionary with the number of genes written for each filter. Prints error message and returns None if a filter has no list.
+"""
+
+def filter_genes(csv_path, lists, outputs):
+    for filter_by in outputs:
+        if not(filter_by in lists):
+            print('Error: Specified filtering method not valid')
+            return None
+    selected = {}
+    for filter_by in outputs:
+        path, column, sep = lists[filter_by]
+        selected[filter_by] = (gene_filter.read_gene_set(path, column, sep=sep), outputs[filter_by])
+    return gene_filter.filter_rows(csv_path, selected)
+
+def _deduplicate(names):
+    # Same names given by pd.read_csv to repeated columns: the second 'x' becomes 'x.1', the third 'x.2', ..., skipping the
+    # names already in the header
+    names = list(names)
+    header = set(names)
+    counts = {}
+    for i in range(len(names)):
+        name = names[i]
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[names[i]] = count+1
+            name = f'{names[i]}.{count}'
+            count = count+1 if name in header else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count+1
+    return names
+
+def transform_data(df):
+    # Save data in readable format: first row becomes the header (repeated names renamed like read_csv did when the data
+    # went through a temporary CSV) and values become numbers, indexed by sample_id
+    header = _deduplicate(df.iloc[0].astype(str).values)
+    values = df.iloc[1:]
+    df = pd.DataFrame(values.to_numpy(), index=pd.Index(values.index.astype(str), name='sample_id'), columns=header)
+    df = df.apply(pd.to_numeric)
+    return df
+
+"""
+Function: create_df_for_plot
+
+ Description:
+    Creates the dataframe of samples with the expression of genes, the time of death (SMTSISCH) of each sample and its quartile.
+
+ Parameters:
+ 	df - dataframe with expression of genes, as read from the CSV (Gene_ID in the first column)
+ 	attributes_path - path of the SampleAttributesDS file
+ 	output_path - path of the CSV where the dataframe is saved (default: not saved)
+
+ Returns:
+ 	Dataframe transformed with time of death of all samples and the quartile of time of death of each sample
+"""
+
+def create_df_for_plot(df, attributes_path, output_path=None):
+    samples = df.columns.values
+    time_of_death_df = sample_attributes.join_attributes(samples, ['SMTSISCH'], attributes_path)
+    time_of_death_df['quartiles'] = sample_attributes.quartiles(time_of_death_df['SMTSISCH'])
+    df = df.T
+    df = transform_data(df)
+    quartile = df.join(time_of_death_df, how='inner')
+    if output_path is not None:
+        quartile.to_csv(output_path)
+    return quartile
+
+"""
+Function: erase_quartiles_and_fix_cols_names
+
+ Description:
+    As a final preparation step to run the Decision Tree algorithm, keeps only the samples of the given quartiles of time
+    of death and removes the version from the ids of the genes.
+
+ Parameters:
+ 	df - dataframe saved by create_df_for_plot, as read from the CSV (sample_id in the first column)
+ 	quartiles - list of quartiles that are kept. Example: [0,1] (starts from 0)
+
+ Returns:
+ 	Dataframe of expression indexed by sample (index named 'Unnamed: 0', like the processed files read by script 6).
+"""
+
+def erase_quartiles_and_fix_cols_names(df, quartiles):
+    df = df.drop('SMTSISCH', axis=1)
+    df = df.rename(columns={'sample_id':'Unnamed: 0'})
+    df = df.set_index('Unnamed: 0')
+    df = df[df['quartiles'].isin(quartiles)]
+    df = df.drop('quartiles', axis=1)
+    df.columns = [name.split('.')[0] for name in df.columns]
+    return df
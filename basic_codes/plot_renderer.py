@@ -0,0 +1,105 @@
+import numpy as np
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool
+
+"""
+Title: Description
+Renders the scatter plots of expression by time of collection of many genes at the same time, on a pool of processes with a
+headless backend. Each plot is drawn on its own figure, and genes whose PNG was already created from the same data are skipped.
+"""
+
+manifest_name = '.plots_manifest.json'
+
+"""
+Variable: renderer_version
+
+ Description:
+    Version of the style of the plots (see _render), part of the hash of each plot. Increase it when the plots change, so
+    the PNGs drawn with the previous style are drawn again.
+"""
+
+renderer_version = 1
+
+def _use_headless_backend():
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def _data_hash(gene, expression, time_of_collection, quartiles):
+    sha = hashlib.sha1(f'{renderer_version}:{gene}'.encode())
+    for values in (expression, time_of_collection, quartiles):
+        sha.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return sha.hexdigest()
+
+def _render(task):
+    gene, expression, time_of_collection, quartiles, path = task
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots()
+    sns.scatterplot(x=time_of_collection, y=expression, hue=quartiles, palette='colorblind', ax=ax)
+    ax.set_title(f'Expression of {gene} gene by time of collection')
+    ax.set_xlabel('Time of collection post-mortem (min)')
+    ax.set_ylabel(r'Expression in $log_2{(tpm+1)}$')
+    fig.savefig(path, format='png')
+    plt.close(fig)
+    return gene
+
+"""
+Function: render_gene_plots
+
+ Description:
+    Saves, for each gene, the scatter plot of its expression by time of collection, colored by quartile. A manifest in the
+    output folder keeps the hash of the data used for each PNG, so plots that are up to date are not drawn again.
+
+ Parameters:
+ 	df - dataframe with expression of genes and the columns 'SMTSISCH' and 'quartiles' at the end
+ 	output_dir - folder where the PNGs are saved
+ 	prefix - prefix of the name of the files (files are named prefix_gene.png)
+ 	processes - number of processes drawing plots (default: number of cpus)
+
+ Returns:
+ 	Dictionary with the number of plots drawn and skipped, the time spent and the plots drawn per second.
+"""
+
+def render_gene_plots(df, output_dir, prefix, processes=None):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, manifest_name)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    time_of_collection = df['SMTSISCH'].values
+    quartiles = df['quartiles'].values
+    tasks = []
+    hashes = {}
+    skipped = 0
+    for gene in df.columns[:-2].values:
+        path = os.path.join(output_dir, f'{prefix}_{gene}.png')
+        expression = df[gene].values
+        hashes[str(gene)] = _data_hash(str(gene), expression, time_of_collection, quartiles)
+        if manifest.get(str(gene)) == hashes[str(gene)] and os.path.exists(path):
+            skipped += 1
+        else:
+            tasks.append((str(gene), expression, time_of_collection, quartiles, path))
+
+    drawn = 0
+    try:
+        if processes == 1 or len(tasks) <= 1:
+            _use_headless_backend()
+            for task in tasks:
+                manifest[_render(task)] = hashes[task[0]]
+                drawn += 1
+        else:
+            with Pool(processes=processes, initializer=_use_headless_backend) as pool:
+                for gene in pool.imap_unordered(_render, tasks, chunksize=8):
+                    manifest[gene] = hashes[gene]
+                    drawn += 1
+    finally:
+        # Saves the plots already drawn even if the run is interrupted
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+    seconds = time.perf_counter()-start
+    return {'drawn': drawn, 'skipped': skipped, 'seconds': seconds, 'plots_per_second': drawn/seconds if seconds > 0 else 0.0}
@@ -0,0 +1,134 @@
+import json
+import re
+import time
+
+"""
+Title: Description
+Optional instrumentation of the tree loop of 6-apply_decision_tree_gtex.py: time spent in each stage of each tree and rows
+inserted in each table, saved in the run_metrics table (one row for each tree and metric) and/or in a JSON lines file, with a
+summary at the end of the experiment. When disabled every call returns at once, so the loop keeps its speed.
+"""
+
+create_sql = """CREATE TABLE IF NOT EXISTS run_metrics (
+    experiencia_id INTEGER NOT NULL,
+    tree_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (experiencia_id, tree_id, metric)
+);"""
+
+_table_of_insert = re.compile(r'INSERT\s+(?:OR\s+\w+\s+)?INTO\s+(\w+)', re.IGNORECASE)
+
+"""
+Class: RunMetrics
+
+ Description:
+    Stages are timed as laps: lap(name) adds the time since the previous lap (or since the end of the previous tree) to the
+    stage name of the current tree. Rows are counted from the rows buffered by a sql_writer.BatchWriter.
+
+ Parameters:
+ 	experiencia_id - id of the experiment
+ 	enabled - turns the instrumentation on
+ 	path - JSON lines file where the metrics of each tree are appended (default: none)
+"""
+
+class RunMetrics:
+
+    def __init__(self, experiencia_id, enabled=False, path=None):
+        self.experiencia_id = experiencia_id
+        self.enabled = enabled
+        self.path = path
+        self.trees = []
+        self.current = {}
+        self.rows_before = {}
+        self.last = time.perf_counter()
+
+    """
+    Function: lap
+
+     Parameters:
+     	name - name of the stage that just ended (like 'fit', 'extraction' or 'sql')
+    """
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0)+now-self.last
+        self.last = now
+
+    """
+    Function: end_tree
+
+     Parameters:
+     	tree_id - id of the tree (tree_generation)
+     	writer - sql_writer.BatchWriter whose rows are counted
+    """
+
+    def end_tree(self, tree_id, writer):
+        if not self.enabled:
+            return
+        rows = {}
+        for sql, count in writer.rows_added.items():
+            table = _table_of_insert.search(sql).group(1)
+            rows[table] = rows.get(table, 0)+count-self.rows_before.get(sql, 0)
+        self.rows_before = dict(writer.rows_added)
+        record = {'experiencia_id': self.experiencia_id, 'tree_id': tree_id,
+                  'seconds': self.current, 'rows': rows}
+        self.trees.append(record)
+        if self.path is not None:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record)+'\n')
+        self.current = {}
+        self.last = time.perf_counter()
+
+    """
+    Function: save
+
+     Description:
+        Writes the metrics of the trees in the run_metrics table (created if it does not exist), as seconds_<stage> and
+        rows_<table> metrics.
+
+     Parameters:
+     	db - sqlite3 connection
+    """
+
+    def save(self, db):
+        if not self.enabled:
+            return
+        db.executescript(create_sql)
+        rows = []
+        for record in self.trees:
+            for stage, seconds in record['seconds'].items():
+                rows.append((self.experiencia_id, record['tree_id'], f'seconds_{stage}', seconds))
+            for table, count in record['rows'].items():
+                rows.append((self.experiencia_id, record['tree_id'], f'rows_{table}', count))
+        with db:
+            db.executemany('INSERT OR REPLACE INTO run_metrics (experiencia_id,tree_id,metric,value) VALUES (?,?,?,?);', rows)
+
+    """
+    Function: report
+
+     Returns:
+     	Text with the total and mean time per tree of each stage (with its share of the time) and the total and mean rows per
+     	tree of each table.
+    """
+
+    def report(self):
+        if not self.enabled or not self.trees:
+            return ''
+        seconds = {}
+        rows = {}
+        for record in self.trees:
+            for stage, value in record['seconds'].items():
+                seconds[stage] = seconds.get(stage, 0.0)+value
+            for table, value in record['rows'].items():
+                rows[table] = rows.get(table, 0)+value
+        n = len(self.trees)
+        total = sum(seconds.values())
+        lines = [f'{n} trees in {round(total,2)}s']
+        for stage in sorted(seconds, key=seconds.get, reverse=True):
+            lines.append(f'  {stage}: {round(seconds[stage],3)}s ({round(1000*seconds[stage]/n,2)}ms/tree, {round(100*seconds[stage]/total,1) if total > 0 else 0.0}%)')
+        for table in sorted(rows, key=rows.get, reverse=True):
+            lines.append(f'  {table}: {rows[table]} rows ({round(rows[table]/n,1)}/tree)')
+        return '\n'.join(lines)
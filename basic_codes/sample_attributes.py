@@ -0,0 +1,149 @@
+import pandas as pd
+import json
+import os
+import tempfile
+import threading
+import expression_cache
+
+"""
+Title: Description
+Index of the GTEx sample attributes (GTEx_Analysis_v8_Annotations_SampleAttributesDS.txt) by SAMPID. The text file is
+parsed once and cached in binary form next to it (refreshed when the file changes), and stays loaded for the rest of the
+process. Attributes (SMTSD, SMTSISCH or any other column) are joined to lists of samples with hash lookups.
+
+The stages of the pipeline run on threads, so loading is done under a lock, and the cache files are written to temporary
+files moved over the old ones, so a reader never sees a partial cache. When the folder of the file cannot be written
+(read-only data folder), the cache goes to fallback_cache_dir.
+"""
+
+_loaded = {}
+_lock = threading.Lock()
+
+"""
+Variable: fallback_cache_dir
+
+ Description:
+    Folder of the binary cache when the folder of the SampleAttributesDS file cannot be written. gtex_pipeline sets it to a
+    folder of its cache; None uses .sample_attributes_cache in the working folder.
+"""
+
+fallback_cache_dir = None
+
+"""
+Function: load_sample_attributes
+
+ Description:
+    Loads the sample attributes indexed by SAMPID, from memory, from the binary cache or, if the file changed, from the text file.
+
+ Parameters:
+ 	path - path of the SampleAttributesDS file
+ 	cache_dir - folder of the binary cache (default: .sample_attributes_cache in the folder of the file or, if that folder
+ 	            cannot be written, fallback_cache_dir)
+
+ Returns:
+ 	Dataframe of attributes indexed by SAMPID.
+"""
+
+def load_sample_attributes(path, cache_dir=None):
+    path = os.path.abspath(path)
+    with _lock: # Parsed once even when several stages ask for it at the same time
+        if not(path in _loaded):
+            if cache_dir is None:
+                cache_dirs = [os.path.join(os.path.dirname(path), '.sample_attributes_cache'),
+                              fallback_cache_dir or os.path.abspath('.sample_attributes_cache')]
+            else:
+                cache_dirs = [cache_dir]
+            _loaded[path] = _read_attributes(path, cache_dirs)
+        return _loaded[path]
+
+def _read_attributes(path, cache_dirs):
+    # Attributes from the first cache up to date, or from the text file, cached in the first folder that can be written
+    known = {}
+    for cache_dir in cache_dirs:
+        cache = os.path.join(cache_dir, os.path.basename(path)+'.pkl')
+        try:
+            with open(cache+'.json', 'r') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        known = info
+        if info.get('hash') == expression_cache.file_hash(path, info) and os.path.exists(cache):
+            return pd.read_pickle(cache)
+    source_hash = expression_cache.file_hash(path, known)
+    attributes = pd.read_csv(path, sep='\t', index_col='SAMPID', low_memory=False)
+    stat = os.stat(path)
+    for cache_dir in cache_dirs:
+        cache = os.path.join(cache_dir, os.path.basename(path)+'.pkl')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _replace(cache, attributes.to_pickle)
+            _replace(cache+'.json', lambda tmp: _write_json(tmp, {'hash': source_hash, 'size': stat.st_size, 'mtime': stat.st_mtime}))
+            break
+        except OSError:
+            continue
+    return attributes
+
+def _write_json(path, info):
+    with open(path, 'w') as f:
+        json.dump(info, f)
+
+def _replace(path, write):
+    # Writes a temporary file in the folder of path and moves it over path
+    handle, tmp = tempfile.mkstemp(prefix=os.path.basename(path)+'.', dir=os.path.dirname(path))
+    os.close(handle)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+"""
+Function: join_attributes
+
+ Description:
+    Selects attributes of the samples in a list. The samples are kept in the order of the attributes file, like the
+    previous loops over its rows.
+
+ Parameters:
+ 	samples - list or array of sample ids
+ 	columns - list of attribute columns (like ['SMTSISCH'] or ['SMTSD'])
+ 	path - path of the SampleAttributesDS file
+
+ Returns:
+ 	Dataframe with the columns for the samples found in the file, indexed by sample id.
+"""
+
+def join_attributes(samples, columns, path):
+    attributes = load_sample_attributes(path)
+    selected = attributes.loc[attributes.index.isin(samples), columns]
+    selected.index.name = None
+    return selected
+
+"""
+Function: samples_of_tissue
+
+ Parameters:
+ 	tissue - tissue exactly as written in SMTSD
+ 	path - path of the SampleAttributesDS file
+
+ Returns:
+ 	Set of ids of the samples of the tissue.
+"""
+
+def samples_of_tissue(tissue, path):
+    attributes = load_sample_attributes(path)
+    return set(attributes.index[attributes['SMTSD'] == tissue])
+
+"""
+Function: quartiles
+
+ Parameters:
+ 	values - series of values (like time of death)
+
+ Returns:
+ 	Quartile (0 to 3) of each value.
+"""
+
+def quartiles(values):
+    return pd.qcut(values, q=4, labels=False)
@@ -0,0 +1,122 @@
+import time
+
+"""
+Title: Description
+Batched writer for the SQLite database. Rows of a tree are kept in memory as parameterized batches and written with
+executemany in a single transaction for each tree (or for each group of trees).
+"""
+
+"""
+Class: BatchWriter
+
+ Description:
+    Buffers the rows inserted in the database and writes them in transactions of trees_per_commit trees.
+    Primary keys are given by the writer (see next_id), so rows that point to other rows (like genes_in_path to path)
+    can be buffered together without reading lastrowid after each insert.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	trees_per_commit - number of trees written in each transaction
+ 	journal_mode - value for PRAGMA journal_mode ('WAL', 'DELETE', 'MEMORY', ...)
+ 	synchronous - value for PRAGMA synchronous ('OFF', 'NORMAL', 'FULL')
+"""
+
+class BatchWriter:
+
+    def __init__(self, db, trees_per_commit=1, journal_mode='WAL', synchronous='NORMAL'):
+        self.db = db
+        self.trees_per_commit = trees_per_commit
+        self.db.execute(f'PRAGMA journal_mode={journal_mode};')
+        self.db.execute(f'PRAGMA synchronous={synchronous};')
+        self.batches = {}
+        self.last_ids = {}
+        self.trees_in_batch = 0
+        self.trees_written = 0
+        self.rows_written = 0
+        self.rows_added = {} # Rows buffered by each insert since the writer was created
+        self.seconds_writing = 0.0
+
+    """
+    Function: next_id
+
+     Description:
+        Gives the next primary key of a table. The first call reads the largest key already saved, the next ones
+        are counted in memory, so only one process should write in the database while the writer is in use.
+
+     Parameters:
+     	table - name of the table
+     	id_column - name of the primary key column
+
+     Returns:
+     	Integer to be used as primary key of the next row of the table.
+    """
+
+    def next_id(self, table, id_column):
+        if table not in self.last_ids:
+            last = self.db.execute(f'SELECT MAX({id_column}) FROM {table};').fetchone()[0]
+            self.last_ids[table] = last if last is not None else 0
+        self.last_ids[table] += 1
+        return self.last_ids[table]
+
+    """
+    Function: add
+
+     Description:
+        Buffers rows for a parameterized insert.
+
+     Parameters:
+     	sql - insert statement with ? placeholders
+     	rows - list of tuples with the values of each row
+    """
+
+    def add(self, sql, rows):
+        if sql not in self.batches:
+            self.batches[sql] = []
+        self.batches[sql].extend(rows)
+        self.rows_added[sql] = self.rows_added.get(sql, 0)+len(rows)
+
+    """
+    Function: end_tree
+
+     Description:
+        Marks the end of the rows of a tree, writing the buffered trees when trees_per_commit is reached.
+    """
+
+    def end_tree(self):
+        self.trees_in_batch += 1
+        if self.trees_in_batch >= self.trees_per_commit:
+            self.flush()
+
+    """
+    Function: flush
+
+     Description:
+        Writes every buffered row in one transaction. If an insert fails, nothing of the transaction is saved.
+    """
+
+    def flush(self):
+        start = time.perf_counter()
+        with self.db:
+            for sql, rows in self.batches.items():
+                if rows:
+                    self.db.executemany(sql, rows)
+                    self.rows_written += len(rows)
+        self.seconds_writing += time.perf_counter() - start
+        self.batches = {}
+        self.trees_written += self.trees_in_batch
+        self.trees_in_batch = 0
+
+    """
+    Function: rows_per_second
+
+     Returns:
+     	Rows written per second spent writing to the database.
+    """
+
+    def rows_per_second(self):
+        if self.seconds_writing == 0:
+            return 0.0
+        return self.rows_written/self.seconds_writing
+
+    def report(self):
+        return f'{self.rows_written} rows written in {round(self.seconds_writing,2)}s ({round(self.rows_per_second(),1)} rows/s)'
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+import random
+import os
+import tree_runner
+import sql_writer
+import tree_extraction
+import tree_rows
+import tree_store
+import consensus_tree
+import pair_aggregates
+import importance_store
+import tree_renderer
+import experiment_run
+import run_metrics
+
+"""
+Title: Description
+Tree experiment of 6-apply_decision_tree_gtex.py: fits the trees of an experiment on a labelled dataframe of expression and
+saves the information of each tree on the database. The settings are parameters of run_tree_experiment, so the experiment
+can be run by the script or by the pipeline runner (pipeline.py).
+"""
+
+"""
+Function: change_position_randomly
+
+Description: Changes positions of columns randomly to avoid bias on algorithm.
+
+Parameters: 
+	condition - column of a dataframe (or list of column positions).
+	rng - random generator used for the shuffle (a seeded random.Random makes the order reproducible).
+
+Returns:
+	A list of the values uniformly shuffled.
+"""
+def change_position_randomly(condition, rng=random):
+    list_ = list(condition)
+    rng.shuffle(list_) #Fisher-Yates: every order of the columns has the same chance
+    return list_
+
+"""
+Function: create_x_y_from_data_frame
+
+ Description:
+    This function creates the x and y for decision tree algorithm with decoder of positions to name and vice-versa.
+
+ Parameters:
+ 	df - dataframe with expression data and classes of samples.
+ 	
+  Returns:
+ 	Dictionary with x and y values to use as input of algorithm and decoders linking positions of values in list and vice-versa. 
+"""
+def create_x_y_from_data_frame(df):
+    
+    x_copy = np.ascontiguousarray(df[df.columns[:-1]], dtype=np.float32) #Values of expression excluding the last column, containing the conditions (targets). float32 is the type used by sklearn, so it does not convert x again for each tree
+    y_class_are_numbers, list_of_unique_y = pd.factorize(df['Pacient_Condition']) #Targets as positions of the classes, in order of appearance
+    decoderPositionsOfValuesToNames = list(list_of_unique_y) #Saves which value is linked to a given position
+    decoderNamesToPositionsOfValues = {name: i for i, name in enumerate(decoderPositionsOfValuesToNames)} #Saves which position is the value
+
+    return {'x':x_copy, 
+            'y':y_class_are_numbers,
+            'decoderPositionsOfValuesToNames': decoderPositionsOfValuesToNames,
+            'decoderNamesToPositionsOfValues':decoderNamesToPositionsOfValues}
+
+"""
+Function: run_tree_experiment
+
+ Description:
+    Starts (or resumes) an experiment, fits its trees and saves each tree on the database, with the importances of the
+    genes, the rendered trees, the progress and the metrics of the run (see the settings of 6-apply_decision_tree_gtex.py).
+
+ Parameters:
+ 	df - dataframe with expression of genes and the classes of samples in the last column (Pacient_Condition)
+ 	db - sqlite3 connection
+ 	exper - description of the experiment
+ 	resume - id of an interrupted experiment to continue from its last saved tree (None starts a new experiment)
+ 	n_times_run - number of trees generated
+ 	n_jobs - number of processes fitting trees at the same time
+ 	seed - seed of the experiment, each tree gets its own seed derived from it
+ 	engine - 'sklearn', 'histogram', or a forest engine of tree_runner ('random_forest' or 'extra_trees')
+ 	bootstrap - forest engines: each tree is grown on a sample with replacement of the samples
+ 	max_features - forest engines: genes searched at each split ('sqrt', 'log2', a number, a fraction or None)
+ 	trees_per_fit - forest engines: number of trees grown in each fit of a forest
+ 	trees_per_commit - number of trees saved in each transaction
+ 	storage - 'relational' (rows of each tree in the tables of the README) or 'compact' (one row of arrays for each tree,
+ 	          the tables are materialized when needed, see tree_store)
+ 	importance_path - .npy file of the importances of every tree (None keeps them in memory, and a resumed experiment
+ 	                  combines its trees with the summary saved in feature_importance, if any)
+ 	render_mode - 'off', 'every' or 'background'
+ 	render_every - renders one tree for every render_every trees
+ 	render_consensus - renders the consensus (average) tree of the experiment at the end, assembled in memory from the
+ 	                   arrays of the trees (see consensus_tree). The trees saved before a resumed run are read back from the
+ 	                   database (arrays or relational tables)
+ 	results_dir - folder of the rendered trees
+ 	progress_path - JSONL file of progress records (None prints them only)
+ 	metrics_enabled - times each stage of each tree and counts the rows inserted in each table
+ 	metrics_path - JSON lines file with the metrics of each tree
+
+ Returns:
+ 	Dictionary with experiencia_id, first_iteration and trees_written (trees saved by this run).
+ 	Prints error message and returns None if the experiment to resume was not found.
+"""
+
+def run_tree_experiment(df, db, exper, resume=None, n_times_run=1, n_jobs=1, seed=0, engine='sklearn', trees_per_commit=1,
+                        storage='relational', bootstrap=True, max_features='sqrt', trees_per_fit=500, importance_path=None,
+                        render_mode='background', render_every=100, render_consensus=True, results_dir='results',
+                        progress_path=None, metrics_enabled=False, metrics_path=None):
+    forest = engine in tree_runner.forest_engines
+    if resume is None:
+        settings = {'engine': engine}
+        if storage != 'relational':
+            settings['storage'] = storage
+        if forest:
+            settings.update({'bootstrap': bootstrap, 'max_features': max_features, 'trees_per_fit': trees_per_fit})
+        run = experiment_run.start_experiment(db, exper, seed, n_times_run, settings) #Initiate an experiment
+    else:
+        run = experiment_run.resume_experiment(db, resume) #Same seed, number of trees and engine of the interrupted run
+        if run is None:
+            return None
+        seed, n_times_run, engine = run['seed'], run['n_trees'], run['settings'].get('engine', engine)
+        forest = engine in tree_runner.forest_engines
+        storage = run['settings'].get('storage', 'relational')
+        bootstrap = run['settings'].get('bootstrap', bootstrap)
+        max_features = run['settings'].get('max_features', max_features)
+        trees_per_fit = run['settings'].get('trees_per_fit', trees_per_fit)
+    exp = run['experiencia_id']
+    first_iteration = run['first_iteration'] #Trees already saved
+    writer = sql_writer.BatchWriter(db, trees_per_commit=trees_per_commit, journal_mode='WAL', synchronous='NORMAL')
+    compact = storage == 'compact'
+    if compact:
+        tree_store.create_tables(db)
+    else:
+        pair_aggregates.create_table(db) #Running statistics of pairs of genes, updated with each tree
+
+    genes_name = list(df.columns)[:-1]
+    genes_array = np.array(genes_name, dtype=object)
+    importances = importance_store.ImportanceStore(n_times_run, genes_name, path=importance_path, resume=resume is not None) #Importance of each gene in each tree, in the original order of the genes
+    if importance_path is not None:
+        importances.restore(first_iteration)
+    elif first_iteration > 0 and importances.load(db, exp) < first_iteration: #Summary saved by an earlier run of the experiment
+        print('Importances of trees saved before this run were not summarized (importance_path is None), feature_importance will miss them')
+    renderer = tree_renderer.TreeRenderer(results_dir, mode=render_mode, every=render_every, prefix='test_gtex_tree')
+    progress = experiment_run.Progress(exp, n_times_run, first_iteration, path=progress_path)
+    metrics = run_metrics.RunMetrics(exp, enabled=metrics_enabled, path=metrics_path)
+
+    inputs_for_fit=create_x_y_from_data_frame(df) #Creates x and y inputs, shared by all trees
+    if compact:
+        tree_store.save_dictionary(db, exp, genes_name, inputs_for_fit['decoderPositionsOfValuesToNames']) #Genes and classes, once for the experiment
+    aggregator = None
+    if render_consensus:
+        if first_iteration > 0: #Trees saved before the interruption, from the arrays or from the relational tables
+            aggregator = consensus_tree.experiment_aggregator(db, exp, genes_name, inputs_for_fit['decoderPositionsOfValuesToNames'])['aggregator']
+        else:
+            aggregator = consensus_tree.TreeAggregator(len(genes_name), len(inputs_for_fit['decoderPositionsOfValuesToNames']))
+    tasks = tree_runner.create_tasks(tree_runner.tree_seeds(seed, n_times_run)) #One seed for each tree
+    change_position = None if forest else change_position_randomly #Randomizes the positions of columns of each tree (a forest draws the genes of each split itself)
+    if forest:
+        fitted = tree_runner.fit_forest(inputs_for_fit['x'], inputs_for_fit['y'], tasks, n_jobs, engine, bootstrap, max_features,
+                                        trees_per_fit, first_iteration) #Member trees of forests grown on threads
+    else:
+        fitted = tree_runner.fit_trees(inputs_for_fit['x'], inputs_for_fit['y'], tasks[first_iteration:], n_jobs, engine,
+                                        change_position)
+    metrics.lap('setup') #Saved with the first tree
+    for iteration, clf in fitted: #Apply classifier, skipping the trees already saved
+        metrics.lap('fit')
+
+        cursor_id = writer.next_id('tree', 'tree_generation')
+        writer.add("""INSERT INTO tree (tree_generation,experiencia_id) VALUES (?,?);""", [(cursor_id, exp)]) #Insert tree generation at tree
+
+        order = tree_runner.tree_order(len(genes_name), tasks[iteration][1], change_position) #Same order the tree was fitted with, from its seed
+        new_postion_for_columns = genes_array[order].tolist() #Names of genes in the order used by this tree (column j of the tree is gene order[j])
+
+        importances.add(iteration, clf.feature_importances_, order)
+        metrics.lap('importance')
+
+        renderer.submit(cursor_id, clf, new_postion_for_columns) #Saves figure
+        if aggregator is not None:
+            aggregator.add_fitted(clf, order) #Arrays of the tree for the consensus tree
+        metrics.lap('render')
+
+        if compact:
+            writer.add(tree_store.insert_sql, [tree_store.tree_row(cursor_id, exp, clf, order)]) #One row with the arrays of the tree
+            metrics.lap('rows')
+        else:
+            lineage = tree_extraction.extract_tree(clf) #Paths and edges of the tree as arrays
+            metrics.lap('extraction')
+            names_of_nodes = np.array(new_postion_for_columns, dtype=object)[lineage['feature']].tolist() #Gene of each node, mapped back through the order of the columns
+            tree_rows.add_tree_rows(writer, cursor_id, exp, lineage, names_of_nodes, inputs_for_fit['decoderPositionsOfValuesToNames'])
+            metrics.lap('rows')
+        writer.end_tree() #Saves the rows of the tree in a single transaction
+        metrics.lap('sql')
+        metrics.end_tree(cursor_id, writer)
+        progress.update(first_iteration+writer.trees_written)
+
+    writer.flush()
+    progress.update(first_iteration+writer.trees_written, force=True)
+    print(writer.report())
+    metrics.save(db)
+    print(metrics.report())
+    renderer.close()
+    if render_consensus:
+        consensus = consensus_tree.assemble_consensus(aggregator.aggregate(), genes_name) #Average tree, from the arrays in memory
+        consensus_tree.render_consensus(consensus, [str(name) for name in inputs_for_fit['decoderPositionsOfValuesToNames']],
+                                        os.path.join(results_dir, f'average_tree_{exp}'))
+        if not(compact): #Most frequent pairs of genes, from the tables already written
+            tree_renderer.render_consensus_tree(db, exp, os.path.join(results_dir, f'consensus_tree_{exp}'))
+    importances.save(db, exp) #Mean, standard deviation and top-k count of the importance of each gene in the experiment
+    experiment_run.finish_experiment(db, exp)
+    return {'experiencia_id': exp, 'first_iteration': first_iteration, 'trees_written': writer.trees_written}
@@ -0,0 +1,142 @@
+import numpy as np
+
+"""
+Title: Description
+Extracts the structure of a fitted decision tree as numpy arrays (parents, depths, root-to-leaf paths and parent/son edges),
+replacing the recursive walk of get_lineage. Every array is built with a constant number of passes over the nodes of the tree.
+"""
+
+"""
+Function: class_counts
+
+ Description:
+    Number of samples of each class in each node. Newer versions of sklearn save the fraction of samples in tree_.value
+    instead of the counts, so values are normalized and multiplied by the (weighted) number of samples of the node.
+
+ Parameters:
+ 	tree_ - tree_ attribute of a fitted sklearn.tree.DecisionTreeClassifier
+
+ Returns:
+ 	Array (nodes x classes) with the number of samples of each class in each node.
+"""
+
+def class_counts(tree_):
+    values = tree_.value[:, 0, :]
+    totals = values.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1
+    return np.rint(values/totals*tree_.weighted_n_node_samples[:, None]).astype(np.int64)
+
+"""
+Function: extract_tree
+
+ Description:
+    Builds the parent of every node in a single pass over children_left/children_right and, from it, the depth of the nodes,
+    every root-to-leaf path and the parent/son edges of the tree (see extract_arrays).
+
+ Parameters:
+ 	clf - decision tree model fitted
+
+ Returns:
+ 	Dictionary of numpy arrays of extract_arrays.
+"""
+
+def extract_tree(clf):
+    tree_ = clf.tree_
+    return extract_arrays(tree_.children_left, tree_.children_right, tree_.feature, tree_.threshold, class_counts(tree_))
+
+"""
+Function: extract_arrays
+
+ Description:
+    Same as extract_tree, from the arrays of a tree (as saved by tree_store), without the fitted model.
+
+    Paths are saved like a sparse matrix: the internal nodes of the path of leaves[i] (from the root to the parent of the leaf)
+    are path_nodes[path_offsets[i]:path_offsets[i+1]]. Leaves are in increasing order of node id, the same order of get_lineage.
+
+ Parameters:
+ 	left, right - children_left and children_right of the nodes (-1 for leaves)
+ 	feature, threshold - split gene (position of the column) and split value of each node
+ 	counts - class counts of each node (nodes x classes, see class_counts)
+
+ Returns:
+ 	Dictionary of numpy arrays:
+ 	    feature, threshold, counts - split gene (position of the column), split value and class counts of each node
+ 	    parent, depth - parent (-1 for the root) and depth of each node
+ 	    leaves, leaf_depth - id and depth of each leaf
+ 	    path_nodes, path_depth, path_offsets - internal nodes of each root-to-leaf path and their depth
+ 	    edge_parent, edge_son, edge_depth - one record for each node with a father (edges of the tree), sorted by son
+ 	    edge_threshold, edge_counts_parent, edge_counts_son - split value of the father and class counts of both nodes of each edge
+"""
+
+def extract_arrays(left, right, feature, threshold, counts):
+    n_nodes = len(left)
+
+    internal = np.flatnonzero(left != -1)
+    parent = np.full(n_nodes, -1, dtype=np.int64)
+    parent[left[internal]] = internal
+    parent[right[internal]] = internal
+
+    # Depth by levels: each node is visited once
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    frontier = np.array([0])
+    level = 0
+    while len(frontier):
+        depth[frontier] = level
+        frontier = frontier[left[frontier] != -1]
+        frontier = np.concatenate([left[frontier], right[frontier]])
+        level += 1
+
+    leaves = np.flatnonzero(left == -1)
+    leaf_depth = depth[leaves]
+    path_offsets = np.zeros(len(leaves)+1, dtype=np.int64)
+    np.cumsum(leaf_depth, out=path_offsets[1:])
+    path_nodes = np.empty(path_offsets[-1], dtype=np.int64)
+    # Walks all leaves up at the same time, filling each path from its end
+    current = parent[leaves]
+    position = path_offsets[1:]-1
+    active = leaf_depth > 0
+    while active.any():
+        path_nodes[position[active]] = current[active]
+        position = position-1
+        current = np.where(active, parent[np.maximum(current, 0)], -1)
+        active = current != -1
+    path_depth = depth[path_nodes]
+
+    edge_son = np.flatnonzero(parent != -1)
+    edge_parent = parent[edge_son]
+    return {'feature': feature,
+            'threshold': threshold,
+            'counts': counts,
+            'parent': parent,
+            'depth': depth,
+            'leaves': leaves,
+            'leaf_depth': leaf_depth,
+            'path_nodes': path_nodes,
+            'path_depth': path_depth,
+            'path_offsets': path_offsets,
+            'edge_parent': edge_parent,
+            'edge_son': edge_son,
+            'edge_depth': depth[edge_son],
+            'edge_threshold': threshold[edge_parent],
+            'edge_counts_parent': counts[edge_parent],
+            'edge_counts_son': counts[edge_son]}
+
+"""
+Function: group_by_first_appearance
+
+ Description:
+    Stable order that groups equal keys together, groups sorted by the first time their key appears.
+    Reproduces the order of rows created by iterating over a dictionary of lists filled in the same sequence.
+
+ Parameters:
+ 	keys - numpy array of keys (integers)
+
+ Returns:
+ 	Array of positions that sorts keys.
+"""
+
+def group_by_first_appearance(keys):
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return np.argsort(first[inverse], kind='stable')
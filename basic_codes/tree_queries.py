@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+import tree_store
+
+"""
+Title: Description
+Queries of the analysis of the "average tree" (see README), returning dataframes, and the indexes they need.
+Indexes are covering: every column read by a query is in its index, so SQLite answers from the index without reading the tables.
+The tables of an experiment saved as arrays (see tree_store) are materialized by the first query that reads them.
+"""
+
+indexes = {
+    'father_and_son_nodes_pairs': """father_and_son_nodes (experiencia_id, gene_id_parent, gene_id_son, depth,
+        CVDA_son, CVD_son, CA_son, C_son, expression_value)""",
+    'father_and_son_nodes_genes': 'father_and_son_nodes (gene_id_parent, gene_id_son)',
+    'place_of_genes_in_tree_depth': 'place_of_genes_in_tree (experiencia_id, gene_name, depth)',
+    'place_of_genes_in_tree_tree': 'place_of_genes_in_tree (tree_generation)',
+    'path_cond': 'path (experiencia_id, cond, path_id)',
+    'genes_in_path_path': 'genes_in_path (path_id, gene_id, depth)',
+    'genes_in_path_experiment': 'genes_in_path (experiencia_id, gene_id)',
+    'tree_experiment': 'tree (experiencia_id)',
+    'tree_node_tree': 'tree_node (tree_id, gene_id)',
+    'esta_em_tree': 'esta_em (tree_id, gene_id)',
+    'gene_name': 'gene (gene_name, gene_symbol)',
+}
+
+"""
+Function: create_indexes
+
+ Description:
+    Creates the indexes used by the queries of this file, for the tables present in the database. Can be called any number of times.
+
+ Parameters:
+ 	db - sqlite3 connection
+"""
+
+def create_indexes(db):
+    tables = set(row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='table';"))
+    for name in indexes:
+        if indexes[name].split(' ')[0] in tables: # Tables missing in the database are skipped
+            db.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {indexes[name]};')
+    db.execute('ANALYZE;')
+    db.commit()
+
+"""
+Function: top_pairs
+
+ Description:
+    Pairs of genes (father, son) that appeared the most in an experiment, with symbols of the genes and mean and standard
+    deviation of depth, class counts of the son and expression value. Same result of the two queries of the README.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	limit - number of pairs (default: all)
+
+ Returns:
+ 	Dataframe ordered by co (number of times the pair appeared).
+"""
+
+def top_pairs(db, experiencia_id, limit=None):
+    tree_store.materialize(db, experiencia_id)
+    columns = ['depth', 'CVDA_son', 'CVD_son', 'CA_son', 'C_son', 'expression_value']
+    means = ', '.join(f'AVG({c}) AS avg_{c}' for c in columns)
+    squares = ', '.join(f'SUM((fs.{c}-mean.avg_{c})*(fs.{c}-mean.avg_{c})) AS m2_{c}' for c in columns)
+    # Squared differences to the mean of the pair (second pass), instead of the mean of squares, which cancels when the
+    # values are large compared to their deviation
+    sql = f"""WITH mean AS (SELECT COUNT(*) AS co, gene_id_parent, gene_id_son, {means}
+            FROM father_and_son_nodes WHERE experiencia_id = ?
+            GROUP BY gene_id_parent, gene_id_son),
+        tbl1 AS (SELECT mean.*, {squares}
+            FROM mean INNER JOIN father_and_son_nodes AS fs ON fs.experiencia_id = ? AND fs.gene_id_parent = mean.gene_id_parent
+                AND fs.gene_id_son = mean.gene_id_son
+            GROUP BY mean.gene_id_parent, mean.gene_id_son)
+        SELECT gen1.gene_symbol AS parent, gen2.gene_symbol AS son, tbl1.* FROM tbl1
+        INNER JOIN gene AS gen1 ON tbl1.gene_id_parent = gen1.gene_name
+        INNER JOIN gene AS gen2 ON tbl1.gene_id_son = gen2.gene_name
+        ORDER BY tbl1.co DESC"""
+    params = [experiencia_id]*2
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    df = pd.read_sql_query(sql, db, params=params)
+    for c in columns:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            df[f'std_{c}'] = np.sqrt(df[f'm2_{c}']/(df['co']-1)) # Sample standard deviation, like STDEV
+        df = df.drop(columns=f'm2_{c}')
+    return df
+
+"""
+Function: depth_distribution
+
+ Description:
+    Number of times each gene appeared at each depth of the trees of an experiment.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	gene_name - a single gene (default: all genes)
+
+ Returns:
+ 	Dataframe with gene_name, depth and count.
+"""
+
+def depth_distribution(db, experiencia_id, gene_name=None):
+    tree_store.materialize(db, experiencia_id)
+    sql = 'SELECT gene_name, depth, COUNT(*) AS count FROM place_of_genes_in_tree WHERE experiencia_id = ?'
+    params = [experiencia_id]
+    if gene_name is not None:
+        sql += ' AND gene_name = ?'
+        params.append(gene_name)
+    sql += ' GROUP BY gene_name, depth ORDER BY gene_name, depth'
+    return pd.read_sql_query(sql, db, params=params)
+
+"""
+Function: paths_by_class
+
+ Description:
+    For each class (cond of path), the genes present in its paths, how many times they appeared and their mean depth.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	cond - a single class (default: all classes)
+
+ Returns:
+ 	Dataframe with cond, gene_id, count_gp_gene_id and avg_depth, ordered by class and count.
+"""
+
+def paths_by_class(db, experiencia_id, cond=None):
+    tree_store.materialize(db, experiencia_id)
+    sql = """SELECT pa.cond, gp.gene_id, COUNT(*) AS count_gp_gene_id, AVG(gp.depth) AS avg_depth
+        FROM path AS pa INNER JOIN genes_in_path AS gp ON gp.path_id = pa.path_id
+        WHERE pa.experiencia_id = ?"""
+    params = [experiencia_id]
+    if cond is not None:
+        sql += ' AND pa.cond = ?'
+        params.append(cond)
+    sql += ' GROUP BY pa.cond, gp.gene_id ORDER BY pa.cond, count_gp_gene_id DESC'
+    return pd.read_sql_query(sql, db, params=params)
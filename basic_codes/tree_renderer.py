@@ -0,0 +1,166 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pair_aggregates
+import tree_store
+
+"""
+Title: Description
+Rendering of the trees of an experiment to PDF files named by the id of the tree. Trees can be rendered one after another
+(every Nth tree), on a small pool of threads while the next trees are fitted (graphviz runs dot in a separate process, so
+the fitting is not blocked), or not at all, leaving only the consensus tree of the experiment, drawn from the database.
+"""
+
+modes = ['off', 'every', 'background']
+
+"""
+Function: render_tree
+
+ Parameters:
+ 	clf - decision tree model fitted
+ 	genes_symbols - name of genes in the order of the columns used to fit the tree
+ 	path - path of the file, without extension
+
+ Returns:
+ 	Path of the PDF file.
+ 	Prints error message and returns None if the dot program of graphviz is not installed.
+"""
+
+def render_tree(clf, genes_symbols, path):
+    from sklearn import tree
+    import graphviz # Loaded only when a tree is rendered, so runs with rendering off do not pay for it
+    dot_data = tree.export_graphviz(clf, feature_names=genes_symbols, out_file=None)
+    try:
+        return graphviz.Source(dot_data).render(path, format='pdf')
+    except graphviz.ExecutableNotFound:
+        print('Error: dot program of graphviz not found, tree not rendered')
+        return None
+
+"""
+Class: TreeRenderer
+
+ Description:
+    Renders the trees given to submit according to the mode:
+    'off' renders nothing, 'every' renders every Nth tree before returning and 'background' renders every Nth tree on a pool of
+    max_workers threads. At most max_pending trees wait for the pool; submit blocks when the queue is full, so memory stays bounded.
+
+ Parameters:
+ 	output_dir - folder of the PDF files (files are named prefix_treeid.pdf)
+ 	mode - 'off', 'every' or 'background'
+ 	every - renders one tree for every N trees
+ 	max_workers - number of threads rendering in the background
+ 	max_pending - maximum number of trees waiting to be rendered
+ 	prefix - prefix of the name of the files
+"""
+
+class TreeRenderer:
+
+    def __init__(self, output_dir, mode='background', every=1, max_workers=2, max_pending=8, prefix='gtex_tree'):
+        if not(mode in modes):
+            print('Error: invalid render mode')
+            mode = 'off'
+        self.output_dir = output_dir
+        self.mode = mode
+        self.every = max(1, every)
+        self.prefix = prefix
+        self.submitted = 0
+        self.rendered = []
+        self.errors = []
+        self.executor = None
+        if mode == 'background':
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+            self.slots = threading.BoundedSemaphore(max_pending)
+        if mode != 'off':
+            os.makedirs(output_dir, exist_ok=True)
+
+    """
+    Function: submit
+
+     Parameters:
+     	tree_id - id of the tree (tree_generation), used in the name of the file
+     	clf - decision tree model fitted
+     	genes_symbols - name of genes in the order of the columns used to fit the tree
+    """
+
+    def submit(self, tree_id, clf, genes_symbols):
+        self.submitted += 1
+        if self.mode == 'off' or (self.submitted-1) % self.every != 0:
+            return
+        path = os.path.join(self.output_dir, f'{self.prefix}_{tree_id}')
+        if self.mode == 'every':
+            pdf = render_tree(clf, genes_symbols, path)
+            if pdf is not None:
+                self.rendered.append(pdf)
+            return
+        self.slots.acquire() # Waits while the queue is full
+        future = self.executor.submit(render_tree, clf, genes_symbols, path)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.slots.release()
+        if future.exception() is not None:
+            self.errors.append(future.exception())
+        elif future.result() is not None:
+            self.rendered.append(future.result())
+
+    """
+    Function: close
+
+     Description:
+        Waits for the trees still being rendered.
+
+     Returns:
+     	List of paths of the PDF files rendered. Prints error message for trees that could not be rendered.
+    """
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        for error in self.errors:
+            print(f'Error: tree not rendered ({error})')
+        return self.rendered
+
+"""
+Function: render_consensus_tree
+
+ Description:
+    Draws the consensus tree of an experiment: the most frequent pairs of genes (father, son) of gene_pair_aggregate, with
+    the number of trees where each pair appeared and the mean expression value of the split. Genes saved as their own
+    father (roots of the trees) are drawn with the number of trees where they were the root.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	path - path of the file, without extension
+ 	limit - number of pairs drawn
+
+ Returns:
+ 	Path of the PDF file.
+ 	Prints error message and returns None if the dot program of graphviz is not installed.
+"""
+
+def render_consensus_tree(db, experiencia_id, path, limit=30):
+    import graphviz
+    tree_store.materialize(db, experiencia_id) # Only for experiments saved as arrays not materialized yet
+    pairs = pair_aggregates.most_frequent_pairs(db, experiencia_id, limit=limit)
+    graph = graphviz.Digraph(name=f'consensus_{experiencia_id}', node_attr={'shape': 'box', 'fontname': 'helvetica'})
+    roots = {}
+    for row in pairs.itertuples(index=False):
+        if row.gene_id_parent == row.gene_id_son:
+            roots[row.gene_id_son] = row.co
+    genes = set(pairs['gene_id_parent']) | set(pairs['gene_id_son'])
+    for gene in sorted(genes):
+        label = gene if not(gene in roots) else f'{gene}\nroot in {roots[gene]} trees'
+        graph.node(gene, label=label, style='filled' if gene in roots else '', fillcolor='lightgrey')
+    for row in pairs.itertuples(index=False):
+        if row.gene_id_parent != row.gene_id_son:
+            graph.edge(row.gene_id_parent, row.gene_id_son,
+                       label=f'{row.co} trees\ndepth {round(row.avg_depth,1)}\nvalue {round(row.avg_expression_value,3)}',
+                       penwidth=str(1+4*row.co/pairs['co'].max()))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    try:
+        return graph.render(path, format='pdf')
+    except graphviz.ExecutableNotFound:
+        print('Error: dot program of graphviz not found, consensus tree not rendered')
+        return None
@@ -0,0 +1,84 @@
+import numpy as np
+import tree_extraction
+import pair_aggregates
+from itertools import repeat
+
+"""
+Title: Description
+Rows of the relational tables of a tree (place_of_genes_in_tree, father_and_son_nodes, gene_pair_aggregate, path,
+genes_in_path, esta_em and tree_node), built from the arrays of tree_extraction. Used by the tree loop of tree_experiment,
+when trees are saved in the relational tables, and by tree_store, when the tables of an experiment saved as arrays are
+materialized, so both give the same rows.
+"""
+
+"""
+Function: add_tree_rows
+
+ Parameters:
+ 	writer - sql_writer.BatchWriter where the rows are buffered
+ 	cursor_id - tree_generation of the tree
+ 	exp - id of the experiment
+ 	lineage - arrays of the tree (see tree_extraction.extract_arrays)
+ 	names_of_nodes - gene of each node of the tree (the names of leaves are not used)
+ 	condition_decoded - name of each class, in the order of the class counts
+"""
+
+def add_tree_rows(writer, cursor_id, exp, lineage, names_of_nodes, condition_decoded):
+    counts = lineage['counts']
+    path_nodes = lineage['path_nodes']
+
+    #insert data to place_of_genes_in_trees
+    order = tree_extraction.group_by_first_appearance(lineage['feature'][path_nodes]) #Rows grouped by gene
+    nodes = path_nodes[order]
+    rows_place_of_genes = list(zip([names_of_nodes[n] for n in nodes.tolist()], repeat(cursor_id), repeat(exp),
+    lineage['path_depth'][order].tolist(), *counts[nodes][:, :4].T.tolist()))
+    writer.add("""INSERT INTO place_of_genes_in_tree (gene_name,tree_generation,experiencia_id,depth,
+    CVDA,CA,C,CVD) VALUES (?,?,?,?,?,?,?,?);""", rows_place_of_genes)
+
+    #insert data to father_and_son_nodes
+    internal_edges = lineage['feature'][lineage['edge_son']] >= 0 #Leaves are not saved as sons
+    root = [0] if lineage['feature'][0] >= 0 else [] #The root is saved as its own father, unless the tree is a single leaf
+    sons = np.concatenate([root, lineage['edge_son'][internal_edges]]).astype(np.int64)
+    fathers = np.concatenate([root, lineage['edge_parent'][internal_edges]]).astype(np.int64)
+    order = tree_extraction.group_by_first_appearance(lineage['feature'][sons])
+    sons = sons[order]
+    fathers = fathers[order]
+    rows_father_and_son = list(zip([names_of_nodes[n] for n in fathers.tolist()], [names_of_nodes[n] for n in sons.tolist()], repeat(exp),
+    lineage['depth'][sons].tolist(), *counts[fathers][:, :4].T.tolist(), *counts[sons][:, :4].T.tolist(), lineage['threshold'][sons].tolist()))
+    writer.add("""INSERT INTO father_and_son_nodes (gene_id_parent,gene_id_son,experiencia_id,depth,
+    CVDA_father,CA_father,C_father,CVD_father,CVDA_son,CA_son,C_son,CVD_son,expression_value)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?);""", rows_father_and_son)
+    writer.add(pair_aggregates.upsert_sql, pair_aggregates.aggregate_rows(rows_father_and_son))
+
+    #insert data to genes_in_path and path
+    rows_genes_in_path = []
+    rows_path = []
+    offsets = lineage['path_offsets'].tolist()
+    path_genes = [names_of_nodes[n] for n in path_nodes.tolist()]
+    path_depth = lineage['path_depth'].tolist()
+    leaf_counts = counts[lineage['leaves']]
+    for i in range(len(lineage['leaves'])):
+        path_id_lastrowid = None
+        for k in np.flatnonzero(leaf_counts[i]).tolist():
+            path_id_lastrowid = writer.next_id('path', 'path_id')
+            rows_path.append((path_id_lastrowid,condition_decoded[k],offsets[i+1]-offsets[i],exp))
+        for j in range(offsets[i+1]-1, offsets[i]-1, -1): #From the leaf to the root
+            rows_genes_in_path.append((path_genes[j],path_depth[j],path_id_lastrowid,exp))
+    writer.add("""INSERT INTO path (path_id,cond,nodes,experiencia_id) VALUES (?,?,?,?);""", rows_path)
+    writer.add("""INSERT INTO genes_in_path (gene_id,depth,path_id,experiencia_id) VALUES (?,?,?,?);""", rows_genes_in_path)
+
+    #insert data to esta_em and tree_node, once for each node of the tree
+    rows_esta_em = []
+    rows_tree_node = []
+    genes_in_esta_em = set() #Genes of this tree already in esta_em
+    tree_node_id_of_node = {} #tree_node_id of each node (sklearn index) of this tree
+    parent = lineage['parent'].tolist()
+    depth = lineage['depth'].tolist()
+    for n in np.unique(path_nodes).tolist(): #Fathers have smaller indexes than their sons
+        if not(names_of_nodes[n] in genes_in_esta_em):
+            rows_esta_em.append((cursor_id,names_of_nodes[n],exp))
+            genes_in_esta_em.add(names_of_nodes[n])
+        tree_node_id_of_node[n] = writer.next_id('tree_node', 'tree_node_id')
+        rows_tree_node.append((tree_node_id_of_node[n],depth[n],tree_node_id_of_node.get(parent[n]),cursor_id,names_of_nodes[n],exp))
+    writer.add("""INSERT INTO esta_em (tree_id,gene_id,experiencia_id) VALUES (?,?,?);""", rows_esta_em)
+    writer.add("""INSERT INTO tree_node (tree_node_id,depth,father_node_id,tree_id,gene_id,experiencia_id) VALUES (?,?,?,?,?,?);""", rows_tree_node)
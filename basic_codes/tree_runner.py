@@ -0,0 +1,247 @@
+import numpy as np
+import random
+from collections import deque
+from multiprocessing import Pool, shared_memory
+import histogram_tree
+
+"""
+Title: Description
+Fits the decision trees of an experiment on a pool of processes. The expression matrix is copied once to shared memory
+and every worker reads it from there, so only the iteration and the seed of each tree are sent to the workers, which
+shuffle the columns of the tree themselves (see tree_order). At most max_pending trees are fitted ahead of the caller, so
+fitted trees do not pile up in memory when the database is slower than the workers.
+Each process gathers the columns of a tree into one buffer allocated on its first tree and reused by the next ones.
+With the 'histogram' engine the matrix is quantized once (see histogram_tree) and the trees read the bins in place.
+The forest engines ('random_forest' and 'extra_trees') grow many randomized trees in a single fit of a sklearn forest,
+on threads, and return its member trees one by one (see fit_forest).
+"""
+
+_shared = {}
+
+"""
+Variable: forest_engines
+
+ Description:
+    Engines that grow the trees as members of a sklearn forest, with the name of the forest class of sklearn.ensemble.
+    'random_forest' searches the best split among max_features genes of each node; 'extra_trees' also draws the threshold
+    of each gene at random, so its trees are faster to grow and more different from each other.
+"""
+
+forest_engines = {'random_forest': 'RandomForestClassifier', 'extra_trees': 'ExtraTreesClassifier'}
+
+"""
+Function: tree_seeds
+
+ Description:
+    Creates one deterministic seed for each tree of an experiment, so a run can be reproduced tree by tree.
+
+ Parameters:
+ 	seed - seed of the experiment
+ 	n_times_run - number of trees generated
+
+ Returns:
+ 	List of integer seeds, one for each tree.
+"""
+
+def tree_seeds(seed, n_times_run):
+    sequence = np.random.SeedSequence(seed)
+    return [int(child.generate_state(1)[0]) for child in sequence.spawn(n_times_run)]
+
+"""
+Function: share_matrix
+
+ Description:
+    Copies a numpy array to a block of shared memory that worker processes can attach to without pickling it.
+
+ Parameters:
+ 	array - numpy array to be shared
+
+ Returns:
+ 	Shared memory block (must be closed and unlinked by the caller) and dictionary describing the array inside it.
+"""
+
+def share_matrix(array):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, {'name': shm.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+def _attach_matrix(specs, y, engine, n_genes, change_position):
+    # Runs once in each worker: maps the shared matrices instead of receiving a copy of them
+    _shared['shm'] = []
+    arrays = {}
+    for name in specs:
+        shm = shared_memory.SharedMemory(name=specs[name]['name'])
+        _shared['shm'].append(shm)
+        arrays[name] = np.ndarray(specs[name]['shape'], dtype=np.dtype(specs[name]['dtype']), buffer=shm.buf)
+    _set_inputs(arrays, y, engine, n_genes, change_position)
+
+def _set_inputs(arrays, y, engine, n_genes, change_position):
+    _shared['engine'] = engine
+    _shared['y'] = y
+    _shared['n_genes'] = n_genes
+    _shared['change_position'] = change_position
+    if engine == 'histogram':
+        _shared['binned'] = arrays
+    else:
+        _shared['x'] = arrays['x']
+
+def _permuted(order):
+    # Columns of the shared matrix in the order of the tree, written over the buffer of the previous tree
+    x = _shared['x']
+    if _shared.get('buffer') is None:
+        _shared['buffer'] = np.empty(x.shape, dtype=x.dtype)
+    np.take(x, order, axis=1, out=_shared['buffer'])
+    return _shared['buffer']
+
+def _fit_one(task):
+    iteration, seed = task
+    order = tree_order(_shared['n_genes'], seed, _shared['change_position'])
+    if _shared['engine'] == 'histogram':
+        clf = histogram_tree.HistogramTreeClassifier(random_state=seed)
+        return iteration, clf.fit(_shared['binned'], _shared['y'], order) # Columns are permuted by index, the bins are not copied
+    from sklearn import tree # Loaded with the first tree: sklearn.tree also loads sklearn.decomposition (through sklearn.neighbors)
+    clf = tree.DecisionTreeClassifier(random_state=seed)
+    clf = clf.fit(_permuted(order), _shared['y']) # The tree keeps no reference to x, so the buffer can be reused
+    return iteration, clf
+
+"""
+Function: fit_trees
+
+ Description:
+    Fits one decision tree for each task, spreading the work across n_jobs processes. Trees are returned in the same
+    order of the tasks, so saving them in the database gives the same result as fitting them one after another.
+
+ Parameters:
+ 	x - matrix of expression values (samples x genes) in the original column order (float32 avoids a conversion for each tree)
+ 	y - classes of the samples as numbers
+ 	tasks - list of (iteration, seed) created by create_tasks
+ 	n_jobs - number of processes used. With 1 the trees are fitted in the current process
+ 	engine - 'sklearn' (sklearn.tree.DecisionTreeClassifier) or 'histogram' (histogram_tree.HistogramTreeClassifier, on the
+ 	         matrix quantized once)
+ 	change_position - function that shuffles the columns of a tree (see tree_order). Feature j of the fitted tree is
+ 	                  column order[j] of x, with order = tree_order(number of columns, seed, change_position)
+ 	max_pending - trees sent to the workers and not yet returned (default: 4 for each process)
+
+ Returns:
+ 	Generator of (iteration, fitted tree) in the order of the tasks.
+ 	Prints error message if engine is not valid.
+"""
+
+def fit_trees(x, y, tasks, n_jobs=1, engine='sklearn', change_position=None, max_pending=None):
+    if engine == 'sklearn':
+        arrays = {'x': np.asarray(x)}
+    elif engine == 'histogram':
+        arrays = histogram_tree.bin_matrix(x) # Once for all the trees
+    else:
+        print('Error: invalid engine')
+        return
+    n_genes = np.shape(x)[1]
+    if n_jobs == 1:
+        _set_inputs(arrays, y, engine, n_genes, change_position)
+        try:
+            for task in tasks:
+                yield _fit_one(task)
+        finally:
+            _shared.clear()
+        return
+    blocks = []
+    specs = {}
+    try:
+        for name in arrays:
+            shm, specs[name] = share_matrix(arrays[name])
+            blocks.append(shm)
+        with Pool(processes=n_jobs, initializer=_attach_matrix, initargs=(specs, y, engine, n_genes, change_position)) as pool:
+            pending = deque()
+            for task in tasks: # A new tree is sent only when one is returned, so at most max_pending are in memory
+                pending.append(pool.apply_async(_fit_one, (task,)))
+                if len(pending) >= (max_pending or 4*n_jobs):
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+"""
+Function: fit_forest
+
+ Description:
+    Grows the trees of the tasks as members of sklearn forests, each forest fitted in a single call with n_jobs threads
+    (the trees of a forest share x and do not need processes or shared memory). Trees are grown in forests of trees_per_fit
+    members, so memory does not depend on the number of trees of the experiment: the forest of tasks[k*trees_per_fit:
+    (k+1)*trees_per_fit] uses the seed of its first task. Member trees are fitted on the original column order (the
+    forest draws the genes of each node itself), the order of tree_order without change_position.
+
+    A resumed run passes every task with first_iteration: the forest containing first_iteration is grown again with
+    the same seed and its trees already saved are skipped, so the run gives the same trees of an uninterrupted one.
+
+ Parameters:
+ 	x - matrix of expression values (samples x genes) in the original column order
+ 	y - classes of the samples as numbers
+ 	tasks - every (iteration, seed) of the experiment, created by create_tasks
+ 	n_jobs - number of threads growing the trees of each forest (-1 uses every processor)
+ 	engine - 'random_forest' or 'extra_trees' (see forest_engines)
+ 	bootstrap - each tree is grown on a sample with replacement of the samples (False uses every sample)
+ 	max_features - genes searched at each split: 'sqrt', 'log2', a number, a fraction or None (every gene)
+ 	trees_per_fit - number of trees grown in each fit
+ 	first_iteration - iteration of the first tree returned
+
+ Returns:
+ 	Generator of (iteration, fitted tree) in the order of the tasks, each tree a sklearn.tree.DecisionTreeClassifier.
+ 	Prints error message if engine is not valid.
+"""
+
+def fit_forest(x, y, tasks, n_jobs=1, engine='random_forest', bootstrap=True, max_features='sqrt', trees_per_fit=500,
+               first_iteration=0):
+    if not(engine in forest_engines):
+        print('Error: invalid engine')
+        return
+    from sklearn import ensemble # Only loaded by the forest engines
+    forest_class = getattr(ensemble, forest_engines[engine])
+    x = np.asarray(x)
+    start = (first_iteration//trees_per_fit)*trees_per_fit
+    for begin in range(start, len(tasks), trees_per_fit):
+        members = tasks[begin:begin+trees_per_fit]
+        forest = forest_class(n_estimators=len(members), bootstrap=bootstrap, max_features=max_features,
+                              n_jobs=n_jobs, random_state=members[0][1])
+        forest.fit(x, y)
+        for task, clf in zip(members, forest.estimators_):
+            if task[0] >= first_iteration:
+                yield task[0], clf
+        del forest # The trees already returned are kept only by the caller
+
+"""
+Function: create_tasks
+
+ Parameters:
+ 	seeds - list of seeds created by tree_seeds
+
+ Returns:
+ 	List of (iteration, seed) tuples for fit_trees and fit_forest.
+"""
+
+def create_tasks(seeds):
+    return [(iteration, seeds[iteration]) for iteration in range(len(seeds))]
+
+"""
+Function: tree_order
+
+ Description:
+    Order of the columns of a tree, built from its seed, so the workers and the caller get the same order without sending it.
+
+ Parameters:
+ 	n_genes - number of genes (columns) of the expression matrix
+ 	seed - seed of the tree
+ 	change_position - function that shuffles a list receiving it and a random generator. None keeps the original order
+ 	                  (forest engines)
+
+ Returns:
+ 	Array of column positions: feature j of the tree is column order[j].
+"""
+
+def tree_order(n_genes, seed, change_position):
+    if change_position is None:
+        return np.arange(n_genes, dtype=np.intp)
+    return np.array(change_position(list(range(n_genes)), random.Random(seed)), dtype=np.intp)
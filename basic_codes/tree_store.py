@@ -0,0 +1,203 @@
+import json
+import time
+import numpy as np
+import sql_writer
+import pair_aggregates
+import tree_extraction
+import tree_rows
+
+"""
+Title: Description
+Compact storage of the trees of an experiment: each tree is one row of tree_arrays with the arrays of the fitted tree
+(children_left, children_right, feature, threshold and the class counts of each node) saved as binary blobs, and the genes
+and classes of the experiment are saved once in tree_dictionary. Features are positions in the genes of the dictionary (the
+original order of the columns), so no gene name is repeated in the rows of the trees.
+
+The relational tables of the README (place_of_genes_in_tree, father_and_son_nodes, path, genes_in_path, esta_em, tree_node
+and gene_pair_aggregate) are materialized from the arrays only when the SQL analysis needs them (see materialize), with the
+same rows that the tree loop writes when the trees are saved in the relational tables.
+"""
+
+create_sql = """CREATE TABLE IF NOT EXISTS tree_arrays (
+    tree_generation INTEGER PRIMARY KEY REFERENCES tree (tree_generation),
+    experiencia_id INTEGER NOT NULL,
+    node_count INTEGER NOT NULL,
+    children_left BLOB NOT NULL,
+    children_right BLOB NOT NULL,
+    feature BLOB NOT NULL,
+    threshold BLOB NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tree_arrays_experiment ON tree_arrays (experiencia_id, tree_generation);
+CREATE TABLE IF NOT EXISTS tree_dictionary (
+    experiencia_id INTEGER PRIMARY KEY,
+    genes TEXT NOT NULL,
+    classes TEXT NOT NULL,
+    materialized REAL
+);"""
+
+insert_sql = """INSERT INTO tree_arrays (tree_generation,experiencia_id,node_count,children_left,children_right,feature,threshold,value)
+    VALUES (?,?,?,?,?,?,?,?);"""
+
+# Little-endian types of the blobs, the same on every machine
+_types = {'children_left': '<i4', 'children_right': '<i4', 'feature': '<i4', 'threshold': '<f8', 'value': '<i4'}
+
+# Relational tables of a tree, materialized from the arrays
+legacy_tables = ['place_of_genes_in_tree', 'father_and_son_nodes', 'gene_pair_aggregate', 'genes_in_path', 'path', 'esta_em', 'tree_node']
+
+"""
+Function: create_tables
+
+ Parameters:
+ 	db - sqlite3 connection
+"""
+
+def create_tables(db):
+    db.executescript(create_sql)
+
+"""
+Function: save_dictionary
+
+ Description:
+    Saves the genes and classes of an experiment. Called again when an experiment is resumed, it marks the relational tables
+    of the experiment as not materialized, since new trees will be saved.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	genes - names of the genes in the original order of the columns
+ 	classes - name of each class, in the order of the class counts
+"""
+
+def save_dictionary(db, experiencia_id, genes, classes):
+    with db:
+        db.execute("""INSERT INTO tree_dictionary (experiencia_id,genes,classes,materialized) VALUES (?,?,?,NULL)
+            ON CONFLICT(experiencia_id) DO UPDATE SET materialized = NULL;""",
+                   (experiencia_id, json.dumps(list(genes)), json.dumps([str(name) for name in classes])))
+
+"""
+Function: read_dictionary
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+
+ Returns:
+ 	Dictionary with genes, classes and materialized (time of the last materialization or None).
+ 	None if the trees of the experiment were not saved as arrays.
+"""
+
+def read_dictionary(db, experiencia_id):
+    tables = set(row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type='table';"))
+    if not('tree_dictionary' in tables):
+        return None
+    row = db.execute('SELECT genes, classes, materialized FROM tree_dictionary WHERE experiencia_id = ?;', (experiencia_id,)).fetchone()
+    if row is None:
+        return None
+    return {'genes': json.loads(row[0]), 'classes': json.loads(row[1]), 'materialized': row[2]}
+
+"""
+Function: tree_arrays
+
+ Description:
+    Arrays of a fitted tree as they are saved in tree_arrays. Features are mapped back through the column order of the tree
+    to the positions of the genes in the dictionary; leaves keep the feature of sklearn (-2).
+
+ Parameters:
+ 	clf - decision tree model fitted
+ 	order - permutation of the columns of the tree (feature j is gene order[j])
+
+ Returns:
+ 	Dictionary with children_left, children_right, feature, threshold and value (class counts of each node).
+"""
+
+def tree_arrays(clf, order):
+    tree_ = clf.tree_
+    feature = tree_.feature
+    return {'children_left': tree_.children_left,
+            'children_right': tree_.children_right,
+            'feature': np.where(feature >= 0, np.asarray(order)[np.maximum(feature, 0)], feature),
+            'threshold': tree_.threshold,
+            'value': tree_extraction.class_counts(tree_)}
+
+"""
+Function: tree_row
+
+ Parameters:
+ 	cursor_id - tree_generation of the tree
+ 	exp - id of the experiment
+ 	clf - decision tree model fitted
+ 	order - permutation of the columns of the tree (feature j is gene order[j])
+
+ Returns:
+ 	Tuple of values for insert_sql.
+"""
+
+def tree_row(cursor_id, exp, clf, order):
+    arrays = tree_arrays(clf, order)
+    return (cursor_id, exp, clf.tree_.node_count) + tuple(np.ascontiguousarray(arrays[name], dtype=_types[name]).tobytes() for name in _types)
+
+"""
+Function: read_trees
+
+ Description:
+    Reads the trees of an experiment saved as arrays, in the order they were saved.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	n_classes - number of classes of the experiment (columns of value)
+
+ Returns:
+ 	Generator of (tree_generation, dictionary of the arrays of the tree).
+"""
+
+def read_trees(db, experiencia_id, n_classes):
+    rows = db.execute('SELECT tree_generation, node_count, ' + ', '.join(_types) + ' FROM tree_arrays WHERE experiencia_id = ? ORDER BY tree_generation;',
+                      (experiencia_id,))
+    for row in rows:
+        arrays = {}
+        for name, blob in zip(_types, row[2:]):
+            arrays[name] = np.frombuffer(blob, dtype=_types[name]).astype(np.float64 if name == 'threshold' else np.int64)
+        arrays['value'] = arrays['value'].reshape(row[1], n_classes)
+        yield row[0], arrays
+
+"""
+Function: materialize
+
+ Description:
+    Writes the rows of the relational tables of every tree of an experiment saved as arrays, so the SQL analysis of the
+    README can be run on it. Rows already there from an earlier (or interrupted) materialization are deleted first, and the
+    experiment is marked as materialized at the end, so calling it again does nothing until new trees are saved.
+
+ Parameters:
+ 	db - sqlite3 connection
+ 	experiencia_id - id of the experiment
+ 	force - writes the rows again even if the experiment is marked as materialized
+ 	trees_per_commit - number of trees written in each transaction
+
+ Returns:
+ 	Number of trees materialized (0 if the experiment was already materialized or was saved in the relational tables).
+"""
+
+def materialize(db, experiencia_id, force=False, trees_per_commit=100):
+    dictionary = read_dictionary(db, experiencia_id)
+    if dictionary is None or (dictionary['materialized'] is not None and not(force)):
+        return 0
+    pair_aggregates.create_table(db)
+    with db:
+        for table in legacy_tables:
+            db.execute(f'DELETE FROM {table} WHERE experiencia_id = ?;', (experiencia_id,))
+    genes = np.array(dictionary['genes'], dtype=object)
+    writer = sql_writer.BatchWriter(db, trees_per_commit=trees_per_commit)
+    n_trees = 0
+    for cursor_id, arrays in read_trees(db, experiencia_id, len(dictionary['classes'])):
+        lineage = tree_extraction.extract_arrays(arrays['children_left'], arrays['children_right'], arrays['feature'],
+                                                 arrays['threshold'], arrays['value'])
+        tree_rows.add_tree_rows(writer, cursor_id, experiencia_id, lineage, genes[lineage['feature']].tolist(), dictionary['classes'])
+        writer.end_tree()
+        n_trees += 1
+    writer.flush()
+    with db:
+        db.execute('UPDATE tree_dictionary SET materialized = ? WHERE experiencia_id = ?;', (time.time(), experiencia_id))
+    return n_trees
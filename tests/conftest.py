@@ -0,0 +1,32 @@
+import os
+import sys
+import sqlite3
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'basic_codes'))
+import db_schema
+
+"""
+Title: Description
+Fixtures shared by the tests: a small labelled expression dataframe, like the one read by script 6, and an empty database
+with the schema of the trees.
+"""
+
+@pytest.fixture
+def labelled_df():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 4, 80)
+    x = np.log2(rng.gamma(0.5, 20, (80, 40))+1)
+    x[:, :5] += np.array([0.0, 1.0, 2.0, 3.0])[y][:, None] # Genes that separate the classes
+    df = pd.DataFrame(np.round(x, 3), columns=[f'ENSG{i:011d}' for i in range(40)], index=[f'GTEX-{i}' for i in range(80)])
+    df['Pacient_Condition'] = pd.Series(['CVDA', 'CA', 'C', 'CVD']).iloc[y].values
+    return df
+
+@pytest.fixture
+def database(tmp_path):
+    db = sqlite3.connect(os.path.join(tmp_path, 'trees.sqlite3'))
+    db_schema.create_database(db)
+    yield db
+    db.close()
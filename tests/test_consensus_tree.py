@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import numpy as np
+import db_schema
+import consensus_tree
+import tree_experiment
+import tree_store
+
+"""
+Title: Description
+Tests of the consensus tree: the trees read back from the relational tables are the trees saved as arrays, and give the same
+consensus tree.
+"""
+
+def run_experiment(df, db, storage, results_dir):
+    return tree_experiment.run_tree_experiment(df, db, 'Consensus', n_times_run=12, storage=storage, render_mode='off',
+                                               render_consensus=False, results_dir=results_dir)['experiencia_id']
+
+def test_relational_consensus_equals_compact(labelled_df, database, tmp_path):
+    exp = run_experiment(labelled_df, database, 'relational', str(tmp_path))
+    compact = sqlite3.connect(os.path.join(tmp_path, 'compact.sqlite3'))
+    db_schema.create_database(compact)
+    compact_exp = run_experiment(labelled_df, compact, 'compact', str(tmp_path))
+
+    dictionary = tree_store.read_dictionary(compact, compact_exp)
+    saved = list(tree_store.read_trees(compact, compact_exp, len(dictionary['classes'])))
+    read = list(consensus_tree.relational_trees(database, exp, dictionary['genes'], dictionary['classes']))
+    assert len(read) == len(saved) == 12
+    for (_, expected), (_, arrays) in zip(saved, read):
+        internal = expected['children_left'] != -1
+        for name in ['children_left', 'children_right', 'value']:
+            assert np.array_equal(arrays[name], expected[name])
+        assert np.array_equal(arrays['feature'][internal], expected['feature'][internal])
+        assert np.allclose(arrays['threshold'][internal], expected['threshold'][internal])
+
+    assert consensus_tree.experiment_aggregator(database, exp) is None # Classes are not saved in the relational tables
+    relational = consensus_tree.experiment_aggregator(database, exp, dictionary['genes'], dictionary['classes'])
+    arrays = consensus_tree.experiment_aggregator(compact, compact_exp)
+    expected = consensus_tree.assemble_consensus(arrays['aggregator'].aggregate(), arrays['genes'])
+    assert len(expected['gene']) > 1
+    assert consensus_tree.assemble_consensus(relational['aggregator'].aggregate(), relational['genes']) == expected
+    compact.close()
+
+def test_resumed_relational_consensus_covers_every_tree(labelled_df, database, tmp_path, monkeypatch):
+    rendered = []
+    monkeypatch.setattr(consensus_tree, 'render_consensus', lambda consensus, classes, path: rendered.append(consensus))
+    monkeypatch.setattr(tree_experiment.tree_renderer, 'render_consensus_tree', lambda db, exp, path: None)
+    fit_trees = tree_experiment.tree_runner.fit_trees
+    def interrupted(*args, **kwargs):
+        for i, fitted in enumerate(fit_trees(*args, **kwargs)):
+            if i == 5:
+                raise KeyboardInterrupt
+            yield fitted
+    monkeypatch.setattr(tree_experiment.tree_runner, 'fit_trees', interrupted)
+    try:
+        tree_experiment.run_tree_experiment(labelled_df, database, 'Consensus', n_times_run=12, render_mode='off', results_dir=str(tmp_path))
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(tree_experiment.tree_runner, 'fit_trees', fit_trees)
+    run = tree_experiment.run_tree_experiment(labelled_df, database, None, resume=1, render_mode='off', results_dir=str(tmp_path))
+    assert run['first_iteration'] == 5 and run['trees_written'] == 7
+    tree_experiment.run_tree_experiment(labelled_df, database, 'Consensus', n_times_run=12, render_mode='off', results_dir=str(tmp_path))
+    assert len(rendered) == 2 and rendered[0] == rendered[1]
@@ -0,0 +1,50 @@
+import os
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import expression_cache
+
+"""
+Title: Description
+Tests of the binary cache of expression matrices: same dataframes of pd.read_csv and refresh of the cache when the CSV changes.
+"""
+
+def write_expression_csv(path, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(np.round(np.log2(rng.gamma(0.5, 20, (30, 8))+1), 6), index=pd.Index([f'ENSG{i:011d}.1' for i in range(30)], name='Gene_ID'),
+                      columns=[f'GTEX-{i}-SM-{i:04d}' for i in range(8)])
+    df.to_csv(path)
+    return df
+
+def test_cache_refreshes_when_source_changes(tmp_path):
+    path = os.path.join(tmp_path, 'log2_tpm.csv')
+    first = write_expression_csv(path, 0)
+    matrix = expression_cache.open_expression_matrix(path)
+    assert np.allclose(matrix['values'], first.values, atol=1e-5)
+    assert list(matrix['genes']) == list(first.index) and list(matrix['samples']) == list(first.columns)
+    info = os.path.join(expression_cache._cache_dir_for(path, None), 'info.json')
+    built = os.stat(info).st_mtime_ns
+    assert expression_cache.open_expression_matrix(path)['values'].shape == (30, 8)
+    assert os.stat(info).st_mtime_ns == built # Same file: the cache is not built again
+
+    second = write_expression_csv(path, 1)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns+10**9))
+    matrix = expression_cache.open_expression_matrix(path)
+    assert np.allclose(matrix['values'], second.values, atol=1e-5)
+    assert not(np.allclose(matrix['values'], first.values, atol=1e-5))
+    assert_frame_equal(expression_cache.read_expression_csv(path), pd.read_csv(path, index_col=['Gene_ID']))
+
+def test_read_csv_equals_pandas(tmp_path, labelled_df):
+    path = os.path.join(tmp_path, 'log2_tpm.csv')
+    write_expression_csv(path, 2)
+    assert_frame_equal(expression_cache.read_csv(path).reset_index(), pd.read_csv(path)) # Scripts 4 and 5
+    quartiles = labelled_df.drop(columns='Pacient_Condition').rename_axis('sample_id')
+    quartiles['SMTSISCH'] = np.arange(len(quartiles))*7
+    quartiles['quartiles'] = np.arange(len(quartiles)) % 4
+    quartiles.to_csv(os.path.join(tmp_path, 'quartiles.csv'))
+    assert_frame_equal(expression_cache.read_csv(os.path.join(tmp_path, 'quartiles.csv')).reset_index(),
+                       pd.read_csv(os.path.join(tmp_path, 'quartiles.csv')))
+    labelled_df.to_csv(os.path.join(tmp_path, 'labelled.csv')) # Script 6: index without name and a text column
+    assert_frame_equal(expression_cache.read_csv(os.path.join(tmp_path, 'labelled.csv')),
+                       pd.read_csv(os.path.join(tmp_path, 'labelled.csv'), index_col=['Unnamed: 0']))
@@ -0,0 +1,34 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'basic_codes', 'benchmarks'))
+import bench_filter_genes
+import pipeline_stages
+
+"""
+Title: Description
+Regression test of the streaming gene filter against the filter_genes of script 2 that kept the data in a dictionary and
+wrote it with pandas (pd.DataFrame.from_dict(...).to_csv(..., index=False)).
+"""
+
+def test_streaming_filter_equals_old_filter(tmp_path):
+    path = os.path.join(tmp_path, 'log2_tpm.csv')
+    genes = bench_filter_genes.create_synthetic_csv(path, 300, 7)
+    rng = np.random.default_rng(1)
+    ids = np.array([gene.split('.')[0] for gene in genes])
+    pd.DataFrame({'Ensembl gene ID': rng.choice(ids, 120, replace=False)}).to_csv(os.path.join(tmp_path, 'pc.tsv'), sep='\t', index=False)
+    pd.DataFrame({'x': rng.choice(ids, 15, replace=False)}).to_csv(os.path.join(tmp_path, 'necrop.csv'), index=False)
+    lists = {'pc': (os.path.join(tmp_path, 'pc.tsv'), 'Ensembl gene ID', '\t'), 'necrop': (os.path.join(tmp_path, 'necrop.csv'), 'x', ',')}
+    outputs = {filter_by: os.path.join(tmp_path, f'filtered_{filter_by}.csv') for filter_by in lists}
+    written = pipeline_stages.filter_genes(path, lists, outputs)
+    assert written == {'pc': 120, 'necrop': 15}
+
+    for filter_by, (list_path, column, sep) in lists.items():
+        genes_to_filter = pd.read_csv(list_path, sep=sep)[column].values # Gene list of the old filter_genes
+        dict_df, _ = bench_filter_genes.legacy_filter_genes(path, genes_to_filter)
+        old_path = os.path.join(tmp_path, f'old_{filter_by}.csv')
+        pd.DataFrame.from_dict(dict_df).to_csv(old_path, sep=',', index=False)
+        with open(outputs[filter_by], 'rb') as new, open(old_path, 'rb') as old:
+            assert new.read() == old.read()
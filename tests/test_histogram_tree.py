@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import numpy as np
+import db_schema
+import histogram_tree
+import tree_experiment
+import tree_store
+
+"""
+Title: Description
+Tests of the histogram engine: the bounded cache of split searches and the rows its trees write in the tables of the README.
+"""
+
+def fit_trees(binned, y, max_cache_mb, n_trees=8):
+    trees = []
+    for seed in range(n_trees):
+        order = np.random.default_rng(seed).permutation(binned['bins'].shape[1])
+        tree_ = histogram_tree.HistogramTreeClassifier(random_state=seed, max_cache_mb=max_cache_mb).fit(binned, y, order).tree_
+        trees.append((tree_.feature.tolist(), tree_.threshold.tolist(), tree_.children_left.tolist()))
+    return trees
+
+def test_cache_bounded_by_bytes_gives_same_trees(labelled_df):
+    x = labelled_df.iloc[:, :-1].to_numpy()
+    y = labelled_df['Pacient_Condition'].astype('category').cat.codes.to_numpy()
+    unbounded = histogram_tree.bin_matrix(x)
+    expected = fit_trees(unbounded, y, 256)
+    for max_cache_mb in [0.002, 0]:
+        binned = histogram_tree.bin_matrix(x)
+        assert fit_trees(binned, y, max_cache_mb) == expected
+        assert binned.get('splits_bytes', 0) <= max_cache_mb*1024*1024
+        assert binned.get('splits_bytes', 0) == sum(histogram_tree._split_bytes(split) for split in binned['splits'].values())
+    assert len(binned['splits']) == 0 and len(unbounded['splits']) > 0
+
+def table_rows(db, experiencia_id):
+    rows = {}
+    for table in tree_store.legacy_tables:
+        if table != 'gene_pair_aggregate': # Float sums of the aggregate depend on the order of the updates
+            rows[table] = db.execute(f'SELECT * FROM {table} WHERE experiencia_id = ? ORDER BY 1;', (experiencia_id,)).fetchall()
+    return rows
+
+def test_histogram_rows_match_schema(labelled_df, database, tmp_path):
+    run = tree_experiment.run_tree_experiment(labelled_df, database, 'Histogram', n_times_run=6, engine='histogram',
+                                              render_mode='off', render_consensus=False, results_dir=str(tmp_path))
+    exp = run['experiencia_id']
+    genes = set(labelled_df.columns[:-1])
+    pairs = database.execute('SELECT gene_id_parent, gene_id_son, CVDA_son+CA_son+C_son+CVD_son FROM father_and_son_nodes WHERE experiencia_id = ?;',
+                             (exp,)).fetchall()
+    assert len(pairs) > 0
+    assert all(parent in genes and son in genes and samples > 0 for parent, son, samples in pairs)
+    roots = database.execute('SELECT COUNT(*) FROM father_and_son_nodes WHERE experiencia_id = ? AND depth = 0;', (exp,)).fetchone()[0]
+    assert roots == 6 # One root, saved as its own father, for each tree
+    places = database.execute('SELECT CVDA+CA+C+CVD FROM place_of_genes_in_tree WHERE experiencia_id = ? AND depth = 0;', (exp,)).fetchall()
+    assert set(places) == {(len(labelled_df),)} # Every sample reaches the root, in the rows of each path
+
+    compact = sqlite3.connect(os.path.join(tmp_path, 'compact.sqlite3'))
+    db_schema.create_database(compact)
+    run = tree_experiment.run_tree_experiment(labelled_df, compact, 'Histogram', n_times_run=6, engine='histogram', storage='compact',
+                                              render_mode='off', render_consensus=False, results_dir=str(tmp_path))
+    assert tree_store.materialize(compact, run['experiencia_id']) == 6
+    assert table_rows(compact, run['experiencia_id']) == table_rows(database, exp)
+    compact.close()
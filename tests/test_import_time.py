@@ -0,0 +1,29 @@
+import os
+import sys
+import subprocess
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'basic_codes', 'benchmarks'))
+import bench_import_time
+
+"""
+Title: Description
+Imports of the package in new processes: the modules used to fit trees load no heavy library (plotting, graphviz, tSNE and
+PCA), and the modules of the package are not shadowed by installed modules with the same name.
+"""
+
+@pytest.mark.parametrize('module', ['basic_codes', 'tree_runner', 'tree_experiment'])
+def test_tree_modules_load_no_heavy_library(module):
+    assert set(bench_import_time.heavy) >= {'matplotlib', 'seaborn', 'graphviz', 'sklearn.manifold', 'sklearn.decomposition'}
+    result = bench_import_time.time_import(module, repeat=1)
+    assert result is not None and result['heavy'] == []
+
+def test_package_modules_are_not_shadowed(tmp_path):
+    with open(os.path.join(tmp_path, 'pipeline.py'), 'w') as f:
+        f.write('installed = True\n') # Another module called pipeline, found before the package in the path
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([str(tmp_path), os.path.dirname(bench_import_time.basic_codes)])
+    process = subprocess.run([sys.executable, '-c', 'import basic_codes, pipeline; print(pipeline.__file__)'], env=env,
+                             capture_output=True, text=True, cwd=str(tmp_path))
+    assert process.returncode == 0, process.stderr
+    assert os.path.dirname(process.stdout.strip()) == bench_import_time.basic_codes
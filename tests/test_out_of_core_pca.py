@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import expression_cache
+import out_of_core_pca
+
+"""
+Title: Description
+Tests of the PCA of cached matrices: chunks of every size (including a last chunk with fewer samples than components) are
+fitted, and the samples transformed in batches are the ones transformed one by one.
+"""
+
+def open_matrices(folder, sizes, n_genes=50):
+    rng = np.random.default_rng(0)
+    genes = pd.Index([f'ENSG{i:011d}' for i in range(n_genes)], name='Gene_ID')
+    matrices = []
+    for i, n_samples in enumerate(sizes):
+        path = os.path.join(folder, f'tissue_{i}.csv')
+        pd.DataFrame(np.log2(rng.gamma(0.5, 20, (n_genes, n_samples))+1), index=genes,
+                     columns=[f'GTEX-{i}-{j}' for j in range(n_samples)]).to_csv(path)
+        matrices.append(expression_cache.open_expression_matrix(path, samples_major=True))
+    return matrices
+
+@pytest.mark.parametrize('sizes', [[17, 10], [8, 2], [3]], ids=['short_chunks', 'short_last_chunk', 'single_chunk'])
+def test_batched_pca_equals_per_sample_transform(tmp_path, monkeypatch, sizes):
+    from sklearn.decomposition import IncrementalPCA
+    partial_fit = IncrementalPCA.partial_fit
+    batches = []
+    monkeypatch.setattr(IncrementalPCA, 'partial_fit', lambda self, x, *args, **kwargs: batches.append(len(x)) or partial_fit(self, x, *args, **kwargs))
+    matrices = open_matrices(str(tmp_path), sizes)
+    assert out_of_core_pca.samples_per_chunk(50, 3, 0.01) == 8 # Chunks of 8 samples: the last chunk of each matrix is short
+    result = out_of_core_pca.fit_pca_from_cache(matrices, n_components=3, method='incremental', max_memory_mb=0.01)
+    assert result['pca'].n_samples_seen_ == sum(sizes)
+    assert min(batches) >= 3 # Older versions of sklearn reject every batch with fewer samples than components
+    values = np.vstack([np.asarray(matrix['values_by_sample'], dtype=np.float64) for matrix in matrices])
+    samples = [sample for matrix in matrices for sample in matrix['samples']]
+    assert list(result['transformed'].index) == samples
+    per_sample = np.vstack([result['pca'].transform(values[i:i+1]) for i in range(len(values))])
+    assert np.allclose(result['transformed'].to_numpy(), per_sample)
+
+def test_fewer_samples_than_components(tmp_path):
+    assert out_of_core_pca.fit_pca_from_cache(open_matrices(str(tmp_path), [2]), n_components=3) is None
@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import pandas as pd
+import plot_renderer
+
+"""
+Title: Description
+Tests of the skip of plots already drawn: a plot is drawn again only when the data of its gene or the style of the plots
+(renderer_version) changes, or when its PNG is missing.
+"""
+
+def expression_df(seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(np.log2(rng.gamma(0.5, 20, (20, 4))+1), columns=[f'ENSG{i:011d}' for i in range(4)])
+    df['SMTSISCH'] = rng.integers(0, 1500, 20)
+    df['quartiles'] = pd.qcut(df['SMTSISCH'], q=4, labels=False)
+    return df
+
+def test_skip_if_unchanged(tmp_path, monkeypatch):
+    output_dir = str(tmp_path)
+    df = expression_df()
+    assert plot_renderer.render_gene_plots(df, output_dir, 'plot', processes=1)['drawn'] == 4
+    assert sorted(os.listdir(output_dir)) == sorted([plot_renderer.manifest_name]+[f'plot_{gene}.png' for gene in df.columns[:-2]])
+
+    drawn = []
+    render = plot_renderer._render
+    monkeypatch.setattr(plot_renderer, '_render', lambda task: drawn.append(task[0]) or render(task))
+    result = plot_renderer.render_gene_plots(df, output_dir, 'plot', processes=1)
+    assert result['drawn'] == 0 and result['skipped'] == 4 and drawn == []
+
+    df['ENSG00000000002'] = df['ENSG00000000002']+1 # Data of one gene changed
+    os.remove(os.path.join(output_dir, 'plot_ENSG00000000000.png')) # PNG of another gene deleted
+    result = plot_renderer.render_gene_plots(df, output_dir, 'plot', processes=1)
+    assert result['skipped'] == 2 and sorted(drawn) == ['ENSG00000000000', 'ENSG00000000002']
+
+    drawn.clear()
+    monkeypatch.setattr(plot_renderer, 'renderer_version', plot_renderer.renderer_version+1) # Style of the plots changed
+    result = plot_renderer.render_gene_plots(df, output_dir, 'plot', processes=1)
+    assert result['drawn'] == 4 and result['skipped'] == 0 and sorted(drawn) == list(df.columns[:-2])
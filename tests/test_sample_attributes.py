@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from pandas.testing import assert_frame_equal
+import sample_attributes
+
+"""
+Title: Description
+Tests of the index of sample attributes: the joins are the same of the loops over the rows of the file that scripts 3 and 4
+used, the file is parsed once when threads load it at the same time, and the cache goes to the fallback folder when the
+folder of the file cannot be written.
+"""
+
+def write_attributes(path, seed=0):
+    rng = np.random.default_rng(seed)
+    n = 60
+    df = pd.DataFrame({'SAMPID': [f'GTEX-{i:04d}-0011-R10a-SM-{i}' for i in range(n)],
+                       'SMATSSCR': rng.integers(0, 3, n).astype(float),
+                       'SMTSD': rng.choice(['Artery - Coronary', 'Heart - Left Ventricle', 'Liver'], n),
+                       'SMTSISCH': rng.integers(0, 1500, n).astype(float)})
+    df.to_csv(path, sep='\t', index=False)
+    return df
+
+def old_time_of_death(samples, path):
+    # Loop of time_of_death of script 4 before the index of attributes
+    time_of_death = pd.read_csv(path, sep='\t', usecols=['SAMPID','SMTSISCH'])
+    dict_df = {'SAMPID':[],'SMTSISCH':[]}
+    for i in range(len(time_of_death)):
+        sample = time_of_death['SAMPID'][i]
+        if sample in samples:
+            dict_df['SAMPID'].append(sample)
+            dict_df['SMTSISCH'].append(time_of_death['SMTSISCH'][i])
+    dict_df['quartiles'] = pd.qcut(dict_df['SMTSISCH'], q=4, labels=False)
+    time_of_death_df = pd.DataFrame(dict_df, index=dict_df['SAMPID'])
+    time_of_death_df.drop('SAMPID', inplace=True, axis=1)
+    return time_of_death_df
+
+def test_join_equals_old_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(sample_attributes, '_loaded', {})
+    path = os.path.join(tmp_path, 'attributes.txt')
+    df = write_attributes(path)
+    samples = np.array(df['SAMPID'].sample(frac=0.6, random_state=1).tolist()+['GTEX-missing']) # Other order, one sample not in the file
+    joined = sample_attributes.join_attributes(samples, ['SMTSISCH'], path)
+    joined['quartiles'] = sample_attributes.quartiles(joined['SMTSISCH'])
+    assert_frame_equal(joined, old_time_of_death(samples, path))
+    tissue = pd.read_csv(path, usecols=['SAMPID', 'SMTSD'], sep='\t')
+    assert sample_attributes.samples_of_tissue('Liver', path) == set(tissue['SAMPID'][tissue['SMTSD']=='Liver'].values)
+
+def test_loaded_once_by_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(sample_attributes, '_loaded', {})
+    path = os.path.join(tmp_path, 'attributes.txt')
+    write_attributes(path)
+    read_csv = pd.read_csv
+    calls = []
+    monkeypatch.setattr(sample_attributes.pd, 'read_csv', lambda *args, **kwargs: calls.append(args) or read_csv(*args, **kwargs))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        loaded = list(executor.map(lambda _: sample_attributes.load_sample_attributes(path), range(16)))
+    assert len(calls) == 1 and all(attributes is loaded[0] for attributes in loaded)
+    assert sorted(os.listdir(os.path.join(tmp_path, '.sample_attributes_cache'))) == ['attributes.txt.pkl', 'attributes.txt.pkl.json'] # No temporary file left
+
+def test_cache_falls_back_when_folder_not_writable(tmp_path, monkeypatch):
+    monkeypatch.setattr(sample_attributes, '_loaded', {})
+    data = os.path.join(tmp_path, 'data')
+    os.makedirs(data)
+    path = os.path.join(data, 'attributes.txt')
+    df = write_attributes(path)
+    with open(os.path.join(data, '.sample_attributes_cache'), 'w') as f:
+        f.write('') # The cache folder cannot be created in the data folder
+    fallback = os.path.join(tmp_path, 'work', 'sample_attributes')
+    monkeypatch.setattr(sample_attributes, 'fallback_cache_dir', fallback)
+    assert list(sample_attributes.load_sample_attributes(path).index) == df['SAMPID'].tolist()
+    assert os.path.exists(os.path.join(fallback, 'attributes.txt.pkl'))
+
+    monkeypatch.setattr(sample_attributes, '_loaded', {}) # New process: read from the fallback cache, not from the text file
+    monkeypatch.setattr(sample_attributes.pd, 'read_csv', None)
+    assert list(sample_attributes.load_sample_attributes(path)['SMTSISCH']) == df['SMTSISCH'].tolist()
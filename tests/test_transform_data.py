@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'basic_codes'))
+import pipeline_stages
+
+"""
+Title: Description
+Regression test of pipeline_stages.transform_data against the implementation of scripts 3 and 4 that went through a
+temporary CSV (temporario.csv), on a small log2 tpm CSV like the ones written by script 1.
+"""
+
+def old_transform_data(df):
+    # transform_data of scripts 3 and 4 before it was done in memory
+    df.columns=df.iloc[0]
+    df = df[1:]
+    df = df.reset_index()
+    df.to_csv('temporario.csv', index=False)
+    df = pd.read_csv('temporario.csv')
+    df = df.rename(columns={'index':'sample_id'})
+    df = df.set_index('sample_id')
+    return df
+
+def write_log2_tpm_csv(path, genes, n_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    tpm = rng.gamma(0.5, 20, (len(genes), n_samples))
+    tpm[::3] = 0 # Genes not expressed, like many genes of GTEx
+    df = pd.DataFrame(np.log2(tpm+1), index=pd.Index(genes, name='Gene_ID'),
+                      columns=[f'GTEX-{1000+i}-0001-SM-{i:04d}' for i in range(n_samples)])
+    df.to_csv(path)
+
+@pytest.mark.parametrize('genes', [[f'ENSG{i:011d}.{i%7}' for i in range(12)],
+                                   ['ENSG00000000001.1', 'ENSG00000000002.3', 'ENSG00000000001.1', 'ENSG00000000003.2',
+                                    'ENSG00000000001.1', 'ENSG00000000001.1.1']], ids=['unique_genes', 'repeated_genes'])
+def test_transform_data_matches_temporary_csv(tmp_path, monkeypatch, genes):
+    monkeypatch.chdir(tmp_path) # The old implementation writes temporario.csv in the working folder
+    write_log2_tpm_csv('log2_tpm.csv', genes, 9)
+    df = pd.read_csv('log2_tpm.csv') # Layout of create_df_for_plot: Gene_ID in the first column
+    assert_frame_equal(pipeline_stages.transform_data(df.T), old_transform_data(df.T))
+
+def test_transform_data_matches_temporary_csv_with_genes_as_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_log2_tpm_csv('log2_tpm.csv', [f'ENSG{i:011d}' for i in range(12)], 9)
+    df = pd.read_csv('log2_tpm.csv', index_col=['Gene_ID']) # Layout of script 3: the first sample becomes the header, with repeated zeros
+    assert_frame_equal(pipeline_stages.transform_data(df.T), old_transform_data(df.T))